@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+"""
+Compare decoding GoogleVoice's gcData contacts blob through the old
+regex + eval path with the js_literal parser (and simplejson when present)
+
+Usage: bench_js_literal.py [recorded_contacts_page ...]
+With no pages a synthetic address book is generated
+"""
+
+from __future__ import with_statement
+
+import re
+import sys
+import timeit
+import logging
+
+
+_moduleLogger = logging.getLogger(__name__)
+sys.path.insert(0,"../src")
+
+import backends.js_literal
+import backends.gvoice
+
+
+def generate_page(contactCount):
+	contacts = []
+	for i in xrange(contactCount):
+		contacts.append(
+			'"%d":{"contactId":"%d","name":"Contact %d","emails":["c%d@example.com"],"numbers":[{"phoneNumber":"+1555555%04d","phoneType":"mobile"},{"phoneNumber":"+1555556%04d","phoneType":"work"}],"photoUrl":"","hasPhoto":false,"isStarred":%s}' % (
+				i, i, i, i, i % 10000, i % 10000, ("false", "true")[i % 2],
+			)
+		)
+	gcData = '{"contacts":{%s},"rank":{},"number":{"raw":"5555551234"}}' % ",".join(contacts)
+	return '<html><script>var _gcData = %s;\nvar other = 1;</script></html>' % gcData
+
+
+_BODY_REGEX = re.compile(r"""gcData\s*=\s*({.*?});""", re.MULTILINE | re.DOTALL)
+
+
+def old_decode(page):
+	flattened = _BODY_REGEX.search(page).group(1)
+	flattened = re.sub("true", "True", flattened)
+	flattened = re.sub("false", "False", flattened)
+	return eval(flattened, {}, {})["contacts"]
+
+
+def new_decode(page):
+	return backends.js_literal.loads(_BODY_REGEX.search(page).group(1))["contacts"]
+
+
+def new_stream(page):
+	start = re.search(r"gcData\s*=\s*", page).end()
+	return dict(backends.js_literal.iter_object_items(page, ("contacts", ), start))
+
+
+def simplejson_decode(page):
+	return backends.gvoice.simplejson.loads(_BODY_REGEX.search(page).group(1))["contacts"]
+
+
+def benchmark(name, page, repeat = 3):
+	expected = old_decode(page)
+	candidates = [
+		("regex + eval", old_decode),
+		("js_literal.loads", new_decode),
+		("js_literal.iter_object_items", new_stream),
+	]
+	if backends.gvoice.simplejson is not None:
+		candidates.append(("simplejson", simplejson_decode))
+
+	print "%s (%d KiB)" % (name, len(page) / 1024)
+	for description, decode in candidates:
+		assert decode(page) == expected, description
+		elapsed = min(timeit.Timer(lambda: decode(page)).repeat(repeat, 1))
+		print "\t%s: %.2f ms" % (description, elapsed * 1000)
+
+
+def main(args):
+	if args:
+		for path in args:
+			with open(path) as f:
+				benchmark(path, f.read())
+	else:
+		for contactCount in (100, 1000, 10000):
+			benchmark("synthetic %d contacts" % contactCount, generate_page(contactCount))
+
+
+if __name__ == "__main__":
+	logging.basicConfig(level=logging.DEBUG)
+	main(sys.argv[1:])
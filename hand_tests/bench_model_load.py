@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+"""
+Rows per second when loading a list model that is shown through a filter,
+comparing a lock per appended row, a lock per batch and filling a
+replacement model before swapping it in.
+
+Usage: bench_model_load.py [row_count]
+"""
+
+from __future__ import with_statement
+
+import sys
+import time
+import logging
+
+import gobject
+import gtk
+
+
+_moduleLogger = logging.getLogger(__name__)
+sys.path.insert(0,"../src")
+
+import gtk_toolbox
+
+
+COLUMN_TYPES = (
+	gobject.TYPE_STRING,
+	gobject.TYPE_STRING,
+	gobject.TYPE_STRING,
+	gobject.TYPE_STRING,
+	gobject.TYPE_STRING,
+)
+
+
+def generate_rows(rowCount):
+	return [
+		("(555) 555-%04d" % (i % 10000), "%d hours ago" % i, "Received", "Name %d" % i, str(i))
+		for i in xrange(rowCount)
+	]
+
+
+def is_visible(model, iter):
+	return model.get_value(iter, 2) is not None
+
+
+def create_view():
+	view = gtk.TreeView()
+	column = gtk.TreeViewColumn("Name")
+	renderer = gtk.CellRendererText()
+	column.pack_start(renderer, expand=True)
+	column.add_attribute(renderer, "text", 3)
+	view.append_column(column)
+	return view
+
+
+def create_model(rows):
+	model = gtk_toolbox.build_list_store(COLUMN_TYPES, rows)
+	modelFiltered = model.filter_new()
+	modelFiltered.set_visible_func(is_visible)
+	return model, modelFiltered
+
+
+def load_per_row(view, rows):
+	model, modelFiltered = create_model(())
+	view.set_model(modelFiltered)
+	for row in rows:
+		with gtk_toolbox.gtk_lock():
+			model.append(row)
+
+
+def load_batched(view, rows):
+	model, modelFiltered = create_model(())
+	view.set_model(modelFiltered)
+	gtk_toolbox.append_rows(model, rows)
+
+
+def load_replacement(view, rows):
+	model, modelFiltered = create_model(rows)
+	with gtk_toolbox.gtk_lock():
+		view.set_model(modelFiltered)
+
+
+def benchmark(rowCount):
+	rows = generate_rows(rowCount)
+	print "%d rows" % rowCount
+	for description, load in (
+		("lock per row", load_per_row),
+		("lock per batch", load_batched),
+		("replacement model", load_replacement),
+	):
+		view = create_view()
+		start = time.time()
+		load(view, rows)
+		elapsed = time.time() - start
+		print "\t%s: %.2f s (%d rows/s)" % (description, elapsed, rowCount / elapsed)
+
+
+def main(args):
+	gtk.gdk.threads_init()
+	if args:
+		rowCount = int(args[0])
+	else:
+		rowCount = 10000
+	benchmark(rowCount)
+
+
+if __name__ == "__main__":
+	logging.basicConfig(level=logging.DEBUG)
+	main(sys.argv[1:])
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+"""
+Compare the old double ElementTree parse of a GoogleVoice feed page with
+the single-pass payload extraction.
+
+Usage: bench_payload.py [recorded_page ...]
+With no pages a synthetic inbox is generated (see grab_debug_info for how
+to record real ones, e.g. loggedin_voicemail.txt)
+"""
+
+from __future__ import with_statement
+
+import sys
+import timeit
+import logging
+from xml.etree import ElementTree
+
+
+_moduleLogger = logging.getLogger(__name__)
+sys.path.insert(0,"../src")
+
+import backends.gvoice
+
+
+def generate_page(conversationCount):
+	jsonMessages = []
+	htmlMessages = []
+	for i in xrange(conversationCount):
+		messageId = "%040x" % i
+		jsonMessages.append(
+			'"%s":{"id":"%s","phoneNumber":"+15555550%03d","startTime":"%d","isRead":true,"isSpam":false,"isTrash":false,"star":false,"labels":["inbox","sms","all"],"relativeStartTime":"%d hours ago"}' % (
+				messageId, messageId, i % 1000, 1250000000000 + i, i,
+			)
+		)
+		htmlMessages.append(
+			'<div id="%s" class="goog-flat-button gc-message gc-message-read">\n'
+			'<span class="gc-message-time">06/21/09 3:15 PM</span>\n'
+			'<span class="gc-message-relative">%d hours ago</span>\n'
+			'%s\n'
+			'</div>\n' % (
+				messageId,
+				i,
+				'<span class="gc-message-sms-text">Lorem ipsum dolor sit amet &amp; more</span>\n' * 5,
+			)
+		)
+	flatJson = '{"messages":{%s},"totalSize":%d,"unreadCounts":{"sms":0,"voicemail":0}}' % (
+		",".join(jsonMessages), conversationCount,
+	)
+	flatHtml = "".join(htmlMessages)
+	return '<?xml version="1.0" encoding="UTF-8"?>\n<response>\n<json><![CDATA[%s]]></json>\n<html><![CDATA[%s]]></html>\n</response>' % (flatJson, flatHtml)
+
+
+def old_extract(flatXml):
+	xmlTree = ElementTree.fromstring(flatXml)
+	flatHtml = xmlTree.getchildren()[1].text
+	xmlTree = ElementTree.fromstring(flatXml)
+	flatJson = xmlTree.getchildren()[0].text
+	return backends.gvoice.parse_json(flatJson), flatHtml
+
+
+def new_extract(flatXml):
+	return backends.gvoice.extract_payload(flatXml)
+
+
+def old_extract_text(flatXml):
+	flatHtml = ElementTree.fromstring(flatXml).getchildren()[1].text
+	flatJson = ElementTree.fromstring(flatXml).getchildren()[0].text
+	return flatJson, flatHtml
+
+
+def new_extract_text(flatXml):
+	return backends.gvoice.extract_payload_text(flatXml)
+
+
+def benchmark(name, page, repeat = 5):
+	assert old_extract(page) == new_extract(page)
+	print "%s (%d KiB)" % (name, len(page) / 1024)
+	for description, old, new in (
+		("payload text", old_extract_text, new_extract_text),
+		("payload text and json", old_extract, new_extract),
+	):
+		oldTime = min(timeit.Timer(lambda: old(page)).repeat(repeat, 1))
+		newTime = min(timeit.Timer(lambda: new(page)).repeat(repeat, 1))
+		print "\t%s" % description
+		print "\t\tdouble ElementTree parse: %.2f ms" % (oldTime * 1000, )
+		print "\t\tsingle-pass extraction: %.2f ms" % (newTime * 1000, )
+		print "\t\tspeedup: %.1fx" % (oldTime / newTime, )
+
+
+def main(args):
+	if args:
+		for path in args:
+			with open(path) as f:
+				benchmark(path, f.read())
+	else:
+		for conversationCount in (10, 100, 1000):
+			benchmark("synthetic %d conversations" % conversationCount, generate_page(conversationCount))
+
+
+if __name__ == "__main__":
+	logging.basicConfig(level=logging.DEBUG)
+	main(sys.argv[1:])
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+
+"""
+Startup timeline of the real application, without a user or network: once
+against the null backend and once logging into a local GoogleVoice stand-in.
+Each run is a fresh process with its own empty data directory; the median
+start and length of every phase is reported.  "dialpad interactive" is when
+the dialpad of the logged in backend became usable.
+
+Usage: bench_startup.py [runs]
+Needs a display, for a headless machine run it under xvfb-run
+"""
+
+from __future__ import with_statement
+
+import os
+import sys
+import time
+import shutil
+import base64
+import tempfile
+import threading
+import subprocess
+import ConfigParser
+import BaseHTTPServer
+import logging
+
+try:
+	import simplejson
+except ImportError:
+	import json as simplejson
+
+
+_moduleLogger = logging.getLogger(__name__)
+sys.path.insert(0,"../src")
+
+import bench_js_literal
+
+
+_EMPTY_FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<response><json><![CDATA[{"messages":{},"totalSize":0,"unreadCounts":{"all":0,"inbox":0,"missed":0,"sms":0,"voicemail":0},"resultsPerPage":10}]]></json><html><![CDATA[]]></html></response>"""
+
+_ACCOUNT_PAGE = """<html><body>
+<input type="hidden" name="_rnr_se" value="standintoken"/>
+<div><b class="ms2">(555) 555-1234</b></div>
+ Mobile: +15555550000<br/>
+</body></html>"""
+
+
+class StandInHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+	protocol_version = "HTTP/1.1"
+
+	def do_GET(self):
+		if "contact" in self.path:
+			body = self.server.contactsPage
+		elif "inbox/" in self.path:
+			body = _EMPTY_FEED
+		else:
+			body = _ACCOUNT_PAGE
+		self.send_response(200)
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def do_POST(self):
+		length = int(self.headers.get("Content-Length", 0))
+		self.rfile.read(length)
+		self.do_GET()
+
+	def log_message(self, *args):
+		pass
+
+
+def start_stand_in(contactCount):
+	server = BaseHTTPServer.HTTPServer(("127.0.0.1", 0), StandInHandler)
+	server.contactsPage = bench_js_literal.generate_page(contactCount)
+	thread = threading.Thread(target=server.serve_forever)
+	thread.setDaemon(True)
+	thread.start()
+	return server
+
+
+def point_backend_at(baseUrl):
+	from backends import gvoice
+
+	class StandInBackend(gvoice.GVoiceBackend):
+
+		def __init__(self, *args, **kwds):
+			gvoice.GVoiceBackend.__init__(self, *args, **kwds)
+			for name, value in vars(self).items():
+				if isinstance(value, str) and "://www.google.com/" in value:
+					setattr(self, name, baseUrl + value.split("://www.google.com/", 1)[1])
+
+	gvoice.GVoiceBackend = StandInBackend
+
+
+def write_settings(path, backendId, credentials):
+	import constants
+	config = ConfigParser.SafeConfigParser()
+	section = constants.__pretty_app_name__
+	config.add_section(section)
+	config.set(section, "active", str(backendId))
+	for i, value in enumerate(credentials):
+		config.set(section, "bin_blob_%i" % i, base64.b64encode(value))
+	config.set(section, "fullscreen", "False")
+	config.set(section, "portrait", "False")
+	with open(path, "w") as f:
+		config.write(f)
+
+
+def run_child(mode, reportPath):
+	import gobject
+	import gtk
+	import constants
+	import timeline
+
+	dataPath = tempfile.mkdtemp()
+	constants._data_path_ = dataPath
+	constants._user_settings_ = os.path.join(dataPath, "settings.ini")
+
+	import dc_glade
+
+	class BenchDialcentral(dc_glade.Dialcentral):
+
+		def _idle_setup(self):
+			if mode == "gv":
+				with dc_glade.gtk_toolbox.gtk_lock():
+					self._notebook.set_current_page(self.RECENT_TAB)
+			dc_glade.Dialcentral._idle_setup(self)
+
+		def _login_by_user(self):
+			# Nobody is there to answer the credentials dialog
+			return False, self.NULL_BACKEND
+
+	try:
+		if mode == "gv":
+			server = start_stand_in(1000)
+			point_backend_at("http://127.0.0.1:%d/" % server.server_port)
+			write_settings(constants._user_settings_, dc_glade.Dialcentral.GV_BACKEND, ("bench", "bench"))
+		else:
+			write_settings(constants._user_settings_, dc_glade.Dialcentral.NULL_BACKEND, ("", ""))
+
+		gtk.gdk.threads_init()
+		handle = BenchDialcentral()
+		deadline = time.time() + 60
+
+		def on_check():
+			isDone = handle._isStartupReported and (
+				mode != "gv" or "history population" in timeline.STARTUP
+			)
+			if isDone or deadline < time.time():
+				timeline.STARTUP.write_json(reportPath)
+				gtk.main_quit()
+				return False
+			return True
+
+		gobject.timeout_add(100, on_check)
+		gtk.main()
+	finally:
+		shutil.rmtree(dataPath)
+
+
+def median(values):
+	values = sorted(values)
+	return values[len(values) / 2]
+
+
+def benchmark(mode, runs):
+	spansByName = {}
+	for i in xrange(runs):
+		handle, reportPath = tempfile.mkstemp(".json")
+		os.close(handle)
+		try:
+			subprocess.check_call([sys.executable, __file__, "--child", mode, reportPath])
+			with open(reportPath) as f:
+				for span in simplejson.load(f):
+					spansByName.setdefault(span["name"], []).append(span)
+		finally:
+			os.remove(reportPath)
+
+	print "%s backend, median of %d runs" % (mode, runs)
+	print "\t  start  length  phase"
+	for name, spans in sorted(
+		spansByName.iteritems(),
+		key=lambda (name, spans): median([span["start"] for span in spans]),
+	):
+		print "\t%7.3f %7.3f  %s (%d runs)" % (
+			median([span["start"] for span in spans]),
+			median([span["duration"] for span in spans]),
+			name,
+			len(spans),
+		)
+
+
+def main(args):
+	if args[:1] == ["--child"]:
+		run_child(args[1], args[2])
+		return
+
+	if args:
+		runs = int(args[0])
+	else:
+		runs = 5
+	for mode in ("null", "gv"):
+		benchmark(mode, runs)
+
+
+if __name__ == "__main__":
+	logging.basicConfig(level=logging.WARNING)
+	main(sys.argv[1:])
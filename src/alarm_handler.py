@@ -5,8 +5,6 @@ import time
 import datetime
 import ConfigParser
 
-import dbus
-
 
 _FREMANTLE_ALARM = "Fremantle"
 _DIABLO_ALARM = "Diablo"
@@ -19,11 +17,116 @@ try:
 except (ImportError, OSError):
 	try:
 		import osso.alarmd as alarmd
+		import dbus
 		ALARM_TYPE = _DIABLO_ALARM
 	except (ImportError, OSError):
 		ALARM_TYPE = _NO_ALARM
 
 
+# Let the notifier daemon pick when to poll, see AdaptiveSchedule
+ADAPTIVE_RECURRENCE = 0
+# With adaptive polling the system alarm only makes sure the daemon is alive
+_ADAPTIVE_ALARM_MINUTES = 60
+# Saved as the alarmCookie while notifications are off
+INVALID_ALARM_COOKIE = -1
+
+
+def describe_recurrence(recurrence):
+	"""
+	>>> describe_recurrence(ADAPTIVE_RECURRENCE)
+	'Adaptive'
+	>>> describe_recurrence(5)
+	'5 Minutes'
+	"""
+	if recurrence == ADAPTIVE_RECURRENCE:
+		return "Adaptive"
+	return "%d Minutes" % recurrence
+
+
+def _get_alarm_minutes(recurrence):
+	if recurrence == ADAPTIVE_RECURRENCE:
+		return _ADAPTIVE_ALARM_MINUTES
+	return recurrence
+
+
+class AdaptiveSchedule(object):
+	"""
+	How long to wait between polls.  Activity (a poll that found something)
+	drops back to the shortest interval, each quiet poll doubles it up to the
+	longest, and polling stops altogether while disconnected or the device is
+	inactive.  A fixed recurrence is just a schedule whose bounds are equal.
+
+	>>> schedule = AdaptiveSchedule(2, 60)
+	>>> [schedule.next_delay(False) for i in xrange(7)]
+	[4, 8, 16, 32, 60, 60, 60]
+	>>> schedule.next_delay(True)
+	2
+	>>> schedule.set_active(False)
+	>>> schedule.next_delay(False) is None
+	True
+	>>> schedule.set_active(True)
+	>>> schedule.interval
+	4
+	"""
+
+	MIN_MINUTES = 2
+	MAX_MINUTES = 60
+	BACKOFF = 2
+
+	def __init__(self, minMinutes = MIN_MINUTES, maxMinutes = MAX_MINUTES):
+		self._minMinutes = minMinutes
+		self._maxMinutes = maxMinutes
+		self._interval = minMinutes
+		self._isConnected = True
+		self._isActive = True
+
+	@classmethod
+	def from_recurrence(cls, recurrence):
+		if recurrence == ADAPTIVE_RECURRENCE:
+			return cls()
+		return cls(recurrence, recurrence)
+
+	def configure(self, recurrence):
+		"""
+		Change the bounds to match recurrence, keeping the current state
+		"""
+		other = self.from_recurrence(recurrence)
+		if (other._minMinutes, other._maxMinutes) != (self._minMinutes, self._maxMinutes):
+			self._minMinutes, self._maxMinutes = other._minMinutes, other._maxMinutes
+			self._interval = self._minMinutes
+
+	def next_delay(self, isChanged):
+		"""
+		@param isChanged Whether the poll that just finished found something
+		@returns Minutes until the next poll or None while paused
+		"""
+		if isChanged:
+			self._interval = self._minMinutes
+		else:
+			self._interval = min(self._maxMinutes, self._interval * self.BACKOFF)
+		return self.delay
+
+	@property
+	def delay(self):
+		if self.isPaused:
+			return None
+		return self._interval
+
+	@property
+	def interval(self):
+		return self._interval
+
+	@property
+	def isPaused(self):
+		return not (self._isConnected and self._isActive)
+
+	def set_connected(self, isConnected):
+		self._isConnected = isConnected
+
+	def set_active(self, isActive):
+		self._isActive = isActive
+
+
 def _get_start_time(recurrence):
 	now = datetime.datetime.now()
 	startTimeMinute = now.minute + max(recurrence, 5) # being safe
@@ -85,7 +188,7 @@ def _unpack_minutes(recurrence):
 
 class _FremantleAlarmHandler(object):
 
-	_INVALID_COOKIE = -1
+	_INVALID_COOKIE = INVALID_ALARM_COOKIE
 	_REPEAT_FOREVER = -1
 	_TITLE = "Dialcentral Notifications"
 	_LAUNCHER = os.path.abspath(os.path.join(os.path.dirname(__file__), "alarm_notify.py"))
@@ -119,7 +222,7 @@ class _FremantleAlarmHandler(object):
 			if self.isEnabled:
 				self._clear_alarm()
 			if enabled:
-				self._set_alarm(recurrence)
+				self._set_alarm(_get_alarm_minutes(recurrence))
 		self._recurrence = int(recurrence)
 
 	@property
@@ -163,7 +266,7 @@ class _FremantleAlarmHandler(object):
 
 class _DiabloAlarmHandler(object):
 
-	_INVALID_COOKIE = -1
+	_INVALID_COOKIE = INVALID_ALARM_COOKIE
 	_TITLE = "Dialcentral Notifications"
 	_LAUNCHER = os.path.abspath(os.path.join(os.path.dirname(__file__), "alarm_notify.py"))
 	_REPEAT_FOREVER = -1
@@ -199,7 +302,7 @@ class _DiabloAlarmHandler(object):
 			if self.isEnabled:
 				self._clear_alarm()
 			if enabled:
-				self._set_alarm(recurrence)
+				self._set_alarm(_get_alarm_minutes(recurrence))
 		self._recurrence = int(recurrence)
 
 	@property
@@ -292,7 +395,7 @@ def main():
 	parser.add_option("-x", "--display", action="store_true", dest="display", help="Display data")
 	parser.add_option("-e", "--enable", action="store_true", dest="enabled", help="Whether the alarm should be enabled or not", default=False)
 	parser.add_option("-d", "--disable", action="store_false", dest="enabled", help="Whether the alarm should be enabled or not", default=False)
-	parser.add_option("-r", "--recurrence", action="store", type="int", dest="recurrence", help="How often the alarm occurs", default=5)
+	parser.add_option("-r", "--recurrence", action="store", type="int", dest="recurrence", help="How often the alarm occurs (%d for adaptive)" % ADAPTIVE_RECURRENCE, default=5)
 	(commandOptions, commandArgs) = parser.parse_args()
 
 	alarmHandler = AlarmHandler()
@@ -301,10 +404,10 @@ def main():
 	alarmHandler.load_settings(config, "alarm")
 
 	if commandOptions.display:
-		print "Alarm (%s) is %s for every %d minutes" % (
+		print "Alarm (%s) is %s, polling %s" % (
 			alarmHandler._alarmCookie,
 			"enabled" if alarmHandler.isEnabled else "disabled",
-			alarmHandler.recurrence,
+			describe_recurrence(alarmHandler.recurrence),
 		)
 	else:
 		isEnabled = commandOptions.enabled
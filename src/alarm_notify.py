@@ -1,13 +1,25 @@
 #!/usr/bin/env python
 
 import os
-import filecmp
+import sys
+import time
+import errno
+import select
+import socket
+import hashlib
 import ConfigParser
-import pprint
 import logging
 
 import constants
-from backends import gvoice
+import alarm_handler
+
+
+_moduleLogger = logging.getLogger("alarm_notify")
+
+
+_DAEMON_SOCKET_PATH = os.path.join(constants._data_path_, "notifier.sock")
+_DIGESTS_PATH = os.path.join(constants._data_path_, "notifier_digests.txt")
+_DEFAULT_POLL_MINUTES = 5
 
 
 def get_missed(backend):
@@ -28,56 +40,164 @@ def get_sms(backend):
 	return smsJson
 
 
-def remove_reltime(data):
-	for messageData in data["messages"].itervalues():
-		del messageData["relativeStartTime"]
-		del messageData["labels"]
-		del messageData["isRead"]
-		del messageData["isSpam"]
-		del messageData["isTrash"]
-		del messageData["star"]
-
-
-def is_type_changed(backend, type, get_material):
+# Fields that change without the conversation itself changing
+_VOLATILE_FIELDS = frozenset((
+	"relativeStartTime",
+	"labels",
+	"isRead",
+	"isSpam",
+	"isTrash",
+	"star",
+))
+
+
+def digest_message(messageData):
+	"""
+	>>> digest_message({"id": "1", "isRead": True}) == digest_message({"id": "1", "isRead": False})
+	True
+	>>> digest_message({"id": "1"}) == digest_message({"id": "2"})
+	False
+	"""
+	content = sorted(
+		(key, value)
+		for (key, value) in messageData.iteritems()
+		if key not in _VOLATILE_FIELDS
+	)
+	return hashlib.md5(repr(content)).hexdigest()[:16]
+
+
+class DigestStore(object):
+	"""
+	Remembers a digest per conversation of each feed type so a poll can tell
+	which conversations are new or changed.  Only written back (atomically)
+	when something changed.
+	"""
+
+	def __init__(self, path = _DIGESTS_PATH):
+		self._path = path
+		self._digests = None
+		self._summaries = None
+		self._isDirty = False
+
+	def is_summary_changed(self, type, summary):
+		"""
+		@param summary (unread count, newest conversation id, its start time)
+			from the backend's unread summary
+		"""
+		if self._digests is None:
+			self._load()
+		return self._summaries.get(type, None) != self._format_summary(summary)
+
+	def set_summary(self, type, summary):
+		if self._digests is None:
+			self._load()
+		summary = self._format_summary(summary)
+		if self._summaries.get(type, None) != summary:
+			self._summaries[type] = summary
+			self._isDirty = True
+
+	def update(self, type, messages):
+		"""
+		@param messages The "messages" map of a feed's json
+		@returns Sorted ids of the new or changed conversations, or None if
+			the type hadn't been seen before
+		"""
+		if self._digests is None:
+			self._load()
+
+		currentDigests = dict(
+			(messageId, digest_message(messageData))
+			for (messageId, messageData) in messages.iteritems()
+		)
+		previousDigests = self._digests.get(type, None)
+		if currentDigests == previousDigests:
+			return []
+
+		self._digests[type] = currentDigests
+		self._isDirty = True
+		if previousDigests is None:
+			return None
+		return sorted(
+			messageId
+			for (messageId, digest) in currentDigests.iteritems()
+			if previousDigests.get(messageId, None) != digest
+		)
+
+	def save(self):
+		if not self._isDirty:
+			return
+		tempPath = "%s.tmp" % self._path
+		digestFile = open(tempPath, "w")
+		try:
+			for type, digests in self._digests.iteritems():
+				# A type with no conversations still needs to be remembered
+				digestFile.write("%s\t\t%s\n" % (type, self._summaries.get(type, "")))
+				for messageId, digest in digests.iteritems():
+					digestFile.write("%s\t%s\t%s\n" % (type, messageId, digest))
+		finally:
+			digestFile.close()
+		os.rename(tempPath, self._path)
+		self._isDirty = False
+
+	def _load(self):
+		digests = {}
+		summaries = {}
+		self._digests = digests
+		self._summaries = summaries
+		try:
+			digestFile = open(self._path, "r")
+		except IOError, e:
+			if e.errno != errno.ENOENT:
+				raise
+			return
+		try:
+			for line in digestFile:
+				try:
+					type, messageId, digest = line.rstrip("\n").split("\t")
+				except ValueError:
+					_moduleLogger.warning("Ignoring bad digest line %r" % line)
+					continue
+				typeDigests = digests.setdefault(type, {})
+				if messageId:
+					typeDigests[messageId] = digest
+				elif digest:
+					summaries[type] = digest
+		finally:
+			digestFile.close()
+
+	@staticmethod
+	def _format_summary(summary):
+		unreadCount, newestId, newestTime = summary
+		return "%d:%s:%s" % (unreadCount, newestId or "", newestTime or "")
+
+
+def find_type_changes(backend, type, get_material, digests, summary = None):
+	"""
+	@param summary (unread count, newest conversation id, its start time) for
+		the type, the full feed is only downloaded when this changed since the
+		last poll
+	@returns Ids of the new or changed conversations worth notifying about
+	"""
+	if summary is not None and not digests.is_summary_changed(type, summary):
+		return []
 	jsonMaterial = get_material(backend)
 	unreadCount = jsonMaterial["unreadCounts"][type]
-
-	previousSnapshotPath = os.path.join(constants._data_path_, "snapshot_%s.old.json" % type)
-	currentSnapshotPath = os.path.join(constants._data_path_, "snapshot_%s.json" % type)
-
-	try:
-		os.remove(previousSnapshotPath)
-	except OSError, e:
-		# check if failed purely because the old file didn't exist, which is fine
-		if e.errno != 2:
-			raise
-	try:
-		os.rename(currentSnapshotPath, previousSnapshotPath)
-		previousExists = True
-	except OSError, e:
-		# check if failed purely because the new old file didn't exist, which is fine
-		if e.errno != 2:
-			raise
-		previousExists = False
-
-	remove_reltime(jsonMaterial)
-	textMaterial = pprint.pformat(jsonMaterial)
-	currentSnapshot = file(currentSnapshotPath, "w")
-	try:
-		currentSnapshot.write(textMaterial)
-	finally:
-		currentSnapshot.close()
-
-	if unreadCount == 0 or not previousExists:
-		return False
-
-	seemEqual = filecmp.cmp(previousSnapshotPath, currentSnapshotPath)
-	return not seemEqual
+	changedIds = digests.update(type, jsonMaterial["messages"])
+	if summary is not None:
+		digests.set_summary(type, summary)
+	if unreadCount == 0 or changedIds is None:
+		return []
+	return changedIds
 
 
 def create_backend(config):
+	# Only imported when needed so handing a poll off to the daemon stays cheap
+	from backends import gvoice
+
 	gvCookiePath = os.path.join(constants._data_path_, "gv_cookies.txt")
-	backend = gvoice.GVoiceBackend(gvCookiePath)
+	# Kept apart from the application's cache as they each track their own size
+	httpCachePath = os.path.join(constants._data_path_, "notifier_http_cache")
+	backend = gvoice.GVoiceBackend(gvCookiePath, httpCachePath)
 
 	loggedIn = False
 
@@ -106,7 +226,11 @@ def create_backend(config):
 	return backend
 
 
-def is_changed(config, backend):
+def find_changes(config, backend, digests):
+	"""
+	@returns {type: ids of the new or changed conversations} for the types
+		the user wants to be notified about
+	"""
 	try:
 		notifyOnMissed = config.getboolean("2 - Account Info", "notifyOnMissed")
 		notifyOnVoicemail = config.getboolean("2 - Account Info", "notifyOnVoicemail")
@@ -131,11 +255,36 @@ def is_changed(config, backend):
 	if notifyOnSms:
 		notifySources.append(("sms", get_sms))
 
-	notifyUser = False
-	for type, get_material in notifySources:
-		if is_type_changed(backend, type, get_material):
-			notifyUser = True
-	return notifyUser
+	if not notifySources:
+		return {}
+
+	summaries = backend.get_unread_summary()
+	changes = {}
+	try:
+		for type, get_material in notifySources:
+			changedIds = find_type_changes(
+				backend, type, get_material, digests, summaries[type]
+			)
+			if changedIds:
+				changes[type] = changedIds
+	finally:
+		digests.save()
+	return changes
+
+
+def is_changed(config, backend, digests = None):
+	if digests is None:
+		digests = DigestStore()
+	changes = find_changes(config, backend, digests)
+	for type, changedIds in changes.iteritems():
+		logging.info("%s changed: %s" % (type, ", ".join(changedIds)))
+	return bool(changes)
+
+
+def notify_user():
+	import led_handler
+	led = led_handler.LedHandler()
+	led.on()
 
 
 def notify_on_change():
@@ -146,13 +295,269 @@ def notify_on_change():
 
 	if notifyUser:
 		logging.info("Changed")
-		import led_handler
-		led = led_handler.LedHandler()
-		led.on()
+		notify_user()
 	else:
 		logging.info("No Change")
 
 
+class NotifierDaemon(object):
+	"""
+	Stays resident with one logged in backend (and its kept-alive
+	connection), polling on its own schedule.  Controlled over a unix socket
+	with one line commands, see send_command
+	"""
+
+	_ALARM_SLACK_SECONDS = 60
+
+	def __init__(self, socketPath = _DAEMON_SOCKET_PATH):
+		self._socketPath = socketPath
+		self._backend = None
+		self._digests = DigestStore()
+		self._isQuitting = False
+		self._nextPoll = 0.0
+		self._schedule = alarm_handler.AdaptiveSchedule.from_recurrence(_DEFAULT_POLL_MINUTES)
+
+		self._pollCount = 0
+		self._lastPoll = None
+		self._lastResult = None
+
+		self._commands = {
+			"poll": self._on_poll,
+			"alarm": self._on_alarm,
+			"status": self._on_status,
+			"quit": self._on_quit,
+			"active": lambda: self._on_state_change(self._schedule.set_active, True),
+			"inactive": lambda: self._on_state_change(self._schedule.set_active, False),
+			"connected": lambda: self._on_state_change(self._schedule.set_connected, True),
+			"disconnected": lambda: self._on_state_change(self._schedule.set_connected, False),
+		}
+
+	def run(self):
+		listener = self._listen()
+		try:
+			self._nextPoll = time.time()
+			while not self._isQuitting:
+				if self._nextPoll is None:
+					timeout = None
+				else:
+					timeout = max(0.0, self._nextPoll - time.time())
+				readable, writable, errored = select.select([listener], [], [], timeout)
+				if readable:
+					connection, address = listener.accept()
+					try:
+						self._handle_connection(connection)
+					finally:
+						connection.close()
+				if self._isQuitting or self._nextPoll is None:
+					continue
+				if self._nextPoll <= time.time():
+					self.poll()
+		finally:
+			listener.close()
+			try:
+				os.remove(self._socketPath)
+			except OSError:
+				pass
+
+	def poll(self):
+		"""
+		@returns "changed", "unchanged", "error" or "disabled"
+		"""
+		config = self._load_config()
+		if not self._is_enabled(config):
+			# Turning notifications off also sends a quit, this covers it
+			# having been missed
+			logging.info("Notifications are off, quitting")
+			self._isQuitting = True
+			self._nextPoll = None
+			self._lastResult = "disabled"
+			return self._lastResult
+		self._schedule.configure(self._recurrence(config))
+		self._pollCount += 1
+		self._lastPoll = time.time()
+		try:
+			if self._backend is None:
+				self._backend = create_backend(config)
+			isChanged = is_changed(config, self._backend, self._digests)
+		except Exception:
+			_moduleLogger.exception("Poll failed")
+			# Start from a fresh login next time
+			self._backend = None
+			self._lastResult = "error"
+			self._schedule_poll(self._schedule.next_delay(False))
+			return self._lastResult
+
+		if isChanged:
+			logging.info("Changed")
+			try:
+				notify_user()
+			except Exception:
+				_moduleLogger.exception("Notification failed")
+			self._lastResult = "changed"
+		else:
+			logging.info("No Change")
+			self._lastResult = "unchanged"
+		self._schedule_poll(self._schedule.next_delay(isChanged))
+		return self._lastResult
+
+	def _schedule_poll(self, delayMinutes):
+		if delayMinutes is None:
+			self._nextPoll = None
+		else:
+			self._nextPoll = time.time() + 60 * delayMinutes
+
+	def _load_config(self):
+		config = ConfigParser.SafeConfigParser()
+		config.read(constants._user_settings_)
+		return config
+
+	@staticmethod
+	def _is_enabled(config):
+		try:
+			alarmCookie = config.getint("alarm", "alarmCookie")
+		except (ConfigParser.NoOptionError, ConfigParser.NoSectionError, ValueError):
+			return True
+		return alarmCookie != alarm_handler.INVALID_ALARM_COOKIE
+
+	@staticmethod
+	def _recurrence(config):
+		try:
+			recurrence = config.getint("alarm", "recurrence")
+		except (ConfigParser.NoOptionError, ConfigParser.NoSectionError, ValueError):
+			return _DEFAULT_POLL_MINUTES
+		if recurrence == alarm_handler.ADAPTIVE_RECURRENCE:
+			return recurrence
+		return max(1, recurrence)
+
+	def _listen(self):
+		try:
+			send_command("status", self._socketPath, 5)
+		except socket.error:
+			pass
+		else:
+			raise RuntimeError("Notifier daemon is already running")
+		try:
+			os.remove(self._socketPath)
+		except OSError, e:
+			if e.errno != errno.ENOENT:
+				raise
+		listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		listener.bind(self._socketPath)
+		listener.listen(5)
+		return listener
+
+	def _handle_connection(self, connection):
+		connection.settimeout(5)
+		stream = connection.makefile("r+", 0)
+		try:
+			command = stream.readline().strip()
+			handler = self._commands.get(command, None)
+			if handler is None:
+				reply = "unknown command %r" % command
+			else:
+				reply = handler()
+			stream.write("%s\n" % reply)
+		except socket.error:
+			_moduleLogger.exception("Control connection failed")
+		finally:
+			stream.close()
+
+	def _on_poll(self):
+		return self.poll()
+
+	def _on_alarm(self):
+		"""
+		The system alarm only forces a poll when the daemon's own schedule
+		is about due, so the two don't double up
+		"""
+		if self._nextPoll is None:
+			return "paused"
+		if self._nextPoll - time.time() <= self._ALARM_SLACK_SECONDS:
+			return self.poll()
+		return "scheduled"
+
+	def _on_state_change(self, set_state, state):
+		wasPaused = self._schedule.isPaused
+		set_state(state)
+		if self._schedule.isPaused:
+			self._nextPoll = None
+		elif wasPaused:
+			# Catch up on whatever was missed while paused
+			self._nextPoll = time.time()
+		return "paused" if self._schedule.isPaused else "ok"
+
+	def _on_status(self):
+		return "polls=%d lastPoll=%s lastResult=%s nextPoll=%s interval=%d" % (
+			self._pollCount,
+			int(self._lastPoll) if self._lastPoll is not None else "never",
+			self._lastResult,
+			int(self._nextPoll) if self._nextPoll is not None else "paused",
+			self._schedule.interval,
+		)
+
+	def _on_quit(self):
+		self._isQuitting = True
+		return "ok"
+
+
+def send_command(command, socketPath = _DAEMON_SOCKET_PATH, timeout = 120):
+	"""
+	@returns The daemon's reply
+	@note Raises socket.error when no daemon is listening
+	"""
+	connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		connection.settimeout(timeout)
+		connection.connect(socketPath)
+		stream = connection.makefile("r+", 0)
+		try:
+			stream.write("%s\n" % command)
+			return stream.readline().strip()
+		finally:
+			stream.close()
+	finally:
+		connection.close()
+
+
+def spawn_daemon():
+	import subprocess
+	devnull = open(os.devnull, "r+")
+	try:
+		subprocess.Popen(
+			[sys.executable, os.path.abspath(__file__), "--daemon"],
+			stdin=devnull, stdout=devnull, stderr=devnull,
+			close_fds=True,
+		)
+	finally:
+		devnull.close()
+
+
+def run_alarm():
+	"""
+	What the alarm framework launches, hands the poll to the daemon when it
+	is running, otherwise starts it (it polls right away)
+	"""
+	try:
+		reply = send_command("alarm")
+		logging.info("Daemon poll: %s" % reply)
+	except socket.error:
+		logging.info("No daemon, starting one")
+		spawn_daemon()
+
+
+def main(args):
+	if args == ["--daemon"]:
+		NotifierDaemon().run()
+	elif args == ["--once"]:
+		notify_on_change()
+	elif args[:1] == ["--control"] and len(args) == 2:
+		print send_command(args[1])
+	elif not args:
+		run_alarm()
+	else:
+		raise RuntimeError("Usage: alarm_notify.py [--daemon | --once | --control COMMAND]")
+
+
 if __name__ == "__main__":
 	logging.basicConfig(level=logging.WARNING, filename=constants._notifier_logpath_)
 	logging.info("Notifier %s-%s" % (constants.__version__, constants.__build__))
@@ -160,7 +565,7 @@ if __name__ == "__main__":
 	logging.info("Kernel: %s (%s) for %s" % os.uname()[2:])
 	logging.info("Hostname: %s" % os.uname()[1])
 	try:
-		notify_on_change()
+		main(sys.argv[1:])
 	except:
 		logging.exception("Error")
 		raise
@@ -9,7 +9,9 @@ Objects of the MozillaEmulator class can emulate a browser that is capable of:
 	- configurable user agent string
 	- GET and POST
 	- multipart POST (send files)
-	- receive content into file
+	- receive content into file, resuming partial downloads
+	- conditional GETs answered from an optional disk cache
+	- gzip and deflate compressed responses, decoded as they arrive
 
 I have seen many requests on the python mailing list about how to emulate a browser. I'm using this class for years now, without any problems. This is how you can use it:
 
@@ -25,12 +27,18 @@ Optional steps:
 	- The "encode_multipart_formdata" function can be used alone to create POST data from a list of field values and files
 """
 
+import os
+import re
+import time
+import zlib
+import socket
+import urllib
+import httplib
 import urllib2
 import cookielib
+import threading
 import logging
 
-import socket
-
 
 _moduleLogger = logging.getLogger(__name__)
 socket.setdefaulttimeout(45)
@@ -48,17 +56,23 @@ def add_proxy(protocol, url, port):
 class MozillaEmulator(object):
 
 	USER_AGENT = 'Mozilla/5.0 (Windows; U; Windows NT 5.1; de; rv:1.9.1.4) Gecko/20091016 Firefox/3.5.4 (.NET CLR 3.5.30729)'
+	ACCEPT_ENCODING = 'gzip, deflate'
+	_READ_SIZE = 16 * 1024
 
-	def __init__(self, trycount = 1):
+	def __init__(self, trycount = 1, cache = None):
 		"""Create a new MozillaEmulator object.
 
 		@param trycount: The download() method will retry the operation if it
 		fails. You can specify -1 for infinite retrying.  A value of 0 means no
-		retrying. A value of 1 means one retry. etc."""
+		retrying. A value of 1 means one retry. etc.
+		@param cache: An http_cache.HttpCache for GET responses, or None"""
 		self.debug = False
+		self._cache = cache
 		self.trycount = trycount
-		self._cookies = cookielib.LWPCookieJar()
+		self._cookies = SynchronizedLWPCookieJar()
 		self._loadedFromCookies = False
+		self._connectionPool = ConnectionPool()
+		self.stats = TransferStats()
 
 	def load_cookies(self, path):
 		assert not self._loadedFromCookies, "Load cookies only once"
@@ -86,6 +100,16 @@ class MozillaEmulator(object):
 		if self._loadedFromCookies:
 			self._cookies.clear()
 
+	def close_connections(self):
+		"""
+		Drop all idle keep-alive connections
+		"""
+		self._connectionPool.clear()
+
+	def clear_cache(self):
+		if self._cache is not None:
+			self._cache.clear()
+
 	def download(self, url,
 			postdata = None, extraheaders = None, forbidRedirect = False,
 			trycount = None, only_head = False,
@@ -113,10 +137,30 @@ class MozillaEmulator(object):
 			trycount = self.trycount
 		cnt = 0
 
+		isCacheable = self._cache is not None and postdata is None and not only_head
+		if not only_head:
+			# Callers of only_head read the response themselves, so leave it uncompressed
+			extraheaders = dict(extraheaders)
+			extraheaders.setdefault("Accept-Encoding", self.ACCEPT_ENCODING)
+		requestHeaders = extraheaders
+		if isCacheable:
+			requestHeaders = dict(extraheaders)
+			requestHeaders.update(self._cache.get_validators(url))
+
 		while True:
 			try:
-				req, u = self._build_opener(url, postdata, extraheaders, forbidRedirect)
-				openerdirector = u.open(req)
+				req, u = self._build_opener(url, postdata, requestHeaders, forbidRedirect)
+				try:
+					openerdirector = u.open(req)
+				except urllib2.HTTPError, e:
+					if not (isCacheable and e.code == 304):
+						raise
+					data = self._read_not_modified(e, req, url)
+					if data is not None:
+						return data
+					# The cached copy went away, so ask for the whole page
+					requestHeaders = extraheaders
+					continue
 				if self.debug:
 					_moduleLogger.info("%r - %r" % (req.get_method(), url))
 					_moduleLogger.info("%r - %r" % (openerdirector.code, openerdirector.msg))
@@ -125,7 +169,10 @@ class MozillaEmulator(object):
 				if only_head:
 					return openerdirector
 
-				return self._read(openerdirector, trycount)
+				data = self._read(openerdirector, url)
+				if isCacheable and openerdirector.geturl() == url:
+					self._cache.store(url, openerdirector.info(), data)
+				return data
 			except urllib2.URLError, e:
 				_moduleLogger.debug("%s: %s" % (e, url))
 				cnt += 1
@@ -135,6 +182,115 @@ class MozillaEmulator(object):
 			# Retry :-)
 			_moduleLogger.debug("MozillaEmulator: urllib2.URLError, retrying %d" % cnt)
 
+	def download_to(self, url, path, extraheaders = None, progress = None, trycount = None):
+		"""Stream a GET into a file without holding the body in memory.
+
+		The body goes to path + ".part" first and is only renamed to path once
+		complete.  A ".part" left behind by an earlier (failed) attempt is
+		resumed with a Range request.
+
+		@param progress: Called with (bytes so far, total bytes or None) as
+			the download advances, the ".part" file is flushed before each call
+		@param trycount: As for download, retries resume where they left off
+		@return: path
+		"""
+		if extraheaders is None:
+			extraheaders = {}
+		if trycount is None:
+			trycount = self.trycount
+		partPath = path + ".part"
+		cnt = 0
+
+		while True:
+			try:
+				self._download_part(url, partPath, extraheaders, progress)
+				break
+			except TRANSFER_ERRORS, e:
+				_moduleLogger.debug("%s: %s" % (e, url))
+				cnt += 1
+				if (-1 < trycount) and (trycount < cnt):
+					raise
+
+			# Retry :-)
+			_moduleLogger.debug("MozillaEmulator: %r, resuming %d" % (e, cnt))
+
+		os.rename(partPath, path)
+		return path
+
+	def _download_part(self, url, partPath, extraheaders, progress):
+		try:
+			offset = os.path.getsize(partPath)
+		except OSError:
+			offset = 0
+
+		headers = dict(extraheaders)
+		# Byte ranges are only meaningful against the unencoded body
+		headers["Accept-Encoding"] = "identity"
+		if offset:
+			headers["Range"] = "bytes=%d-" % offset
+		req, u = self._build_opener(url, None, headers)
+		try:
+			response = u.open(req)
+		except urllib2.HTTPError, e:
+			if e.code != 416 or not offset:
+				raise
+			# Whatever is in the partial file doesn't match the server's copy
+			e.close()
+			os.remove(partPath)
+			return self._download_part(url, partPath, extraheaders, progress)
+		self._cookies.extract_cookies(response, req)
+
+		try:
+			info = response.info()
+			if response.code == 206:
+				start, total = _parse_content_range(info.get("Content-Range", ""))
+				if start != offset:
+					raise urllib2.URLError("Asked for bytes from %d but got them from %s" % (offset, start))
+				mode = "ab"
+			else:
+				# The server ignored the range, so start over
+				offset = 0
+				mode = "wb"
+				total = info.get("Content-Length", None)
+				if total is not None:
+					total = int(total)
+
+			done = offset
+			partFile = open(partPath, mode)
+			try:
+				if progress is not None:
+					progress(done, total)
+				while True:
+					chunk = response.read(self._READ_SIZE)
+					if not chunk:
+						break
+					partFile.write(chunk)
+					done += len(chunk)
+					if progress is not None:
+						partFile.flush()
+						progress(done, total)
+			finally:
+				partFile.close()
+		finally:
+			response.close()
+
+		self.stats.record(done - offset, done - offset)
+		if total is not None and done != total:
+			raise urllib2.URLError("Download stopped at %d of %d bytes" % (done, total))
+
+	def _read_not_modified(self, response, req, url):
+		"""
+		@returns The cached body to answer a 304 with, or None if it is gone
+		"""
+		if self.debug:
+			_moduleLogger.info("%r - %r" % (req.get_method(), url))
+			_moduleLogger.info("304 - Not Modified")
+		self._cookies.extract_cookies(response, req)
+		# Drain the (empty) body so the connection goes back to the pool
+		response.read()
+		response.close()
+		return self._cache.get_body(url)
+
 	def _build_opener(self, url, postdata = None, extraheaders = None, forbidRedirect = False):
 		if extraheaders is None:
 			extraheaders = {}
@@ -156,8 +312,8 @@ class MozillaEmulator(object):
 			redirector = urllib2.HTTPRedirectHandler()
 			#_moduleLogger.info("Redirection enabled")
 
-		http_handler = urllib2.HTTPHandler(debuglevel=self.debug)
-		https_handler = urllib2.HTTPSHandler(debuglevel=self.debug)
+		http_handler = KeepAliveHTTPHandler(self._connectionPool, debuglevel=self.debug)
+		https_handler = KeepAliveHTTPSHandler(self._connectionPool, debuglevel=self.debug)
 
 		u = urllib2.build_opener(
 			http_handler,
@@ -169,27 +325,370 @@ class MozillaEmulator(object):
 			req.add_data(postdata)
 		return (req, u)
 
-	def _read(self, openerdirector, trycount):
-		chunks = []
+	def _read(self, openerdirector, url):
+		"""
+		Read the body, decoding it as it arrives when it is compressed
+		"""
+		info = openerdirector.info()
+		encoding = (info.get("Content-Encoding", None) or "identity").strip().lower()
+		decoder = _create_decoder(encoding)
 
-		chunk = openerdirector.read()
-		chunks.append(chunk)
-		#while chunk and cnt < trycount:
-		#	time.sleep(1)
-		#	cnt += 1
-		#	chunk = openerdirector.read()
-		#	chunks.append(chunk)
+		chunks = []
+		wireSize = 0
+		while True:
+			chunk = openerdirector.read(self._READ_SIZE)
+			if not chunk:
+				break
+			wireSize += len(chunk)
+			chunks.append(decoder.decompress(chunk))
+		chunks.append(decoder.flush())
 
 		data = "".join(chunks)
 
-		if "Content-Length" in openerdirector.info():
-			assert len(data) == int(openerdirector.info()["Content-Length"]), "The packet header promised %s of data but only was able to read %s of data" % (
-				openerdirector.info()["Content-Length"],
-				len(data),
+		if "Content-Length" in info:
+			# Content-Length counts the body as sent, before decoding
+			assert wireSize == int(info["Content-Length"]), "The packet header promised %s of data but only was able to read %s of data" % (
+				info["Content-Length"],
+				wireSize,
 			)
 
+		self.stats.record(wireSize, len(data))
+		_moduleLogger.debug("%s: %d bytes (%s) decoded to %d" % (url, wireSize, encoding, len(data)))
+		return data
+
+
+TRANSFER_ERRORS = (urllib2.URLError, socket.error, httplib.HTTPException)
+_CONTENT_RANGE_REGEX = re.compile(r"""bytes\s+(\d+)-\d+/(\d+|\*)""")
+
+
+def _parse_content_range(contentRange):
+	"""
+	@returns (first byte, total size or None)
+
+	>>> _parse_content_range("bytes 100-199/200")
+	(100, 200)
+	>>> _parse_content_range("bytes 0-99/*")
+	(0, None)
+	"""
+	match = _CONTENT_RANGE_REGEX.match(contentRange.strip())
+	if match is None:
+		raise urllib2.URLError("Bad Content-Range %r" % contentRange)
+	start, total = match.groups()
+	if total == "*":
+		return int(start), None
+	return int(start), int(total)
+
+
+class SynchronizedLWPCookieJar(cookielib.LWPCookieJar):
+	"""
+	CookieJar only holds its lock while handling requests and responses,
+	saving, loading, clearing and iterating go through the cookies unguarded
+	while other downloads may be changing them
+	"""
+
+	def save(self, *args, **kwds):
+		self._cookies_lock.acquire()
+		try:
+			cookielib.LWPCookieJar.save(self, *args, **kwds)
+		finally:
+			self._cookies_lock.release()
+
+	def load(self, *args, **kwds):
+		self._cookies_lock.acquire()
+		try:
+			cookielib.LWPCookieJar.load(self, *args, **kwds)
+		finally:
+			self._cookies_lock.release()
+
+	def clear(self, *args, **kwds):
+		self._cookies_lock.acquire()
+		try:
+			cookielib.LWPCookieJar.clear(self, *args, **kwds)
+		finally:
+			self._cookies_lock.release()
+
+	def __iter__(self):
+		self._cookies_lock.acquire()
+		try:
+			cookies = list(cookielib.LWPCookieJar.__iter__(self))
+		finally:
+			self._cookies_lock.release()
+		return iter(cookies)
+
+
+class TransferStats(object):
+	"""
+	Running totals of the bytes sent over the wire against the bytes they
+	decoded to
+	"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self.requests = 0
+		self.wireBytes = 0
+		self.bodyBytes = 0
+
+	def record(self, wireBytes, bodyBytes):
+		self._lock.acquire()
+		try:
+			self.requests += 1
+			self.wireBytes += wireBytes
+			self.bodyBytes += bodyBytes
+		finally:
+			self._lock.release()
+
+	@property
+	def compressionRatio(self):
+		"""
+		@returns Decoded bytes per byte transferred
+		"""
+		if self.wireBytes == 0:
+			return 1.0
+		return float(self.bodyBytes) / self.wireBytes
+
+	def __str__(self):
+		return "%d requests, %d bytes transferred for %d (%.1fx)" % (
+			self.requests, self.wireBytes, self.bodyBytes, self.compressionRatio,
+		)
+
+
+class _IdentityDecoder(object):
+
+	def decompress(self, data):
+		return data
+
+	def flush(self):
+		return ""
+
+
+class _DeflateDecoder(object):
+	"""
+	"deflate" is meant to be zlib wrapped but some servers send it raw
+	"""
+
+	def __init__(self):
+		self._decompressor = zlib.decompressobj()
+		self._isStarted = False
+
+	def decompress(self, data):
+		if not self._isStarted:
+			self._isStarted = True
+			try:
+				return self._decompressor.decompress(data)
+			except zlib.error:
+				self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+		return self._decompressor.decompress(data)
+
+	def flush(self):
+		return self._decompressor.flush()
+
+
+def _create_decoder(encoding):
+	if encoding in ("gzip", "x-gzip"):
+		# The extra 16 has zlib expect a gzip header and trailer
+		return zlib.decompressobj(16 + zlib.MAX_WBITS)
+	elif encoding == "deflate":
+		return _DeflateDecoder()
+	else:
+		if encoding != "identity":
+			_moduleLogger.warning("Unsupported content encoding %r" % encoding)
+		return _IdentityDecoder()
+
+
+class ConnectionPool(object):
+	"""
+	Keeps idle HTTP/1.1 connections around so later requests to the same
+	host can skip the TCP connect and TLS handshake.
+
+	Only idle connections are pooled, at most maxPerHost of them for each
+	(scheme, host).  A connection that sat idle for longer than idleTimeout
+	seconds is assumed to have been dropped by the server and is closed
+	instead of reused.
+	"""
+
+	def __init__(self, maxPerHost = 2, idleTimeout = 60):
+		self._maxPerHost = maxPerHost
+		self._idleTimeout = idleTimeout
+		self._lock = threading.Lock()
+		self._idle = {}
+
+	def get(self, key, connectionFactory):
+		"""
+		@returns (connection, isReused)
+		"""
+		now = time.time()
+		expired = []
+		connection = None
+		self._lock.acquire()
+		try:
+			idleConnections = self._idle.get(key, [])
+			while idleConnections:
+				idleConnection, lastUsed = idleConnections.pop()
+				if self._idleTimeout < now - lastUsed:
+					expired.append(idleConnection)
+				else:
+					connection = idleConnection
+					break
+		finally:
+			self._lock.release()
+
+		for idleConnection in expired:
+			idleConnection.close()
+
+		if connection is not None:
+			return connection, True
+		else:
+			return connectionFactory(), False
+
+	def put(self, key, connection):
+		self._lock.acquire()
+		try:
+			idleConnections = self._idle.setdefault(key, [])
+			if len(idleConnections) < self._maxPerHost:
+				idleConnections.append((connection, time.time()))
+				connection = None
+		finally:
+			self._lock.release()
+
+		if connection is not None:
+			connection.close()
+
+	def clear(self):
+		self._lock.acquire()
+		try:
+			idle = self._idle
+			self._idle = {}
+		finally:
+			self._lock.release()
+
+		for idleConnections in idle.itervalues():
+			for connection, lastUsed in idleConnections:
+				connection.close()
+
+	def idle_count(self, key):
+		self._lock.acquire()
+		try:
+			return len(self._idle.get(key, []))
+		finally:
+			self._lock.release()
+
+
+class _PooledResponse(object):
+	"""
+	Hands the connection back to the pool once the body has been fully read
+	"""
+
+	def __init__(self, response, connection, pool, key):
+		self._response = response
+		self._connection = connection
+		self._pool = pool
+		self._key = key
+
+	def read(self, amt = None):
+		if amt is None:
+			data = self._response.read()
+		else:
+			data = self._response.read(amt)
+		if self._response.isclosed():
+			self._release()
 		return data
 
+	recv = read
+
+	def close(self):
+		self._response.close()
+		self._release()
+
+	def _release(self):
+		connection, self._connection = self._connection, None
+		if connection is None:
+			return
+
+		isComplete = self._response.isclosed()
+		if isComplete and not self._response.will_close:
+			self._pool.put(self._key, connection)
+		else:
+			connection.close()
+
+
+_STALE_CONNECTION_ERRORS = (socket.error, httplib.BadStatusLine, httplib.CannotSendRequest)
+
+
+def _open_pooled(handler, pool, connectionClass, req):
+	if getattr(req, "_tunnel_host", None):
+		# Proxy tunnels are tied to a single request, leave them to urllib2
+		return handler.do_open(connectionClass, req)
+
+	host = req.get_host()
+	if not host:
+		raise urllib2.URLError('no host given')
+	key = req.get_type(), host
+	timeout = getattr(req, "timeout", None)
+
+	def create_connection():
+		if timeout is None:
+			connection = connectionClass(host)
+		else:
+			connection = connectionClass(host, timeout=timeout)
+		connection.set_debuglevel(handler._debuglevel)
+		return connection
+
+	headers = dict(req.unredirected_hdrs)
+	headers.update(dict(
+		(k, v) for k, v in req.headers.items()
+		if k not in headers
+	))
+	headers["Connection"] = "keep-alive"
+	headers = dict(
+		(name.title(), val) for name, val in headers.items()
+	)
+
+	connection, isReused = pool.get(key, create_connection)
+	try:
+		try:
+			connection.request(req.get_method(), req.get_selector(), req.data, headers)
+			response = connection.getresponse()
+		except _STALE_CONNECTION_ERRORS, e:
+			connection.close()
+			if not isReused:
+				raise
+			# The server dropped the idle connection, so try again on a fresh one
+			_moduleLogger.debug("Reconnecting to %s after %r" % (host, e))
+			connection = create_connection()
+			connection.request(req.get_method(), req.get_selector(), req.data, headers)
+			response = connection.getresponse()
+	except socket.error, e:
+		connection.close()
+		raise urllib2.URLError(e)
+
+	pooledResponse = _PooledResponse(response, connection, pool, key)
+	fp = socket._fileobject(pooledResponse, close=True)
+
+	resp = urllib.addinfourl(fp, response.msg, req.get_full_url())
+	resp.code = response.status
+	resp.msg = response.reason
+	return resp
+
+
+class KeepAliveHTTPHandler(urllib2.HTTPHandler):
+
+	def __init__(self, pool, debuglevel = 0):
+		urllib2.HTTPHandler.__init__(self, debuglevel)
+		self._pool = pool
+
+	def http_open(self, req):
+		return _open_pooled(self, self._pool, httplib.HTTPConnection, req)
+
+
+class KeepAliveHTTPSHandler(urllib2.HTTPSHandler):
+
+	def __init__(self, pool, debuglevel = 0):
+		urllib2.HTTPSHandler.__init__(self, debuglevel)
+		self._pool = pool
+
+	def https_open(self, req):
+		return _open_pooled(self, self._pool, httplib.HTTPSConnection, req)
+
 
 class HTTPNoRedirector(urllib2.HTTPRedirectHandler):
 	"""This is a custom http redirect handler that FORBIDS redirection."""
@@ -27,10 +27,15 @@ Resources
 
 from __future__ import with_statement
 
+import os
+import time
 import itertools
+import threading
+import cPickle
 import logging
 
 import gvoice
+import voicemail_cache
 
 
 _moduleLogger = logging.getLogger("gv_backend")
@@ -38,10 +43,40 @@ _moduleLogger = logging.getLogger("gv_backend")
 
 class GVDialer(object):
 
-	def __init__(self, cookieFile = None):
-		self._gvoice = gvoice.GVoiceBackend(cookieFile)
-
+	# Contacts older than this get refreshed in the background
+	_CONTACTS_MAX_AGE = 6 * 60 * 60
+	_CONTACTS_CACHE_VERSION = 1
+
+	def __init__(self,
+		cookieFile = None,
+		contactsCacheFile = None,
+		httpCachePath = None,
+		voicemailCachePath = None,
+		voicemailCacheBytes = 10 * 1024 * 1024,
+		spawn = None,
+	):
+		"""
+		@param spawn Called as spawn(func, *args) to run func in the background,
+			like on a shared task pool.  Without it a thread is started.
+		"""
+		self._gvoice = gvoice.GVoiceBackend(cookieFile, httpCachePath)
+		if voicemailCachePath is not None:
+			self._voicemailCache = voicemail_cache.VoicemailCache(voicemailCachePath, voicemailCacheBytes)
+		else:
+			self._voicemailCache = None
+		self._voicemailCacheBytes = voicemailCacheBytes
+
+		self._spawn = spawn
+
+		self._contactsCacheFile = contactsCacheFile
+		self._contactsLock = threading.Lock()
+		# Bumped on logout so a refresh under way doesn't bring back the
+		# previous account's contacts
+		self._contactsGeneration = 0
 		self._contacts = None
+		self._contactsTimestamp = 0.0
+		self._isContactsRevalidationNeeded = False
+		self._isContactsRevalidating = False
 
 	def is_quick_login_possible(self):
 		"""
@@ -65,6 +100,12 @@ class GVDialer(object):
 		return self._gvoice.login(username, password)
 
 	def logout(self):
+		with self._contactsLock:
+			self._contacts = None
+			self._contactsGeneration += 1
+		if self._voicemailCache is not None:
+			self._voicemailCache.set_playing(None)
+			self._voicemailCache.clear()
 		return self._gvoice.logout()
 
 	def is_dnd(self):
@@ -99,15 +140,37 @@ class GVDialer(object):
 	def get_feed(self, feed):
 		return self._gvoice.get_feed(feed)
 
-	def download(self, messageId, adir):
+	def download(self, messageId, adir, progress = None):
 		"""
 		Download a voicemail or recorded call MP3 matching the given ``msg``
 		which can either be a ``Message`` instance, or a SHA1 identifier. 
 		Saves files to ``adir`` (defaults to current directory). 
 		Message hashes can be found in ``self.voicemail().messages`` for example. 
 		Returns location of saved file.
-		"""
-		return self._gvoice.download(messageId, adir)
+		@note With a voicemail cache the file is saved in (and replayed from) the
+			cache instead of adir, and is kept while it is the last one downloaded
+			for playing
+		"""
+		if self._voicemailCache is None:
+			return self._gvoice.download(messageId, adir, progress)
+		return self._voicemailCache.fetch(messageId, self._gvoice.download, progress, isPlaying=True)
+
+	def prefetch_voicemails(self):
+		"""
+		Download the unread voicemails that aren't cached yet, for when the
+		connection is cheap
+		@returns How many were downloaded
+		"""
+		if self._voicemailCache is None:
+			return 0
+		unread = [
+			conversation.id
+			for conversation in self._gvoice.get_voicemails()
+			if not conversation.isRead and conversation.id not in self._voicemailCache
+		]
+		for messageId in unread:
+			self._voicemailCache.fetch(messageId, self._gvoice.download)
+		return len(unread)
 
 	def is_valid_syntax(self, number):
 		"""
@@ -150,11 +213,12 @@ class GVDialer(object):
 	def get_contacts(self):
 		"""
 		@returns Iterable of (contact id, contact name)
+		@note Only blocks on the network when there are no cached contacts
 		"""
-		self._update_contacts_cache()
+		contacts = self._get_contacts_cache()
 		contactsToSort = [
 			(contactDetails["name"], contactId)
-			for contactId, contactDetails in self._contacts.iteritems()
+			for contactId, contactDetails in contacts.iteritems()
 		]
 		contactsToSort.sort()
 		return (
@@ -166,9 +230,7 @@ class GVDialer(object):
 		"""
 		@returns Iterable of (Phone Type, Phone Number)
 		"""
-		if self._contacts is None:
-			self._update_contacts_cache()
-		contactDetails = self._contacts[contactId]
+		contactDetails = self._get_contacts_cache()[contactId]
 		# Defaulting phoneTypes because those are just things like faxes
 		return (
 			(number.get("phoneType", ""), number["phoneNumber"])
@@ -180,32 +242,24 @@ class GVDialer(object):
 		smss = self._gvoice.get_texts()
 		conversations = itertools.chain(voicemails, smss)
 		for conversation in conversations:
-			messages = conversation.messages
-			messageParts = (
-				(message.whoFrom, self._format_message(message), message.when)
-				for message in messages
-			)
-
-			messageDetails = {
-				"id": conversation.id,
-				"contactId": conversation.contactId,
-				"name": conversation.name,
-				"time": conversation.time,
-				"relTime": conversation.relTime,
-				"prettyNumber": conversation.prettyNumber,
-				"number": conversation.number,
-				"location": conversation.location,
-				"messageParts": messageParts,
-				"type": conversation.type,
-				"isRead": conversation.isRead,
-				"isTrash": conversation.isTrash,
-				"isSpam": conversation.isSpam,
-				"isArchived": conversation.isArchived,
-			}
-			yield messageDetails
+			yield self._to_message_details(conversation)
 
 	def clear_caches(self):
-		pass
+		"""
+		Drop the in-memory contacts, the next lookup is served from disk while
+		the contacts are refreshed in the background
+		"""
+		with self._contactsLock:
+			self._contacts = None
+			self._isContactsRevalidationNeeded = True
+
+	def trim_caches(self):
+		"""
+		Cut the voicemail cache down to half its budget, for when memory or
+		storage runs low
+		"""
+		if self._voicemailCache is not None:
+			self._voicemailCache.trim(self._voicemailCacheBytes / 2)
 
 	def get_addressbooks(self):
 		"""
@@ -224,8 +278,118 @@ class GVDialer(object):
 	def factory_name():
 		return "Google Voice"
 
-	def _update_contacts_cache(self):
-		self._contacts = dict(self._gvoice.get_contacts())
+	def _get_contacts_cache(self):
+		with self._contactsLock:
+			contacts = self._contacts
+			timestamp = self._contactsTimestamp
+			isRevalidationNeeded = self._isContactsRevalidationNeeded
+			generation = self._contactsGeneration
+
+		if contacts is None:
+			contacts, timestamp = self._load_contacts_cache()
+			if contacts is None:
+				return self._update_contacts_cache(generation)
+			with self._contactsLock:
+				if self._contacts is None:
+					self._contacts = contacts
+					self._contactsTimestamp = timestamp
+
+		if isRevalidationNeeded or self._CONTACTS_MAX_AGE < time.time() - timestamp:
+			self._spawn_contacts_revalidation()
+		return contacts
+
+	def _update_contacts_cache(self, generation):
+		contacts = dict(self._gvoice.get_contacts())
+		timestamp = time.time()
+		with self._contactsLock:
+			if generation != self._contactsGeneration:
+				_moduleLogger.info("Dropping contacts fetched before a logout")
+				return contacts
+			self._contacts = contacts
+			self._contactsTimestamp = timestamp
+			# Saved under the lock so a logout can't remove the file in between
+			self._save_contacts_cache(contacts, timestamp)
+		return contacts
+
+	def _spawn_contacts_revalidation(self):
+		with self._contactsLock:
+			if self._isContactsRevalidating:
+				return
+			self._isContactsRevalidating = True
+			self._isContactsRevalidationNeeded = False
+			generation = self._contactsGeneration
+		if self._spawn is not None:
+			self._spawn(self._revalidate_contacts, generation)
+		else:
+			revalidationThread = threading.Thread(target=self._revalidate_contacts, args=(generation, ))
+			revalidationThread.setDaemon(True)
+			revalidationThread.start()
+
+	def _revalidate_contacts(self, generation):
+		try:
+			self._update_contacts_cache(generation)
+		except Exception:
+			_moduleLogger.exception("Failed to refresh contacts")
+		finally:
+			with self._contactsLock:
+				self._isContactsRevalidating = False
+
+	def _load_contacts_cache(self):
+		"""
+		@returns (contacts, timestamp) or (None, 0.0) if nothing usable is cached
+		"""
+		if self._contactsCacheFile is None:
+			return None, 0.0
+		try:
+			with open(self._contactsCacheFile, "rb") as cacheFile:
+				version, timestamp, contacts = cPickle.load(cacheFile)
+		except IOError:
+			return None, 0.0
+		except Exception:
+			_moduleLogger.exception("Ignoring corrupt contacts cache")
+			return None, 0.0
+		if version != self._CONTACTS_CACHE_VERSION:
+			return None, 0.0
+		return contacts, timestamp
+
+	def _save_contacts_cache(self, contacts, timestamp):
+		if self._contactsCacheFile is None:
+			return
+		tempPath = "%s.tmp" % self._contactsCacheFile
+		try:
+			with open(tempPath, "wb") as cacheFile:
+				cPickle.dump(
+					(self._CONTACTS_CACHE_VERSION, timestamp, contacts),
+					cacheFile,
+					cPickle.HIGHEST_PROTOCOL,
+				)
+			os.rename(tempPath, self._contactsCacheFile)
+		except (IOError, OSError):
+			_moduleLogger.exception("Failed to save contacts cache")
+
+	def _to_message_details(self, conversation):
+		messageParts = [
+			(message.whoFrom, self._format_message(message), message.when)
+			for message in conversation.messages
+		]
+
+		messageDetails = {
+			"id": conversation.id,
+			"contactId": conversation.contactId,
+			"name": conversation.name,
+			"time": conversation.time,
+			"relTime": conversation.relTime,
+			"prettyNumber": conversation.prettyNumber,
+			"number": conversation.number,
+			"location": conversation.location,
+			"messageParts": messageParts,
+			"type": conversation.type,
+			"isRead": conversation.isRead,
+			"isTrash": conversation.isTrash,
+			"isSpam": conversation.isSpam,
+			"isArchived": conversation.isArchived,
+		}
+		return messageDetails
 
 	def _format_message(self, message):
 		messagePartFormat = {
@@ -36,6 +36,8 @@ import datetime
 import itertools
 import logging
 import inspect
+import threading
+import Queue
 
 from xml.sax import saxutils
 from xml.etree import ElementTree
@@ -47,6 +49,8 @@ except ImportError:
 	simplejson = None
 
 import browser_emu
+import http_cache
+import js_literal
 
 
 _moduleLogger = logging.getLogger(__name__)
@@ -140,6 +144,173 @@ class Conversation(object):
 		return selfDict
 
 
+class ConversationSync(object):
+	"""
+	Remembers the conversations of a feed so a refresh only runs the full
+	parse on the html of conversations that are new or whose json metadata
+	changed.  Read/label changes are applied to the already parsed
+	conversation.
+	"""
+
+	# Changing these doesn't change what was parsed out of the html
+	_FLAG_FIELDS = frozenset(("isRead", "isSpam", "isTrash", "labels", "star"))
+	# Changes every refresh without the conversation changing
+	_VOLATILE_FIELDS = frozenset(("relativeStartTime", ))
+
+	def __init__(self, split_conversations, parse_conversation):
+		"""
+		@param split_conversations(html) -> Iterable of (messageId, messageHtml)
+		@param parse_conversation(messageId, messageHtml) -> Conversation
+		"""
+		self._split_conversations = split_conversations
+		self._parse_conversation = parse_conversation
+		self._lock = threading.Lock()
+		self._known = {}
+		self._conversations = []
+
+	def update(self, json, html):
+		"""
+		@returns (added conversations, updated conversations, removed ids)
+		@note Thread Agnostic, concurrent updates are applied one after another
+		"""
+		with self._lock:
+			return self._update(json, html)
+
+	def get_conversations(self):
+		with self._lock:
+			return list(self._conversations)
+
+	def clear(self):
+		with self._lock:
+			self._known = {}
+			self._conversations = []
+
+	def _update(self, json, html):
+		jsonMessages = json["messages"]
+
+		added = []
+		updated = []
+		known = {}
+		conversations = []
+		for messageId, messageHtml in self._split_conversations(html):
+			jsonItem = jsonMessages[messageId]
+			signature = self._content_signature(jsonItem)
+
+			previous = self._known.get(messageId, None)
+			if previous is not None and previous[0] == signature:
+				conversation = previous[1]
+				isChanged = merge_conversation_flags(conversation, jsonItem)
+				relTime = jsonItem.get("relativeStartTime", None)
+				if relTime is not None:
+					conversation.relTime = relTime
+				if isChanged:
+					updated.append(conversation)
+			else:
+				conversation = self._parse_conversation(messageId, messageHtml)
+				merge_conversation_flags(conversation, jsonItem)
+				if previous is None:
+					added.append(conversation)
+				else:
+					updated.append(conversation)
+
+			known[messageId] = signature, conversation
+			conversations.append(conversation)
+
+		removed = [
+			messageId
+			for messageId in self._known.iterkeys()
+			if messageId not in known
+		]
+		self._known = known
+		self._conversations = conversations
+		return added, updated, removed
+
+	@classmethod
+	def _content_signature(cls, jsonItem):
+		ignoredFields = cls._FLAG_FIELDS | cls._VOLATILE_FIELDS
+		return tuple(sorted(
+			(key, repr(value))
+			for (key, value) in jsonItem.iteritems()
+			if key not in ignoredFields
+		))
+
+
+class SingleFlight(object):
+	"""
+	Calls made with a key that is already in flight wait for that call and
+	share its result (or its exception) instead of repeating it.  Results can
+	also be kept for maxAge seconds after the call finished.
+
+	>>> flight = SingleFlight()
+	>>> flight.do("a", lambda: 1)
+	1
+	"""
+
+	def __init__(self, maxAge = 0):
+		self._maxAge = maxAge
+		self._lock = threading.Lock()
+		self._inFlight = {}
+		self._results = {}
+		self.calls = 0
+		self.shared = 0
+
+	def do(self, key, func, *args):
+		"""
+		@returns func(*args), or what the call in flight for key returned
+		@note Thread Agnostic
+		"""
+		with self._lock:
+			if key in self._results:
+				finished, result = self._results[key]
+				if time.time() - finished < self._maxAge:
+					self.shared += 1
+					return result
+				del self._results[key]
+
+			flight = self._inFlight.get(key, None)
+			isLeader = flight is None
+			if isLeader:
+				flight = _Flight()
+				self._inFlight[key] = flight
+				self.calls += 1
+			else:
+				self.shared += 1
+
+		if not isLeader:
+			flight.done.wait()
+			if flight.error is not None:
+				raise flight.error
+			return flight.result
+
+		try:
+			flight.result = func(*args)
+		except Exception, e:
+			flight.error = e
+			raise
+		finally:
+			with self._lock:
+				del self._inFlight[key]
+				if flight.error is None and 0 < self._maxAge:
+					self._results[key] = (time.time(), flight.result)
+			flight.done.set()
+		return flight.result
+
+	def forget(self):
+		"""
+		Drop kept results, calls in flight still share theirs
+		"""
+		with self._lock:
+			self._results.clear()
+
+
+class _Flight(object):
+
+	def __init__(self):
+		self.done = threading.Event()
+		self.result = None
+		self.error = None
+
+
 class GVoiceBackend(object):
 	"""
 	This class encapsulates all of the knowledge necessary to interact with the GoogleVoice servers
@@ -151,9 +322,17 @@ class GVoiceBackend(object):
 	PHONE_TYPE_WORK = 3
 	PHONE_TYPE_GIZMO = 7
 
-	def __init__(self, cookieFile = None):
+	def __init__(self, cookieFile = None, httpCachePath = None, pageCacheSeconds = 0):
+		"""
+		@param pageCacheSeconds How long a fetched page may be handed out again
+		to later GETs of the same url, 0 only shares GETs that overlap
+		"""
 		# Important items in this function are the setup of the browser emulation and cookie file
-		self._browser = browser_emu.MozillaEmulator(1)
+		if httpCachePath is not None:
+			httpCache = http_cache.HttpCache(httpCachePath)
+		else:
+			httpCache = None
+		self._browser = browser_emu.MozillaEmulator(1, httpCache)
 		self._loadedFromCookies = self._browser.load_cookies(cookieFile)
 
 		self._token = ""
@@ -161,6 +340,9 @@ class GVoiceBackend(object):
 		self._lastAuthed = 0.0
 		self._callbackNumber = ""
 		self._callbackNumbers = {}
+		self._maxFetchWorkers = 3
+		self._authGeneration = 0
+		self._pageFlight = SingleFlight(pageCacheSeconds)
 
 		# Suprisingly, moving all of these from class to self sped up startup time
 
@@ -211,7 +393,7 @@ class GVoiceBackend(object):
 		self._accountNumRe = re.compile(r"""<b class="ms\d">(.{14})</b></div>""")
 		self._callbackRe = re.compile(r"""\s+(.*?):\s*(.*?)<br\s*/>\s*$""", re.M)
 
-		self._contactsBodyRe = re.compile(r"""gcData\s*=\s*({.*?});""", re.MULTILINE | re.DOTALL)
+		self._contactsBodyRe = re.compile(r"""gcData\s*=\s*""", re.MULTILINE | re.DOTALL)
 		self._seperateVoicemailsRegex = re.compile(r"""^\s*<div id="(\w+)"\s* class=".*?gc-message.*?">""", re.MULTILINE | re.DOTALL)
 		self._exactVoicemailTimeRegex = re.compile(r"""<span class="gc-message-time">(.*?)</span>""", re.MULTILINE)
 		self._relativeVoicemailTimeRegex = re.compile(r"""<span class="gc-message-relative">(.*?)</span>""", re.MULTILINE)
@@ -225,6 +407,9 @@ class GVoiceBackend(object):
 		self._smsTimeRegex = re.compile(r"""<span class="gc-message-sms-time">(.*?)</span>""", re.MULTILINE | re.DOTALL)
 		self._smsTextRegex = re.compile(r"""<span class="gc-message-sms-text">(.*?)</span>""", re.MULTILINE | re.DOTALL)
 
+		self._voicemailSync = ConversationSync(self._split_conversations, self._parse_voicemail_conversation)
+		self._smsSync = ConversationSync(self._split_conversations, self._parse_sms_conversation)
+
 	def is_quick_login_possible(self):
 		"""
 		@returns True then is_authed might be enough to login, else full login is required
@@ -301,13 +486,18 @@ class GVoiceBackend(object):
 
 		self._browser.save_cookies()
 		self._lastAuthed = time.time()
+		self._new_auth_state()
 		return True
 
 	def logout(self):
 		self._browser.clear_cookies()
 		self._browser.save_cookies()
+		self._browser.clear_cache()
+		self._new_auth_state()
 		self._token = None
 		self._lastAuthed = 0.0
+		self._voicemailSync.clear()
+		self._smsSync.clear()
 
 	def is_dnd(self):
 		isDndPage = self._get_page(self._isDndURL)
@@ -401,18 +591,34 @@ class GVoiceBackend(object):
 
 		return json
 
-	def download(self, messageId, adir):
+	def get_feeds(self, feeds):
+		"""
+		Fetch several feeds at once
+		@returns List of the feeds' json, in the same order as feeds
+		"""
+		feedUrls = [
+			getattr(self, "_XML_%s_URL" % feed.upper())
+			for feed in feeds
+		]
+		pages = self._get_pages(feedUrls)
+		return [extract_payload(page)[0] for page in pages]
+
+	def download(self, messageId, adir, progress = None):
 		"""
 		Download a voicemail or recorded call MP3 matching the given ``msg``
 		which can either be a ``Message`` instance, or a SHA1 identifier. 
 		Saves files to ``adir`` (defaults to current directory). 
 		Message hashes can be found in ``self.voicemail().messages`` for example. 
 		Returns location of saved file.
+		@param progress Called with (bytes so far, total bytes or None)
 		"""
-		page = self._get_page(self._downloadVoicemailURL, {"id": messageId})
 		fn = os.path.join(adir, '%s.mp3' % messageId)
-		with open(fn, 'wb') as fo:
-			fo.write(page)
+		url = self._downloadVoicemailURL + messageId
+		try:
+			self._browser.download_to(url, fn, progress=progress)
+		except browser_emu.TRANSFER_ERRORS, e:
+			_moduleLogger.error("Translating error: %s" % str(e))
+			raise NetworkError("%s is not accesible" % url)
 		return fn
 
 	def is_valid_syntax(self, number):
@@ -455,13 +661,13 @@ class GVoiceBackend(object):
 		"""
 		@returns Iterable of (personsName, phoneNumber, exact date, relative date, action)
 		"""
-		for action, url in (
-			("Received", self._XML_RECEIVED_URL),
-			("Missed", self._XML_MISSED_URL),
-			("Placed", self._XML_PLACED_URL),
-		):
-			flatXml = self._get_page(url)
-
+		actions = ("Received", "Missed", "Placed")
+		pages = self._get_pages((
+			self._XML_RECEIVED_URL,
+			self._XML_MISSED_URL,
+			self._XML_PLACED_URL,
+		))
+		for action, flatXml in itertools.izip(actions, pages):
 			allRecentHtml = self._grab_html(flatXml)
 			allRecentData = self._parse_history(allRecentHtml)
 			for recentCallData in allRecentData:
@@ -476,29 +682,50 @@ class GVoiceBackend(object):
 		contactsBody = self._contactsBodyRe.search(page)
 		if contactsBody is None:
 			raise RuntimeError("Could not extract contact information")
-		accountData = _fake_parse_json(contactsBody.group(1))
-		for contactId, contactDetails in accountData["contacts"].iteritems():
+		contacts = js_literal.iter_object_items(page, ("contacts", ), contactsBody.end())
+		for contactId, contactDetails in contacts:
 			# A zero contact id is the catch all for unknown contacts
 			if contactId != "0":
 				if "name" in contactDetails:
 					contactDetails["name"] = unescape(contactDetails["name"])
 				yield contactId, contactDetails
 
+	def get_unread_summary(self):
+		"""
+		One request for the inbox json, so a poller can tell whether the full
+		feeds need to be downloaded at all
+		@returns {type: (unread count, id and start time of the newest inbox
+			conversation or None)}, the start time moves when a message is added
+			to a conversation that already was the newest
+		"""
+		inboxPage = self._get_page(self._XML_INBOX_URL)
+		return summarize_unread(self._grab_json(inboxPage))
+
 	def get_voicemails(self):
-		voicemailPage = self._get_page(self._XML_VOICEMAIL_URL)
-		voicemailHtml = self._grab_html(voicemailPage)
-		voicemailJson = self._grab_json(voicemailPage)
-		parsedVoicemail = self._parse_voicemail(voicemailHtml)
-		voicemails = self._merge_conversation_sources(parsedVoicemail, voicemailJson)
-		return voicemails
+		self.sync_voicemails()
+		return self._voicemailSync.get_conversations()
 
 	def get_texts(self):
+		self.sync_texts()
+		return self._smsSync.get_conversations()
+
+	def sync_voicemails(self):
+		"""
+		Only the voicemails that are new or changed since the last sync get parsed
+		@returns (added conversations, updated conversations, removed ids)
+		"""
+		voicemailPage = self._get_page(self._XML_VOICEMAIL_URL)
+		voicemailJson, voicemailHtml = extract_payload(voicemailPage)
+		return self._voicemailSync.update(voicemailJson, voicemailHtml)
+
+	def sync_texts(self):
+		"""
+		Only the SMS threads that are new or changed since the last sync get parsed
+		@returns (added conversations, updated conversations, removed ids)
+		"""
 		smsPage = self._get_page(self._XML_SMS_URL)
-		smsHtml = self._grab_html(smsPage)
-		smsJson = self._grab_json(smsPage)
-		parsedSms = self._parse_sms(smsHtml)
-		smss = self._merge_conversation_sources(parsedSms, smsJson)
-		return smss
+		smsJson, smsHtml = extract_payload(smsPage)
+		return self._smsSync.update(smsJson, smsHtml)
 
 	def mark_message(self, messageId, asRead):
 		postData = {
@@ -516,16 +743,12 @@ class GVoiceBackend(object):
 		markPage = self._get_page(self._archiveMessageURL, postData)
 
 	def _grab_json(self, flatXml):
-		xmlTree = ElementTree.fromstring(flatXml)
-		jsonElement = xmlTree.getchildren()[0]
-		flatJson = jsonElement.text
+		flatJson, flatHtml = extract_payload_text(flatXml)
 		jsonTree = parse_json(flatJson)
 		return jsonTree
 
 	def _grab_html(self, flatXml):
-		xmlTree = ElementTree.fromstring(flatXml)
-		htmlElement = xmlTree.getchildren()[1]
-		flatHtml = htmlElement.text
+		flatJson, flatHtml = extract_payload_text(flatXml)
 		return flatHtml
 
 	def _grab_account_info(self, page):
@@ -599,42 +822,52 @@ class GVoiceBackend(object):
 			text.text = number
 			return text
 
-	def _parse_voicemail(self, voicemailHtml):
-		splitVoicemail = self._seperateVoicemailsRegex.split(voicemailHtml)
-		for messageId, messageHtml in itergroup(splitVoicemail[1:], 2):
-			conv = Conversation()
-			conv.type = Conversation.TYPE_VOICEMAIL
-			conv.id = messageId.strip()
-
-			exactTimeGroup = self._exactVoicemailTimeRegex.search(messageHtml)
-			exactTimeText = exactTimeGroup.group(1).strip() if exactTimeGroup else ""
-			conv.time = google_strptime(exactTimeText)
-			relativeTimeGroup = self._relativeVoicemailTimeRegex.search(messageHtml)
-			conv.relTime = relativeTimeGroup.group(1).strip() if relativeTimeGroup else ""
-			locationGroup = self._voicemailLocationRegex.search(messageHtml)
-			conv.location = unescape(locationGroup.group(1).strip() if locationGroup else "")
-
-			nameGroup = self._voicemailNameRegex.search(messageHtml)
-			conv.name = unescape(nameGroup.group(1).strip() if nameGroup else "")
-			numberGroup = self._voicemailNumberRegex.search(messageHtml)
-			conv.number = numberGroup.group(1).strip() if numberGroup else ""
-			prettyNumberGroup = self._prettyVoicemailNumberRegex.search(messageHtml)
-			conv.prettyNumber = prettyNumberGroup.group(1).strip() if prettyNumberGroup else ""
-			contactIdGroup = self._messagesContactIDRegex.search(messageHtml)
-			conv.contactId = contactIdGroup.group(1).strip() if contactIdGroup else ""
+	def _split_conversations(self, html):
+		"""
+		@returns Iterable of (message id, message html)
+		"""
+		splitHtml = self._seperateVoicemailsRegex.split(html)
+		for messageId, messageHtml in itergroup(splitHtml[1:], 2):
+			yield messageId.strip(), messageHtml
 
-			messageGroups = self._voicemailMessageRegex.finditer(messageHtml)
-			messageParts = [
-				self._interpret_voicemail_regex(group)
-				for group in messageGroups
-			] if messageGroups else ((MessageText.ACCURACY_LOW, "No Transcription"), )
-			message = Message()
-			message.body = messageParts
-			message.whoFrom = conv.name
-			message.when = conv.time.strftime("%I:%M %p")
-			conv.messages = (message, )
+	def _parse_voicemail(self, voicemailHtml):
+		for messageId, messageHtml in self._split_conversations(voicemailHtml):
+			yield self._parse_voicemail_conversation(messageId, messageHtml)
+
+	def _parse_voicemail_conversation(self, messageId, messageHtml):
+		conv = Conversation()
+		conv.type = Conversation.TYPE_VOICEMAIL
+		conv.id = messageId
+
+		exactTimeGroup = self._exactVoicemailTimeRegex.search(messageHtml)
+		exactTimeText = exactTimeGroup.group(1).strip() if exactTimeGroup else ""
+		conv.time = google_strptime(exactTimeText)
+		relativeTimeGroup = self._relativeVoicemailTimeRegex.search(messageHtml)
+		conv.relTime = relativeTimeGroup.group(1).strip() if relativeTimeGroup else ""
+		locationGroup = self._voicemailLocationRegex.search(messageHtml)
+		conv.location = unescape(locationGroup.group(1).strip() if locationGroup else "")
+
+		nameGroup = self._voicemailNameRegex.search(messageHtml)
+		conv.name = unescape(nameGroup.group(1).strip() if nameGroup else "")
+		numberGroup = self._voicemailNumberRegex.search(messageHtml)
+		conv.number = numberGroup.group(1).strip() if numberGroup else ""
+		prettyNumberGroup = self._prettyVoicemailNumberRegex.search(messageHtml)
+		conv.prettyNumber = prettyNumberGroup.group(1).strip() if prettyNumberGroup else ""
+		contactIdGroup = self._messagesContactIDRegex.search(messageHtml)
+		conv.contactId = contactIdGroup.group(1).strip() if contactIdGroup else ""
+
+		messageGroups = self._voicemailMessageRegex.finditer(messageHtml)
+		messageParts = [
+			self._interpret_voicemail_regex(group)
+			for group in messageGroups
+		] if messageGroups else ((MessageText.ACCURACY_LOW, "No Transcription"), )
+		message = Message()
+		message.body = messageParts
+		message.whoFrom = conv.name
+		message.when = conv.time.strftime("%I:%M %p")
+		conv.messages = (message, )
 
-			yield conv
+		return conv
 
 	@staticmethod
 	def _interpret_sms_message_parts(fromPart, textPart, timePart):
@@ -650,52 +883,72 @@ class GVoiceBackend(object):
 		return message
 
 	def _parse_sms(self, smsHtml):
-		splitSms = self._seperateVoicemailsRegex.split(smsHtml)
-		for messageId, messageHtml in itergroup(splitSms[1:], 2):
-			conv = Conversation()
-			conv.type = Conversation.TYPE_SMS
-			conv.id = messageId.strip()
-
-			exactTimeGroup = self._exactVoicemailTimeRegex.search(messageHtml)
-			exactTimeText = exactTimeGroup.group(1).strip() if exactTimeGroup else ""
-			conv.time = google_strptime(exactTimeText)
-			relativeTimeGroup = self._relativeVoicemailTimeRegex.search(messageHtml)
-			conv.relTime = relativeTimeGroup.group(1).strip() if relativeTimeGroup else ""
-			conv.location = ""
-
-			nameGroup = self._voicemailNameRegex.search(messageHtml)
-			conv.name = unescape(nameGroup.group(1).strip() if nameGroup else "")
-			numberGroup = self._voicemailNumberRegex.search(messageHtml)
-			conv.number = numberGroup.group(1).strip() if numberGroup else ""
-			prettyNumberGroup = self._prettyVoicemailNumberRegex.search(messageHtml)
-			conv.prettyNumber = prettyNumberGroup.group(1).strip() if prettyNumberGroup else ""
-			contactIdGroup = self._messagesContactIDRegex.search(messageHtml)
-			conv.contactId = contactIdGroup.group(1).strip() if contactIdGroup else ""
-
-			fromGroups = self._smsFromRegex.finditer(messageHtml)
-			fromParts = (group.group(1).strip() for group in fromGroups)
-			textGroups = self._smsTextRegex.finditer(messageHtml)
-			textParts = (group.group(1).strip() for group in textGroups)
-			timeGroups = self._smsTimeRegex.finditer(messageHtml)
-			timeParts = (group.group(1).strip() for group in timeGroups)
-
-			messageParts = itertools.izip(fromParts, textParts, timeParts)
-			messages = [self._interpret_sms_message_parts(*parts) for parts in messageParts]
-			conv.messages = messages
-
-			yield conv
+		for messageId, messageHtml in self._split_conversations(smsHtml):
+			yield self._parse_sms_conversation(messageId, messageHtml)
+
+	def _parse_sms_conversation(self, messageId, messageHtml):
+		conv = Conversation()
+		conv.type = Conversation.TYPE_SMS
+		conv.id = messageId
+
+		exactTimeGroup = self._exactVoicemailTimeRegex.search(messageHtml)
+		exactTimeText = exactTimeGroup.group(1).strip() if exactTimeGroup else ""
+		conv.time = google_strptime(exactTimeText)
+		relativeTimeGroup = self._relativeVoicemailTimeRegex.search(messageHtml)
+		conv.relTime = relativeTimeGroup.group(1).strip() if relativeTimeGroup else ""
+		conv.location = ""
+
+		nameGroup = self._voicemailNameRegex.search(messageHtml)
+		conv.name = unescape(nameGroup.group(1).strip() if nameGroup else "")
+		numberGroup = self._voicemailNumberRegex.search(messageHtml)
+		conv.number = numberGroup.group(1).strip() if numberGroup else ""
+		prettyNumberGroup = self._prettyVoicemailNumberRegex.search(messageHtml)
+		conv.prettyNumber = prettyNumberGroup.group(1).strip() if prettyNumberGroup else ""
+		contactIdGroup = self._messagesContactIDRegex.search(messageHtml)
+		conv.contactId = contactIdGroup.group(1).strip() if contactIdGroup else ""
+
+		fromGroups = self._smsFromRegex.finditer(messageHtml)
+		fromParts = (group.group(1).strip() for group in fromGroups)
+		textGroups = self._smsTextRegex.finditer(messageHtml)
+		textParts = (group.group(1).strip() for group in textGroups)
+		timeGroups = self._smsTimeRegex.finditer(messageHtml)
+		timeParts = (group.group(1).strip() for group in timeGroups)
+
+		messageParts = itertools.izip(fromParts, textParts, timeParts)
+		messages = [self._interpret_sms_message_parts(*parts) for parts in messageParts]
+		conv.messages = messages
+
+		return conv
 
 	@staticmethod
 	def _merge_conversation_sources(parsedMessages, json):
 		for message in parsedMessages:
 			jsonItem = json["messages"][message.id]
-			message.isRead = jsonItem["isRead"]
-			message.isSpam = jsonItem["isSpam"]
-			message.isTrash = jsonItem["isTrash"]
-			message.isArchived = "inbox" not in jsonItem["labels"]
+			merge_conversation_flags(message, jsonItem)
 			yield message
 
+	def _new_auth_state(self):
+		"""
+		Keep GETs made under the old cookies from being shared with new ones
+		"""
+		self._authGeneration += 1
+		self._pageFlight.forget()
+
 	def _get_page(self, url, data = None, refererUrl = None):
+		"""
+		@note Identical GETs running at the same time share one request,
+		anything with data is a POST that might change what later GETs see
+		"""
+		if data is not None:
+			try:
+				return self._fetch_page(url, data, refererUrl)
+			finally:
+				self._pageFlight.forget()
+
+		key = (url, refererUrl, self._authGeneration)
+		return self._pageFlight.do(key, self._fetch_page, url, None, refererUrl)
+
+	def _fetch_page(self, url, data, refererUrl):
 		headers = {}
 		if refererUrl is not None:
 			headers["Referer"] = refererUrl
@@ -703,13 +956,20 @@ class GVoiceBackend(object):
 		encodedData = urllib.urlencode(data) if data is not None else None
 
 		try:
-			page = self._browser.download(url, encodedData, None, headers)
+			page = self._browser.download(url, encodedData, headers)
 		except urllib2.URLError, e:
 			_moduleLogger.error("Translating error: %s" % str(e))
 			raise NetworkError("%s is not accesible" % url)
 
 		return page
 
+	def _get_pages(self, urls):
+		"""
+		GET several pages concurrently, bounded by self._maxFetchWorkers
+		@returns List of pages in the same order as urls
+		"""
+		return parallel_map(self._get_page, urls, self._maxFetchWorkers)
+
 	def _get_page_with_token(self, url, data = None, refererUrl = None):
 		if data is None:
 			data = {}
@@ -750,6 +1010,51 @@ def google_strptime(time):
 	return parsedTime
 
 
+def merge_conversation_flags(conversation, jsonItem):
+	"""
+	@returns If any of the flags changed
+	"""
+	flags = (
+		jsonItem["isRead"],
+		jsonItem["isSpam"],
+		jsonItem["isTrash"],
+		"inbox" not in jsonItem["labels"],
+	)
+	previousFlags = (
+		conversation.isRead,
+		conversation.isSpam,
+		conversation.isTrash,
+		conversation.isArchived,
+	)
+	conversation.isRead, conversation.isSpam, conversation.isTrash, conversation.isArchived = flags
+	return flags != previousFlags
+
+
+def summarize_unread(json, types = ("missed", "voicemail", "sms")):
+	"""
+	>>> sorted(summarize_unread({
+	... 	"unreadCounts": {"missed": 0, "voicemail": 1, "sms": 2},
+	... 	"messages": {
+	... 		"a": {"startTime": "1250000000000", "labels": ["inbox", "sms"]},
+	... 		"b": {"startTime": "1250000005000", "labels": ["inbox", "sms", "unread"]},
+	... 		"c": {"startTime": "1250000001000", "labels": ["inbox", "voicemail"]},
+	... 	},
+	... }, ("missed", "voicemail", "sms")).iteritems())
+	[('missed', (0, None, None)), ('sms', (2, 'b', 1250000005000)), ('voicemail', (1, 'c', 1250000001000))]
+	"""
+	unreadCounts = json["unreadCounts"]
+	newest = dict((type, (None, None)) for type in types)
+	for messageId, messageData in json["messages"].iteritems():
+		startTime = int(messageData["startTime"])
+		for type in messageData["labels"]:
+			if type in newest and (newest[type][0] is None or newest[type][0] < startTime):
+				newest[type] = (startTime, messageId)
+	return dict(
+		(type, (unreadCounts.get(type, 0), newest[type][1], newest[type][0]))
+		for type in types
+	)
+
+
 def itergroup(iterator, count, padValue = None):
 	"""
 	Iterate in groups of 'count' values. If there
@@ -783,16 +1088,55 @@ def itergroup(iterator, count, padValue = None):
 	return itertools.izip(*nIterators)
 
 
-def safe_eval(s):
-	_TRUE_REGEX = re.compile("true")
-	_FALSE_REGEX = re.compile("false")
-	s = _TRUE_REGEX.sub("True", s)
-	s = _FALSE_REGEX.sub("False", s)
-	return eval(s, {}, {})
+def parallel_map(func, items, maxWorkers):
+	"""
+	Like map but runs func on up to maxWorkers threads.  Results keep the
+	order of items and the first failure (in item order) is re-raised.
+
+	>>> parallel_map(lambda x: x * 2, [1, 2, 3, 4], 2)
+	[2, 4, 6, 8]
+	>>> parallel_map(lambda x: x, [], 2)
+	[]
+	"""
+	items = list(items)
+	if len(items) <= 1 or maxWorkers <= 1:
+		return map(func, items)
+
+	results = [None] * len(items)
+	errors = [None] * len(items)
+	work = Queue.Queue()
+	for index, item in enumerate(items):
+		work.put((index, item))
+
+	def consume():
+		while True:
+			try:
+				index, item = work.get_nowait()
+			except Queue.Empty:
+				return
+			try:
+				results[index] = func(item)
+			except Exception, e:
+				errors[index] = e
+
+	workers = [
+		threading.Thread(target=consume)
+		for i in xrange(min(maxWorkers, len(items)))
+	]
+	for worker in workers:
+		worker.setDaemon(True)
+		worker.start()
+	for worker in workers:
+		worker.join()
+
+	for error in errors:
+		if error is not None:
+			raise error
+	return results
 
 
 def _fake_parse_json(flattened):
-	return safe_eval(flattened)
+	return js_literal.loads(flattened)
 
 
 def _actual_parse_json(flattened):
@@ -805,16 +1149,97 @@ else:
 	parse_json = _actual_parse_json
 
 
-def extract_payload(flatXml):
-	xmlTree = ElementTree.fromstring(flatXml)
+_CDATA_START = "<![CDATA["
+_CDATA_END = "]]>"
 
-	jsonElement = xmlTree.getchildren()[0]
-	flatJson = jsonElement.text
-	jsonTree = parse_json(flatJson)
 
-	htmlElement = xmlTree.getchildren()[1]
-	flatHtml = htmlElement.text
+def _scan_cdata_children(flatXml):
+	r"""
+	Pull the text out of each child of the root element, assuming all of
+	the text lives in CDATA sections.  This is what GoogleVoice sends and
+	lets us skip building an element tree for large pages.
+
+	@returns List of texts (None for an empty element) or None if the
+		payload isn't in the expected form
+
+	>>> _scan_cdata_children('<?xml version="1.0"?><response><json><![CDATA[{}]]></json><html><![CDATA[<div>]]]]><![CDATA[></div>]]></html></response>')
+	['{}', '<div>]]></div>']
+	>>> _scan_cdata_children('<response>\n <json><![CDATA[{}]]></json>\n <html/>\n</response>')
+	['{}', None]
+	>>> _scan_cdata_children('<response><json>{&quot;a&quot;: 1}</json></response>')
+	"""
+	if flatXml.startswith("<?"):
+		position = flatXml.find("?>") + 2
+	else:
+		position = 0
+	position = flatXml.find("<", position)
+	if position == -1:
+		return None
+	position = flatXml.find(">", position)
+	if position == -1:
+		return None
+	position += 1
+
+	texts = []
+	while True:
+		position = flatXml.find("<", position)
+		if position == -1 or flatXml.startswith("</", position):
+			# Reached the end of the root element
+			break
+
+		tagEnd = flatXml.find(">", position)
+		if tagEnd == -1:
+			return None
+		if flatXml[tagEnd-1] == "/":
+			texts.append(None)
+			position = tagEnd + 1
+			continue
+		tagName = flatXml[position+1:tagEnd].split(None, 1)[0]
+		closingTag = "</%s>" % tagName
+		position = tagEnd + 1
+
+		pieces = []
+		while True:
+			if flatXml.startswith(_CDATA_START, position):
+				dataStart = position + len(_CDATA_START)
+				dataEnd = flatXml.find(_CDATA_END, dataStart)
+				if dataEnd == -1:
+					return None
+				pieces.append(flatXml[dataStart:dataEnd])
+				position = dataEnd + len(_CDATA_END)
+			elif flatXml.startswith(closingTag, position):
+				position += len(closingTag)
+				break
+			elif flatXml[position:position+1].isspace():
+				position += 1
+			else:
+				# Entity-escaped text or nested elements, leave it to a real parser
+				return None
+
+		if not pieces:
+			texts.append(None)
+		elif len(pieces) == 1:
+			texts.append(pieces[0])
+		else:
+			texts.append("".join(pieces))
+	return texts
+
 
+def extract_payload_text(flatXml):
+	"""
+	Single pass extraction of the raw payloads, without parsing the json
+	@returns (flatJson, flatHtml)
+	"""
+	texts = _scan_cdata_children(flatXml)
+	if texts is None or len(texts) < 2:
+		xmlTree = ElementTree.fromstring(flatXml)
+		texts = [element.text for element in xmlTree.getchildren()]
+	return texts[0], texts[1]
+
+
+def extract_payload(flatXml):
+	flatJson, flatHtml = extract_payload_text(flatXml)
+	jsonTree = parse_json(flatJson)
 	return jsonTree, flatHtml
 
 
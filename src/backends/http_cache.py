@@ -0,0 +1,248 @@
+#!/usr/bin/python
+
+"""
+DialCentral - Front end for Google's GoogleVoice service.
+Copyright (C) 2008  Eric Warnke ericew AT gmail DOT com
+
+This library is free software; you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License as published by the Free Software Foundation; either
+version 2.1 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+Disk cache of HTTP responses for conditional GETs
+"""
+
+import os
+import time
+import errno
+import hashlib
+import threading
+import logging
+
+
+_moduleLogger = logging.getLogger(__name__)
+
+
+class HttpCache(object):
+	"""
+	Keeps the bodies of GET responses that came with a validator (ETag
+	and/or Last-Modified) so the next request for the URL can be made
+	conditional and a 304 answered from disk.  The cache is kept under
+	maxBytes by dropping the least recently used entries.
+
+	Each entry is one file named after the URL's hash holding the URL, the
+	ETag and Last-Modified on their own lines followed by the body.
+	"""
+
+	_TEMP_SUFFIX = ".tmp"
+
+	def __init__(self, path, maxBytes = 4 * 1024 * 1024):
+		self._path = path
+		self._maxBytes = maxBytes
+		self._lock = threading.Lock()
+		self._index = None
+		self._totalBytes = 0
+
+	def get_validators(self, url):
+		"""
+		@returns Headers that make a request for url conditional
+		"""
+		self._lock.acquire()
+		try:
+			entry = self._get_index().get(self._key(url), None)
+		finally:
+			self._lock.release()
+		if entry is None:
+			return {}
+
+		size, lastUsed, etag, lastModified = entry
+		headers = {}
+		if etag:
+			headers["If-None-Match"] = etag
+		if lastModified:
+			headers["If-Modified-Since"] = lastModified
+		return headers
+
+	def get_body(self, url):
+		"""
+		@returns The cached body or None if it isn't (or is no longer) cached
+		"""
+		key = self._key(url)
+		self._lock.acquire()
+		try:
+			entry = self._get_index().get(key, None)
+			if entry is None:
+				return None
+			try:
+				entryFile = open(self._entry_path(key), "rb")
+			except IOError, e:
+				_moduleLogger.warning("Lost cache entry for %s: %s" % (url, e))
+				self._forget(key)
+				return None
+			try:
+				for i in xrange(3):
+					entryFile.readline()
+				body = entryFile.read()
+			finally:
+				entryFile.close()
+			entry[1] = time.time()
+		finally:
+			self._lock.release()
+		return body
+
+	def store(self, url, headers, body):
+		"""
+		Cache body if the response can be revalidated, otherwise drop any
+		older copy of url
+		@param headers The response headers, anything with a get method
+		"""
+		etag = headers.get("ETag", None) or ""
+		lastModified = headers.get("Last-Modified", None) or ""
+		cacheControl = (headers.get("Cache-Control", None) or "").lower()
+		isStorable = (
+			(etag or lastModified) and
+			"no-store" not in cacheControl and
+			len(body) <= self._maxBytes / 4
+		)
+
+		key = self._key(url)
+		self._lock.acquire()
+		try:
+			index = self._get_index()
+			if not isStorable:
+				if key in index:
+					self._forget(key)
+				return
+
+			entryPath = self._entry_path(key)
+			tempPath = entryPath + self._TEMP_SUFFIX
+			try:
+				entryFile = open(tempPath, "wb")
+				try:
+					entryFile.write("%s\n%s\n%s\n" % (url, etag, lastModified))
+					entryFile.write(body)
+					size = entryFile.tell()
+				finally:
+					entryFile.close()
+				os.rename(tempPath, entryPath)
+			except (IOError, OSError), e:
+				# The response was still fetched, it just won't be cached
+				_moduleLogger.warning("Failed to cache %s: %s" % (url, e))
+				try:
+					os.remove(tempPath)
+				except OSError:
+					pass
+				if key in index:
+					self._forget(key)
+				return
+
+			if key in index:
+				self._totalBytes -= index[key][0]
+			index[key] = [size, time.time(), etag, lastModified]
+			self._totalBytes += size
+			self._evict()
+		finally:
+			self._lock.release()
+
+	def remove(self, url):
+		self._lock.acquire()
+		try:
+			key = self._key(url)
+			if key in self._get_index():
+				self._forget(key)
+		finally:
+			self._lock.release()
+
+	def clear(self):
+		self._lock.acquire()
+		try:
+			for key in self._get_index().keys():
+				self._forget(key)
+		finally:
+			self._lock.release()
+
+	@property
+	def totalBytes(self):
+		return self._totalBytes
+
+	def _get_index(self):
+		if self._index is None:
+			self._index = self._load_index()
+		return self._index
+
+	def _load_index(self):
+		index = {}
+		self._totalBytes = 0
+		try:
+			names = os.listdir(self._path)
+		except OSError, e:
+			names = []
+			if e.errno != errno.ENOENT:
+				_moduleLogger.warning("Can't read the HTTP cache: %s" % e)
+			else:
+				try:
+					os.makedirs(self._path)
+				except OSError, e:
+					_moduleLogger.warning("Can't create the HTTP cache: %s" % e)
+
+		for name in names:
+			entryPath = os.path.join(self._path, name)
+			if name.endswith(self._TEMP_SUFFIX):
+				# Left over from an interrupted store
+				try:
+					os.remove(entryPath)
+				except OSError, e:
+					_moduleLogger.warning("Can't remove %s: %s" % (name, e))
+				continue
+			try:
+				entryFile = open(entryPath, "rb")
+				try:
+					url = entryFile.readline()
+					etag = entryFile.readline().rstrip("\n")
+					lastModified = entryFile.readline().rstrip("\n")
+				finally:
+					entryFile.close()
+				stat = os.stat(entryPath)
+			except (IOError, OSError), e:
+				_moduleLogger.warning("Skipping cache entry %s: %s" % (name, e))
+				continue
+			index[name] = [stat.st_size, stat.st_mtime, etag, lastModified]
+			self._totalBytes += stat.st_size
+		return index
+
+	def _evict(self):
+		if self._totalBytes <= self._maxBytes:
+			return
+		byAge = sorted(
+			(lastUsed, key)
+			for (key, (size, lastUsed, etag, lastModified)) in self._index.iteritems()
+		)
+		for lastUsed, key in byAge:
+			if self._totalBytes <= self._maxBytes:
+				break
+			self._forget(key)
+
+	def _forget(self, key):
+		size = self._index.pop(key)[0]
+		self._totalBytes -= size
+		try:
+			os.remove(self._entry_path(key))
+		except OSError, e:
+			if e.errno != errno.ENOENT:
+				_moduleLogger.warning("Can't remove cache entry %s: %s" % (key, e))
+
+	def _entry_path(self, key):
+		return os.path.join(self._path, key)
+
+	@staticmethod
+	def _key(url):
+		return hashlib.sha1(url).hexdigest()
@@ -0,0 +1,251 @@
+#!/usr/bin/python
+
+"""
+DialCentral - Front end for Google's GoogleVoice service.
+Copyright (C) 2008  Eric Warnke ericew AT gmail DOT com
+
+This library is free software; you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License as published by the Free Software Foundation; either
+version 2.1 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+Decoder for the JavaScript object literals GoogleVoice embeds in its pages
+(JSON plus unquoted keys, single quoted strings and trailing commas)
+without going through eval
+"""
+
+import re
+
+
+_VALUE_REGEX = re.compile(r"""
+	\s*(?:
+		(\{)
+		|(\[)
+		|"((?:[^"\\]|\\.)*)"
+		|'((?:[^'\\]|\\.)*)'
+		|(-?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?)
+		|([A-Za-z_$][\w$]*)
+		|(\])
+	)
+""", re.VERBOSE | re.DOTALL)
+_KEY_REGEX = re.compile(r"""
+	\s*(?:
+		(?:
+			"((?:[^"\\]|\\.)*)"
+			|'((?:[^'\\]|\\.)*)'
+			|([\w$]+)
+		)\s*:
+		|(\})
+	)
+""", re.VERBOSE | re.DOTALL)
+_SEPARATOR_REGEX = re.compile(r"""\s*([,\]}])""")
+_OBJECT_START_REGEX = re.compile(r"""\s*\{""")
+_TRAILING_REGEX = re.compile(r"""\s*;?\s*$""")
+
+_ESCAPE_REGEX = re.compile(r"""\\(u[0-9a-fA-F]{4}|x[0-9a-fA-F]{2}|.)""", re.DOTALL)
+_ESCAPES = {
+	"b": "\b",
+	"f": "\f",
+	"n": "\n",
+	"r": "\r",
+	"t": "\t",
+	"v": "\v",
+	"0": "\0",
+}
+
+_WORDS = {
+	"true": True,
+	"false": False,
+	"null": None,
+	"undefined": None,
+}
+
+# What the scanner expects next
+_VALUE, _KEY, _SEPARATOR = range(3)
+
+
+def loads(text):
+	"""
+	>>> loads('{"a": [1, 2.5, -3], b: true, \\'c\\': null, "d": "x\\\\ny",}')
+	{'a': [1, 2.5, -3], 'c': None, 'b': True, 'd': 'x\\ny'}
+	>>> loads('"caf\\\\u00e9"')
+	'caf\\xc3\\xa9'
+	>>> loads('[1, 2')
+	Traceback (most recent call last):
+	ValueError: Expected ',' or ']' at 5
+	"""
+	value, pos = _scan_value(text, 0)
+	if _TRAILING_REGEX.match(text, pos) is None:
+		raise ValueError("Unexpected %r at %d" % (text[pos:pos+10], pos))
+	return value
+
+
+def iter_object_items(text, memberPath = (), start = 0):
+	"""
+	Decode the members of an object one at a time, so a large object never
+	has to be held fully decoded.  Parsing stops once the object is done, so
+	anything after it (like the rest of a page) is ignored.
+
+	@param memberPath Names of nested objects to descend through first
+	@param start Where in text the outermost object begins
+
+	>>> list(iter_object_items('x = {a: 1, "b": {c: [2], d: 3}, e: 4}; y = 5', ("b", ), 4))
+	[('c', [2]), ('d', 3)]
+	>>> list(iter_object_items('{a: {}}', ("b", )))
+	Traceback (most recent call last):
+	KeyError: 'b'
+	"""
+	memberPath = list(memberPath)
+	pos = _expect_object(text, start)
+	while True:
+		keyMatch = _KEY_REGEX.match(text, pos)
+		if keyMatch is None:
+			raise ValueError("Expected a key or '}' at %d" % pos)
+		pos = keyMatch.end()
+		if keyMatch.lastindex == 4:
+			break
+		key = _decode_key(keyMatch)
+
+		if memberPath and key == memberPath[0]:
+			# Only the nested object matters from here on
+			del memberPath[0]
+			pos = _expect_object(text, pos)
+			continue
+
+		value, pos = _scan_value(text, pos)
+		if not memberPath:
+			yield key, value
+
+		separatorMatch = _SEPARATOR_REGEX.match(text, pos)
+		if separatorMatch is None or separatorMatch.group(1) == "]":
+			raise ValueError("Expected ',' or '}' at %d" % pos)
+		pos = separatorMatch.end()
+		if separatorMatch.group(1) == "}":
+			break
+
+	if memberPath:
+		raise KeyError(memberPath[0])
+
+
+def _expect_object(text, pos):
+	objectMatch = _OBJECT_START_REGEX.match(text, pos)
+	if objectMatch is None:
+		raise ValueError("Expected an object at %d" % pos)
+	return objectMatch.end()
+
+
+def _scan_value(text, pos):
+	"""
+	@returns (value, position after the value)
+	"""
+	matchValue = _VALUE_REGEX.match
+	matchKey = _KEY_REGEX.match
+	matchSeparator = _SEPARATOR_REGEX.match
+
+	containers = []
+	keys = []
+	expected = _VALUE
+	while True:
+		if expected == _VALUE:
+			valueMatch = matchValue(text, pos)
+			if valueMatch is None:
+				raise ValueError("Expected a value at %d" % pos)
+			pos = valueMatch.end()
+			group = valueMatch.lastindex
+			if group == 1:
+				containers.append({})
+				keys.append(None)
+				expected = _KEY
+				continue
+			elif group == 2:
+				containers.append([])
+				keys.append(None)
+				continue
+			elif group == 3 or group == 4:
+				value = valueMatch.group(group)
+				if "\\" in value:
+					value = _ESCAPE_REGEX.sub(_decode_escape, value)
+			elif group == 5:
+				value = _decode_number(valueMatch.group(5))
+			elif group == 6:
+				try:
+					value = _WORDS[valueMatch.group(6)]
+				except KeyError:
+					raise ValueError("Unexpected %r at %d" % (valueMatch.group(6), pos))
+			elif group == 7 and containers and containers[-1].__class__ is list:
+				# Empty list or a trailing comma
+				value = containers.pop()
+				keys.pop()
+			else:
+				raise ValueError("Unexpected ']' at %d" % pos)
+		elif expected == _KEY:
+			keyMatch = matchKey(text, pos)
+			if keyMatch is None:
+				raise ValueError("Expected a key or '}' at %d" % pos)
+			pos = keyMatch.end()
+			if keyMatch.lastindex == 4:
+				value = containers.pop()
+				keys.pop()
+			else:
+				keys[-1] = _decode_key(keyMatch)
+				expected = _VALUE
+				continue
+		else:
+			separatorMatch = matchSeparator(text, pos)
+			container = containers[-1]
+			isDict = container.__class__ is dict
+			if separatorMatch is None:
+				raise ValueError("Expected ',' or '%s' at %d" % ("}" if isDict else "]", pos))
+			separator = separatorMatch.group(1)
+			if separator == "," or (separator == "}") != isDict:
+				if separator != ",":
+					raise ValueError("Unexpected '%s' at %d" % (separator, pos))
+				pos = separatorMatch.end()
+				expected = _KEY if isDict else _VALUE
+				continue
+			pos = separatorMatch.end()
+			value = containers.pop()
+			keys.pop()
+
+		if not containers:
+			return value, pos
+		container = containers[-1]
+		if container.__class__ is dict:
+			container[keys[-1]] = value
+		else:
+			container.append(value)
+		expected = _SEPARATOR
+
+
+def _decode_key(keyMatch):
+	group = keyMatch.lastindex
+	key = keyMatch.group(group)
+	if group != 3 and "\\" in key:
+		key = _ESCAPE_REGEX.sub(_decode_escape, key)
+	return key
+
+
+def _decode_escape(match):
+	escape = match.group(1)
+	if len(escape) == 1:
+		return _ESCAPES.get(escape, escape)
+	codePoint = int(escape[1:], 16)
+	if codePoint < 0x80:
+		return chr(codePoint)
+	# Keep strings as utf-8 like the rest of the page
+	return unichr(codePoint).encode("utf-8")
+
+
+def _decode_number(token):
+	if "." in token or "e" in token or "E" in token:
+		return float(token)
+	return int(token)
@@ -0,0 +1,374 @@
+#!/usr/bin/python
+
+"""
+DialCentral - Front end for Google's GoogleVoice service.
+Copyright (C) 2008  Eric Warnke ericew AT gmail DOT com
+
+This library is free software; you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License as published by the Free Software Foundation; either
+version 2.1 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+On-disk copy of the messages and call history so they can be shown before
+the network has been hit
+"""
+
+from __future__ import with_statement
+
+import time
+import datetime
+import itertools
+import threading
+import contextlib
+import logging
+
+try:
+	import sqlite3
+except ImportError:
+	try:
+		from pysqlite2 import dbapi2 as sqlite3
+	except ImportError:
+		sqlite3 = None
+
+
+_moduleLogger = logging.getLogger("message_store")
+
+
+IS_SUPPORTED = sqlite3 is not None
+
+
+class MessageStore(object):
+
+	SCHEMA_VERSION = 2
+
+	# relTime isn't stored, it changes every fetch without the item changing
+	# and is worked out from time on the way out
+	_CONVERSATION_FIELDS = (
+		"id", "type", "contactId", "name", "number", "prettyNumber", "location",
+		"time", "isRead", "isSpam", "isTrash", "isArchived",
+	)
+	_HISTORY_FIELDS = (
+		"id", "action", "contactId", "name", "number", "prettyNumber", "location",
+		"time",
+	)
+
+	_SCHEMA = """
+		CREATE TABLE IF NOT EXISTS conversations (
+			id TEXT PRIMARY KEY,
+			type TEXT,
+			contactId TEXT,
+			name TEXT,
+			number TEXT,
+			prettyNumber TEXT,
+			location TEXT,
+			time REAL,
+			isRead INTEGER,
+			isSpam INTEGER,
+			isTrash INTEGER,
+			isArchived INTEGER
+		);
+		CREATE INDEX IF NOT EXISTS conversations_time ON conversations (time);
+		CREATE INDEX IF NOT EXISTS conversations_contact ON conversations (contactId);
+		CREATE INDEX IF NOT EXISTS conversations_number ON conversations (number);
+
+		CREATE TABLE IF NOT EXISTS messages (
+			conversationId TEXT,
+			position INTEGER,
+			whoFrom TEXT,
+			body TEXT,
+			whenText TEXT,
+			PRIMARY KEY (conversationId, position)
+		);
+
+		CREATE TABLE IF NOT EXISTS history (
+			id TEXT,
+			action TEXT,
+			contactId TEXT,
+			name TEXT,
+			number TEXT,
+			prettyNumber TEXT,
+			location TEXT,
+			time REAL,
+			PRIMARY KEY (id, action)
+		);
+		CREATE INDEX IF NOT EXISTS history_time ON history (time);
+		CREATE INDEX IF NOT EXISTS history_contact ON history (contactId);
+		CREATE INDEX IF NOT EXISTS history_number ON history (number);
+	"""
+
+	def __init__(self, path):
+		self._path = path
+		self._lock = threading.RLock()
+		self._connection = sqlite3.connect(path, check_same_thread = False)
+		self._connection.text_factory = str
+		with self._lock:
+			self._create_schema()
+
+	def close(self):
+		with self._lock:
+			self._connection.close()
+
+	def clear(self):
+		"""
+		Drops everything, like when the account changes
+		"""
+		with self._lock:
+			with self._transaction():
+				self._connection.execute("DELETE FROM conversations")
+				self._connection.execute("DELETE FROM messages")
+				self._connection.execute("DELETE FROM history")
+
+	def get_messages(self):
+		"""
+		@returns List of message dicts (like GVDialer.get_messages), newest first
+		"""
+		with self._lock:
+			conversationRows = self._connection.execute(
+				"SELECT %s FROM conversations ORDER BY time DESC" % ", ".join(self._CONVERSATION_FIELDS)
+			).fetchall()
+			messageRows = self._connection.execute(
+				"SELECT conversationId, whoFrom, body, whenText FROM messages ORDER BY conversationId, position"
+			).fetchall()
+
+		messageParts = {}
+		for conversationId, whoFrom, body, whenText in messageRows:
+			messageParts.setdefault(conversationId, []).append((whoFrom, body, whenText))
+
+		messages = []
+		for row in conversationRows:
+			message = self._conversation_from_row(row)
+			message["messageParts"] = messageParts.get(message["id"], [])
+			messages.append(message)
+		return messages
+
+	def sync_messages(self, messages):
+		"""
+		Replace the stored messages with the latest from the network
+		@returns (added messages, updated messages, removed message ids)
+		"""
+		messages = list(messages)
+		with self._lock:
+			previous = dict(
+				(message["id"], message)
+				for message in self.get_messages()
+			)
+
+			added = []
+			updated = []
+			for message in messages:
+				previousMessage = previous.pop(message["id"], None)
+				if previousMessage is None:
+					added.append(message)
+				elif self._normalize_message(previousMessage) != self._normalize_message(message):
+					updated.append(message)
+			removed = previous.keys()
+
+			if added or updated or removed:
+				with self._transaction():
+					for messageId in removed:
+						self._delete_message(messageId)
+					for message in itertools.chain(added, updated):
+						self._delete_message(message["id"])
+						self._insert_message(message)
+		return added, updated, removed
+
+	def get_recent(self):
+		"""
+		@returns List of history dicts (like GVDialer.get_recent), newest first
+		"""
+		with self._lock:
+			rows = self._connection.execute(
+				"SELECT %s FROM history ORDER BY time DESC" % ", ".join(self._HISTORY_FIELDS)
+			).fetchall()
+		return [self._history_from_row(row) for row in rows]
+
+	def sync_recent(self, historyItems):
+		"""
+		Replace the stored call history with the latest from the network
+		@returns (added items, updated items, removed (id, action) keys)
+		"""
+		historyItems = list(historyItems)
+		with self._lock:
+			previous = dict(
+				((item["id"], item["action"]), item)
+				for item in self.get_recent()
+			)
+
+			added = []
+			updated = []
+			for item in historyItems:
+				key = item["id"], item["action"]
+				previousItem = previous.pop(key, None)
+				if previousItem is None:
+					added.append(item)
+				elif self._history_to_row(previousItem) != self._history_to_row(item):
+					updated.append(item)
+			removed = previous.keys()
+
+			if added or updated or removed:
+				with self._transaction():
+					for messageId, action in removed:
+						self._connection.execute(
+							"DELETE FROM history WHERE id = ? AND action = ?", (messageId, action)
+						)
+					self._connection.executemany(
+						"INSERT OR REPLACE INTO history (%s) VALUES (%s)" % (
+							", ".join(self._HISTORY_FIELDS),
+							", ".join("?" for field in self._HISTORY_FIELDS),
+						),
+						[self._history_to_row(item) for item in itertools.chain(added, updated)],
+					)
+		return added, updated, removed
+
+	@contextlib.contextmanager
+	def _transaction(self):
+		try:
+			yield
+		except:
+			self._connection.rollback()
+			raise
+		else:
+			self._connection.commit()
+
+	def _create_schema(self):
+		version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+		if version not in (0, self.SCHEMA_VERSION):
+			_moduleLogger.info("Discarding message store with schema %r" % (version, ))
+			with self._transaction():
+				self._connection.execute("DROP TABLE IF EXISTS conversations")
+				self._connection.execute("DROP TABLE IF EXISTS messages")
+				self._connection.execute("DROP TABLE IF EXISTS history")
+		self._connection.executescript(self._SCHEMA)
+		self._connection.execute("PRAGMA user_version = %d" % self.SCHEMA_VERSION)
+		self._connection.commit()
+
+	def _delete_message(self, messageId):
+		self._connection.execute("DELETE FROM conversations WHERE id = ?", (messageId, ))
+		self._connection.execute("DELETE FROM messages WHERE conversationId = ?", (messageId, ))
+
+	def _insert_message(self, message):
+		self._connection.execute(
+			"INSERT INTO conversations (%s) VALUES (%s)" % (
+				", ".join(self._CONVERSATION_FIELDS),
+				", ".join("?" for field in self._CONVERSATION_FIELDS),
+			),
+			self._conversation_to_row(message),
+		)
+		self._connection.executemany(
+			"INSERT INTO messages (conversationId, position, whoFrom, body, whenText) VALUES (?, ?, ?, ?, ?)",
+			[
+				(message["id"], position, whoFrom, body, whenText)
+				for position, (whoFrom, body, whenText) in enumerate(message["messageParts"])
+			],
+		)
+
+	@classmethod
+	def _normalize_message(cls, message):
+		return cls._conversation_to_row(message), [
+			tuple(part) for part in message["messageParts"]
+		]
+
+	@classmethod
+	def _conversation_to_row(cls, message):
+		row = []
+		for field in cls._CONVERSATION_FIELDS:
+			value = message[field]
+			if field == "time":
+				value = _to_timestamp(value)
+			elif field.startswith("is"):
+				value = _to_flag(value)
+			row.append(value)
+		return tuple(row)
+
+	@classmethod
+	def _conversation_from_row(cls, row):
+		message = dict(itertools.izip(cls._CONVERSATION_FIELDS, row))
+		message["time"] = _from_timestamp(message["time"])
+		message["relTime"] = relative_time(message["time"])
+		for field in ("isRead", "isSpam", "isTrash", "isArchived"):
+			message[field] = _from_flag(message[field])
+		return message
+
+	@classmethod
+	def _history_to_row(cls, item):
+		return tuple(
+			_to_timestamp(item[field]) if field == "time" else item[field]
+			for field in cls._HISTORY_FIELDS
+		)
+
+	@classmethod
+	def _history_from_row(cls, row):
+		item = dict(itertools.izip(cls._HISTORY_FIELDS, row))
+		item["time"] = _from_timestamp(item["time"])
+		item["relTime"] = relative_time(item["time"])
+		return item
+
+
+_RELATIVE_UNITS = (
+	(365 * 24 * 60 * 60, "year"),
+	(30 * 24 * 60 * 60, "month"),
+	(7 * 24 * 60 * 60, "week"),
+	(24 * 60 * 60, "day"),
+	(60 * 60, "hour"),
+	(60, "minute"),
+)
+
+
+def relative_time(when, now = None):
+	"""
+	Relative time in the same form as GoogleVoice gives them
+
+	>>> relative_time(datetime.datetime(2009, 6, 21, 1, 15), datetime.datetime(2009, 6, 21, 3, 20))
+	'2 hours ago'
+	>>> relative_time(datetime.datetime(2009, 6, 21, 1, 15), datetime.datetime(2009, 6, 22, 1, 15))
+	'1 day ago'
+	>>> relative_time(datetime.datetime(2009, 6, 21, 1, 15), datetime.datetime(2009, 6, 21, 1, 15, 30))
+	'0 minutes ago'
+	"""
+	if when is None:
+		return ""
+	if now is None:
+		now = datetime.datetime.now()
+	elapsed = now - when
+	seconds = max(elapsed.days * 24 * 60 * 60 + elapsed.seconds, 0)
+	for unitSeconds, unitName in _RELATIVE_UNITS:
+		count = seconds / unitSeconds
+		if count or unitSeconds == 60:
+			break
+	if count == 1:
+		return "%d %s ago" % (count, unitName)
+	else:
+		return "%d %ss ago" % (count, unitName)
+
+
+def _to_timestamp(value):
+	if value is None:
+		return None
+	return time.mktime(value.timetuple())
+
+
+def _from_timestamp(value):
+	if value is None:
+		return None
+	return datetime.datetime.fromtimestamp(value)
+
+
+def _to_flag(value):
+	if value is None:
+		return None
+	return int(bool(value))
+
+
+def _from_flag(value):
+	if value is None:
+		return None
+	return bool(value)
@@ -52,9 +52,12 @@ class NullDialer(object):
 	def get_feed(self, feed):
 		return {}
 
-	def download(self, messageId, adir):
+	def download(self, messageId, adir, progress = None):
 		return ""
 
+	def prefetch_voicemails(self):
+		return 0
+
 	def clear_caches(self):
 		pass
 
@@ -0,0 +1,241 @@
+#!/usr/bin/python
+
+"""
+DialCentral - Front end for Google's GoogleVoice service.
+Copyright (C) 2008  Eric Warnke ericew AT gmail DOT com
+
+This library is free software; you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License as published by the Free Software Foundation; either
+version 2.1 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+Downloaded voicemail audio, kept on disk for replaying
+"""
+
+from __future__ import with_statement
+
+import os
+import time
+import errno
+import threading
+import logging
+
+
+_moduleLogger = logging.getLogger(__name__)
+
+
+class VoicemailCache(object):
+	"""
+	Voicemail MP3s stored by message id, kept under maxBytes by dropping the
+	least recently played.  Before each download the cache also makes room
+	when the disk has less than minFreeBytes free.
+
+	@note The voicemail being played is never dropped, and partial downloads
+	are only kept for resuming for so long
+	"""
+
+	_EXTENSION = ".mp3"
+	_PART_EXTENSION = _EXTENSION + ".part"
+	_PART_MAX_AGE = 24 * 60 * 60
+
+	def __init__(self, path, maxBytes = 10 * 1024 * 1024, minFreeBytes = 5 * 1024 * 1024):
+		self._path = path
+		self._maxBytes = maxBytes
+		self._minFreeBytes = minFreeBytes
+		self._lock = threading.Lock()
+		self._fetchLocks = {}
+		self._playing = None
+		self._index = None
+		self._totalBytes = 0
+
+	def __contains__(self, messageId):
+		with self._lock:
+			return messageId in self._get_index()
+
+	def get(self, messageId):
+		"""
+		@returns Path to the cached audio or None
+		"""
+		with self._lock:
+			entry = self._get_index().get(messageId, None)
+			if entry is None:
+				return None
+			entry[1] = time.time()
+		path = self._entry_path(messageId)
+		try:
+			# Remember the use across restarts
+			os.utime(path, None)
+		except OSError, e:
+			_moduleLogger.warning("Lost cached voicemail %s: %s" % (messageId, e))
+			with self._lock:
+				if messageId in self._index:
+					self._forget(messageId)
+			return None
+		return path
+
+	def fetch(self, messageId, download, progress = None, isPlaying = False):
+		"""
+		@param download Called as download(messageId, directory, progress) when
+			the voicemail isn't cached, returning the path it saved to
+		@param isPlaying Fetched to be played, see set_playing
+		@returns Path to the cached audio
+		"""
+		if isPlaying:
+			self.set_playing(messageId)
+		self._acquire_fetch_lock(messageId)
+		try:
+			path = self.get(messageId)
+			if path is not None:
+				if progress is not None:
+					size = os.path.getsize(path)
+					progress(size, size)
+				return path
+
+			self._make_room()
+			path = download(messageId, self._path, progress)
+			assert path == self._entry_path(messageId), "Voicemail saved to %s" % path
+			with self._lock:
+				index = self._get_index()
+				if messageId in index:
+					self._totalBytes -= index[messageId][0]
+				size = os.path.getsize(path)
+				index[messageId] = [size, time.time()]
+				self._totalBytes += size
+				self._trim(self._maxBytes)
+			return path
+		finally:
+			self._release_fetch_lock(messageId)
+
+	def set_playing(self, messageId):
+		"""
+		@param messageId The voicemail being played, left alone by trimming, or
+			None once nothing is
+		"""
+		with self._lock:
+			self._playing = messageId
+
+	def trim(self, maxBytes):
+		"""
+		Drop the least recently played voicemails until under maxBytes, along
+		with partial downloads nothing resumed in a while (all of them for 0)
+		"""
+		with self._lock:
+			self._get_index()
+			self._trim(maxBytes)
+
+	def clear(self):
+		self.trim(0)
+
+	@property
+	def totalBytes(self):
+		return self._totalBytes
+
+	def _acquire_fetch_lock(self, messageId):
+		with self._lock:
+			entry = self._fetchLocks.setdefault(messageId, [threading.Lock(), 0])
+			entry[1] += 1
+		entry[0].acquire()
+
+	def _release_fetch_lock(self, messageId):
+		with self._lock:
+			entry = self._fetchLocks[messageId]
+			entry[1] -= 1
+			if entry[1] == 0:
+				# Only locks of fetches under way are kept
+				del self._fetchLocks[messageId]
+		entry[0].release()
+
+	def _make_room(self):
+		try:
+			stat = os.statvfs(self._path)
+		except (OSError, AttributeError), e:
+			return
+		freeBytes = stat.f_bavail * stat.f_frsize
+		if freeBytes < self._minFreeBytes:
+			_moduleLogger.info("Only %d bytes free, shrinking the voicemail cache" % freeBytes)
+			self.trim(self._totalBytes - (self._minFreeBytes - freeBytes))
+
+	def _get_index(self):
+		if self._index is None:
+			self._index = self._load_index()
+		return self._index
+
+	def _load_index(self):
+		index = {}
+		self._totalBytes = 0
+		try:
+			names = os.listdir(self._path)
+		except OSError, e:
+			if e.errno != errno.ENOENT:
+				raise
+			os.makedirs(self._path)
+			names = []
+
+		for name in names:
+			# Partial downloads are left alone so they can be resumed
+			if not name.endswith(self._EXTENSION):
+				continue
+			try:
+				stat = os.stat(os.path.join(self._path, name))
+			except OSError, e:
+				_moduleLogger.warning("Skipping cached voicemail %s: %s" % (name, e))
+				continue
+			messageId = name[:-len(self._EXTENSION)]
+			index[messageId] = [stat.st_size, stat.st_mtime]
+			self._totalBytes += stat.st_size
+		return index
+
+	def _trim(self, maxBytes):
+		self._remove_stale_parts(self._PART_MAX_AGE if 0 < maxBytes else 0)
+		if self._totalBytes <= maxBytes:
+			return
+		byAge = sorted(
+			(lastUsed, messageId)
+			for (messageId, (size, lastUsed)) in self._index.iteritems()
+			if messageId != self._playing
+		)
+		for lastUsed, messageId in byAge:
+			if self._totalBytes <= maxBytes:
+				break
+			self._forget(messageId)
+
+	def _remove_stale_parts(self, maxAge):
+		try:
+			names = os.listdir(self._path)
+		except OSError, e:
+			_moduleLogger.warning("Can't look for partial voicemails: %s" % e)
+			return
+		now = time.time()
+		for name in names:
+			if not name.endswith(self._PART_EXTENSION):
+				continue
+			if name[:-len(self._PART_EXTENSION)] in self._fetchLocks:
+				# Being downloaded right now
+				continue
+			path = os.path.join(self._path, name)
+			try:
+				if maxAge <= now - os.path.getmtime(path):
+					os.remove(path)
+			except OSError, e:
+				_moduleLogger.warning("Skipping partial voicemail %s: %s" % (name, e))
+
+	def _forget(self, messageId):
+		size = self._index.pop(messageId)[0]
+		self._totalBytes -= size
+		try:
+			os.remove(self._entry_path(messageId))
+		except OSError, e:
+			if e.errno != errno.ENOENT:
+				raise
+
+	def _entry_path(self, messageId):
+		return os.path.join(self._path, messageId + self._EXTENSION)
@@ -36,12 +36,17 @@ import gtk
 import gtk.glade
 
 import constants
+import timeline
+import view_snapshot
 import hildonize
 import gtk_toolbox
+from util import go_utils
 
 
 _moduleLogger = logging.getLogger("dc_glade")
 PROFILE_STARTUP = False
+# Set to a path to have the startup timeline written there as json on close
+STARTUP_REPORT_ENV = "DIALCENTRAL_STARTUP_REPORT"
 
 
 def getmtime_nothrow(path):
@@ -60,6 +65,57 @@ def display_error_message(msg):
 	error_dialog.run()
 
 
+class LazyViews(object):
+	"""
+	Views by backend id, where a view can be registered as a factory to only
+	be built the first time it is asked for
+
+	@note UI Thread or with the gtk lock held, as building creates widgets
+	"""
+
+	def __init__(self, name, onBuilt):
+		"""
+		@param onBuilt Called as onBuilt(backendId, view) after a factory's view
+			is built
+		"""
+		self._name = name
+		self._onBuilt = onBuilt
+		self._views = {}
+		self._factories = {}
+
+	def __getitem__(self, backendId):
+		try:
+			return self._views[backendId]
+		except KeyError:
+			factory = self._factories[backendId]
+
+		with timeline.STARTUP.span("%s view" % self._name):
+			view = factory()
+			del self._factories[backendId]
+			self._views[backendId] = view
+			self._onBuilt(backendId, view)
+		return view
+
+	def __setitem__(self, backendId, view):
+		self._factories.pop(backendId, None)
+		self._views[backendId] = view
+
+	def register(self, backendId, factory):
+		self._factories[backendId] = factory
+
+	def get(self, backendId, default = None):
+		"""
+		@returns The view when it has been built, without building it
+		"""
+		return self._views.get(backendId, default)
+
+	def iteritems(self):
+		"""
+		@note Only covers the views built so far
+		"""
+		return self._views.iteritems()
+
+
 class Dialcentral(object):
 
 	_glade_files = [
@@ -90,16 +146,49 @@ class Dialcentral(object):
 		self._selectedBackendId = self.NULL_BACKEND
 		self._defaultBackendId = self.GV_BACKEND
 		self._phoneBackends = None
-		self._dialpads = None
-		self._accountViews = None
-		self._messagesViews = None
-		self._historyViews = None
-		self._contactsViews = None
+		self._dialpads = LazyViews("dialpad", self._on_view_built)
+		self._accountViews = LazyViews("account", self._on_view_built)
+		self._messagesViews = LazyViews("messages", self._on_view_built)
+		self._historyViews = LazyViews("history", self._on_view_built)
+		self._contactsViews = LazyViews("contacts", self._on_view_built)
+		self._viewRegistries = (
+			self._dialpads,
+			self._accountViews,
+			self._messagesViews,
+			self._historyViews,
+			self._contactsViews,
+		)
+		self._config = ConfigParser.SafeConfigParser()
+		self._platformReady = threading.Event()
+		self._startupConfig = None
+		self._gvBackend = None
+		self._backendReady = threading.Event()
+		self._isSessionValid = None
+		self._sessionChecked = threading.Event()
+		# One worker is kept for dialing and texting, which leaves at most two
+		# refreshes or other background work using the network at once
+		self._taskPool = go_utils.AsyncPool(workers = 3)
+		self._refreshScheduler = go_utils.RefreshScheduler(self._taskPool)
+		self._pendingAction = None
 		self._alarmHandler = None
 		self._ledHandler = None
+		self._messageStore = None
 		self._originalCurrentLabels = []
 		self._fsContactsPath = os.path.join(constants._data_path_, "contacts")
-
+		self._messageStorePath = os.path.join(constants._data_path_, "messages.db")
+		self._gvContactsPath = os.path.join(constants._data_path_, "gv_contacts.cache")
+		self._gvHttpCachePath = os.path.join(constants._data_path_, "gv_http_cache")
+		self._gvVoicemailCachePath = os.path.join(constants._data_path_, "voicemails")
+		self._viewSnapshot = view_snapshot.ViewSnapshot(os.path.join(constants._data_path_, "views.snapshot"))
+		self._isOnWlan = False
+		self._isStartupReported = False
+
+		# The largest network wait of startup, overlapped with building the UI
+		sessionCheck = threading.Thread(target=self._check_session)
+		sessionCheck.setDaemon(True)
+		sessionCheck.start()
+
+		timeline.STARTUP.begin("glade load")
 		for path in self._glade_files:
 			if os.path.isfile(path):
 				self._widgetTree = gtk.glade.XML(path)
@@ -108,7 +197,9 @@ class Dialcentral(object):
 			display_error_message("Cannot find dialcentral.glade")
 			gtk.main_quit()
 			return
+		timeline.STARTUP.end("glade load")
 
+		timeline.STARTUP.begin("hildonize")
 		self._window = self._widgetTree.get_widget("mainWindow")
 		self._notebook = self._widgetTree.get_widget("notebook")
 		errorBox = self._widgetTree.get_widget("errorEventBox")
@@ -176,17 +267,14 @@ class Dialcentral(object):
 			_moduleLogger.warning("No hildonization support")
 
 		hildonize.set_application_name("%s" % constants.__pretty_app_name__)
+		timeline.STARTUP.end("hildonize")
 
 		self._window.connect("destroy", self._on_close)
 		self._window.set_default_size(800, 300)
-		self._window.show_all()
+		with timeline.STARTUP.span("window show"):
+			self._window.show_all()
 
-		self._loginSink = gtk_toolbox.threaded_stage(
-			gtk_toolbox.comap(
-				self._attempt_login,
-				gtk_toolbox.null_sink(),
-			)
-		)
+		self._taskPool.start()
 
 		if not PROFILE_STARTUP:
 			backgroundSetup = threading.Thread(target=self._idle_setup)
@@ -200,28 +288,170 @@ class Dialcentral(object):
 		If something can be done after the UI loads, push it here so it's not blocking the UI
 		"""
 		# Barebones UI handlers
+		timeline.STARTUP.begin("null views")
 		try:
 			from backends import null_backend
 			import null_views
 
 			self._phoneBackends = {self.NULL_BACKEND: null_backend.NullDialer()}
 			with gtk_toolbox.gtk_lock():
-				self._dialpads = {self.NULL_BACKEND: null_views.Dialpad(self._widgetTree)}
-				self._accountViews = {self.NULL_BACKEND: null_views.AccountInfo(self._widgetTree)}
-				self._historyViews = {self.NULL_BACKEND: null_views.CallHistoryView(self._widgetTree)}
-				self._messagesViews = {self.NULL_BACKEND: null_views.MessagesView(self._widgetTree)}
-				self._contactsViews = {self.NULL_BACKEND: null_views.ContactsView(self._widgetTree)}
-
-				self._dialpads[self._selectedBackendId].enable()
-				self._accountViews[self._selectedBackendId].enable()
-				self._historyViews[self._selectedBackendId].enable()
-				self._messagesViews[self._selectedBackendId].enable()
-				self._contactsViews[self._selectedBackendId].enable()
+				self._dialpads[self.NULL_BACKEND] = null_views.Dialpad(self._widgetTree)
+				self._accountViews[self.NULL_BACKEND] = null_views.AccountInfo(self._widgetTree)
+				self._historyViews[self.NULL_BACKEND] = null_views.CallHistoryView(self._widgetTree)
+				self._messagesViews[self.NULL_BACKEND] = null_views.MessagesView(self._widgetTree)
+				self._contactsViews[self.NULL_BACKEND] = null_views.ContactsView(self._widgetTree)
+
+				for views in self._viewRegistries:
+					views[self._selectedBackendId].enable()
 		except Exception, e:
 			with gtk_toolbox.gtk_lock():
 				self._errorDisplay.push_exception()
+		timeline.STARTUP.end("null views")
 
-		# Setup maemo specifics
+		# Setup costly backends
+		try:
+			import gv_views
+			from backends import message_store
+
+			# Only the dialpad is needed right away, the other views are built
+			# when first shown
+			timeline.STARTUP.begin("gv views")
+			with gtk_toolbox.gtk_lock():
+				self._smsEntryWindow = gv_views.SmsEntryWindow(self._widgetTree, self._window, self._app)
+				unifiedDialpad = gv_views.Dialpad(self._widgetTree, self._errorDisplay)
+				self._dialpads[self.GV_BACKEND] = unifiedDialpad
+			timeline.STARTUP.end("gv views")
+
+			self._backendReady.wait()
+			if self._gvBackend is None:
+				raise RuntimeError("GoogleVoice support failed to load")
+			self._phoneBackends.update({
+				self.GV_BACKEND: self._gvBackend,
+			})
+
+			if message_store.IS_SUPPORTED:
+				try:
+					self._messageStore = message_store.MessageStore(self._messageStorePath)
+				except Exception, e:
+					_moduleLogger.exception('Message store failed: "%s"' % str(e))
+					self._messageStore = None
+			else:
+				_moduleLogger.warning("No message store support")
+
+			self._accountViews.register(self.GV_BACKEND, self._create_gv_account_view)
+			self._historyViews.register(self.GV_BACKEND, self._create_gv_history_view)
+			self._messagesViews.register(self.GV_BACKEND, self._create_gv_messages_view)
+			self._contactsViews.register(self.GV_BACKEND, self._create_gv_contacts_view)
+
+			self._smsEntryWindow.send_sms = self._on_sms_clicked
+			self._smsEntryWindow.dial = self._on_dial_clicked
+			self._dialpads[self.GV_BACKEND].add_contact = self._add_contact
+			self._dialpads[self.GV_BACKEND].dial = self._on_dial_clicked
+
+			callbackMapping = {
+				"on_paste": self._on_paste,
+				"on_refresh": self._on_menu_refresh,
+				"on_clearcookies_clicked": self._on_clearcookies_clicked,
+				"on_about_activate": self._on_about_activate,
+			}
+			if hildonize.GTK_MENU_USED:
+				self._widgetTree.signal_autoconnect(callbackMapping)
+			self._notebook.connect("switch-page", self._on_notebook_switch_page)
+			self._widgetTree.get_widget("clearcookies").connect("clicked", self._on_clearcookies_clicked)
+
+			with gtk_toolbox.gtk_lock():
+				self._originalCurrentLabels = [
+					self._notebook.get_tab_label(self._notebook.get_nth_page(pageIndex)).get_text()
+					for pageIndex in xrange(self._notebook.get_n_pages())
+				]
+				self._notebookTapHandler = gtk_toolbox.TapOrHold(self._notebook)
+				self._notebookTapHandler.enable()
+			self._notebookTapHandler.on_tap = self._reset_tab_refresh
+			self._notebookTapHandler.on_hold = self._on_tab_refresh
+			self._notebookTapHandler.on_holding = self._set_tab_refresh
+			self._notebookTapHandler.on_cancel = self._reset_tab_refresh
+
+			with timeline.STARTUP.span("settings load"):
+				# Already read by _check_session
+				with gtk_toolbox.gtk_lock():
+					self.load_settings(self._startupConfig)
+
+			with timeline.STARTUP.span("snapshot load"):
+				self._viewSnapshot.load()
+		except Exception, e:
+			with gtk_toolbox.gtk_lock():
+				self._errorDisplay.push_exception()
+		finally:
+			self._initDone = True
+			self._spawn_attempt_login()
+
+		# The login is under way, what is left can happen alongside it
+		try:
+			self._setup_platform()
+		finally:
+			self._platformReady.set()
+
+	def _check_session(self):
+		"""
+		Read the settings and cookies, then check whether the cookies are still
+		a session, for refresh_session to pick up
+		@note Runs on its own thread, started before the UI is built
+		"""
+		timeline.STARTUP.begin("backend construction")
+		try:
+			config = ConfigParser.SafeConfigParser()
+			config.read(constants._user_settings_)
+			self._startupConfig = config
+
+			from backends import gv_backend
+			try:
+				os.makedirs(constants._data_path_)
+			except OSError, e:
+				if e.errno != 17:
+					raise
+			gvCookiePath = os.path.join(constants._data_path_, "gv_cookies.txt")
+			self._gvBackend = gv_backend.GVDialer(
+				gvCookiePath,
+				self._gvContactsPath,
+				self._gvHttpCachePath,
+				self._gvVoicemailCachePath,
+				spawn = self._spawn_backend_task,
+			)
+		except Exception, e:
+			_moduleLogger.exception('Backend construction failed: "%s"' % str(e))
+		finally:
+			if self._startupConfig is None:
+				self._startupConfig = ConfigParser.SafeConfigParser()
+			timeline.STARTUP.end("backend construction")
+			self._backendReady.set()
+
+		timeline.STARTUP.begin("session check")
+		try:
+			if self._gvBackend is not None:
+				backendId, credentials = self._read_login_settings(self._startupConfig)
+				isQuickLoginPossible = self._gvBackend.is_quick_login_possible()
+				if backendId == self.GV_BACKEND and credentials != ("", "") and isQuickLoginPossible:
+					self._isSessionValid = self._gvBackend.is_authed()
+		except Exception, e:
+			_moduleLogger.exception('Session check failed: "%s"' % str(e))
+		finally:
+			timeline.STARTUP.end("session check")
+			self._sessionChecked.set()
+
+	def _join_session_check(self):
+		"""
+		@returns What _check_session found, only the first time and None if it
+			didn't check
+		"""
+		self._sessionChecked.wait()
+		isSessionValid, self._isSessionValid = self._isSessionValid, None
+		return isSessionValid
+
+	def _setup_platform(self):
+		"""
+		Setup maemo specifics
+		"""
+		timeline.STARTUP.begin("maemo setup")
 		try:
 			try:
 				import osso
@@ -239,7 +469,9 @@ class Dialcentral(object):
 			try:
 				import alarm_handler
 				if alarm_handler.AlarmHandler is not alarm_handler._NoneAlarmHandler:
-					self._alarmHandler = alarm_handler.AlarmHandler()
+					alarmHandler = alarm_handler.AlarmHandler()
+					alarmHandler.load_settings(self._config, "alarm")
+					self._alarmHandler = alarmHandler
 				else:
 					self._alarmHandler = None
 			except (ImportError, OSError):
@@ -274,113 +506,109 @@ class Dialcentral(object):
 		except Exception, e:
 			with gtk_toolbox.gtk_lock():
 				self._errorDisplay.push_exception()
+		timeline.STARTUP.end("maemo setup")
 
-		# Setup costly backends
-		try:
-			from backends import gv_backend
-			from backends import file_backend
-			import gv_views
-			from backends import merge_backend
+	def _create_gv_account_view(self):
+		import gv_views
 
-			with gtk_toolbox.gtk_lock():
-				self._smsEntryWindow = gv_views.SmsEntryWindow(self._widgetTree, self._window, self._app)
-			try:
-				os.makedirs(constants._data_path_)
-			except OSError, e:
-				if e.errno != 17:
-					raise
-			gvCookiePath = os.path.join(constants._data_path_, "gv_cookies.txt")
+		# Needs the alarm handler, which _attempt_login waits for before
+		# enabling any views
+		view = gv_views.AccountInfo(
+			self._widgetTree, self._phoneBackends[self.GV_BACKEND], self._alarmHandler, self._errorDisplay
+		)
+		view.save_everything = self._save_settings
+		view.stop_notifier = self._stop_notifier_daemon
+		return view
+
+	def _create_gv_history_view(self):
+		import gv_views
+
+		view = gv_views.CallHistoryView(
+			self._widgetTree,
+			self._phoneBackends[self.GV_BACKEND],
+			self._errorDisplay,
+			self._refreshScheduler,
+			self._messageStore,
+		)
+		view.add_contact = self._add_contact
+		view.show_cache()
+		return view
+
+	def _create_gv_messages_view(self):
+		import gv_views
+
+		view = gv_views.MessagesView(
+			self._widgetTree,
+			self._phoneBackends[self.GV_BACKEND],
+			self._errorDisplay,
+			self._refreshScheduler,
+			self._messageStore,
+		)
+		view.add_contact = self._add_contact
+		view.show_cache()
+		return view
 
-			self._phoneBackends.update({
-				self.GV_BACKEND: gv_backend.GVDialer(gvCookiePath),
-			})
-			with gtk_toolbox.gtk_lock():
-				unifiedDialpad = gv_views.Dialpad(self._widgetTree, self._errorDisplay)
-				self._dialpads.update({
-					self.GV_BACKEND: unifiedDialpad,
-				})
-				self._accountViews.update({
-					self.GV_BACKEND: gv_views.AccountInfo(
-						self._widgetTree, self._phoneBackends[self.GV_BACKEND], self._alarmHandler, self._errorDisplay
-					),
-				})
-				self._accountViews[self.GV_BACKEND].save_everything = self._save_settings
-				self._historyViews.update({
-					self.GV_BACKEND: gv_views.CallHistoryView(
-						self._widgetTree, self._phoneBackends[self.GV_BACKEND], self._errorDisplay
-					),
-				})
-				self._messagesViews.update({
-					self.GV_BACKEND: gv_views.MessagesView(
-						self._widgetTree, self._phoneBackends[self.GV_BACKEND], self._errorDisplay
-					),
-				})
-				self._contactsViews.update({
-					self.GV_BACKEND: gv_views.ContactsView(
-						self._widgetTree, self._phoneBackends[self.GV_BACKEND], self._errorDisplay
-					),
-				})
-
-			fileBackend = file_backend.FilesystemAddressBookFactory(self._fsContactsPath)
+	def _create_gv_contacts_view(self):
+		import gv_views
+		from backends import file_backend
+		from backends import merge_backend
 
-			self._smsEntryWindow.send_sms = self._on_sms_clicked
-			self._smsEntryWindow.dial = self._on_dial_clicked
-			self._dialpads[self.GV_BACKEND].add_contact = self._add_contact
-			self._dialpads[self.GV_BACKEND].dial = self._on_dial_clicked
-			self._historyViews[self.GV_BACKEND].add_contact = self._add_contact
-			self._messagesViews[self.GV_BACKEND].add_contact = self._add_contact
-			self._contactsViews[self.GV_BACKEND].add_contact = self._add_contact
-
-			addressBooks = [
-				self._phoneBackends[self.GV_BACKEND],
-				fileBackend,
-			]
-			mergedBook = merge_backend.MergedAddressBook(addressBooks, merge_backend.MergedAddressBook.basic_firtname_sorter)
-			self._contactsViews[self.GV_BACKEND].append(mergedBook)
-			self._contactsViews[self.GV_BACKEND].extend(addressBooks)
-			self._contactsViews[self.GV_BACKEND].open_addressbook(*self._contactsViews[self.GV_BACKEND].get_addressbooks().next()[0][0:2])
+		view = gv_views.ContactsView(
+			self._widgetTree, self._phoneBackends[self.GV_BACKEND], self._errorDisplay, self._refreshScheduler
+		)
+		view.add_contact = self._add_contact
+
+		fileBackend = file_backend.FilesystemAddressBookFactory(self._fsContactsPath)
+		addressBooks = [
+			self._phoneBackends[self.GV_BACKEND],
+			fileBackend,
+		]
+		mergedBook = merge_backend.MergedAddressBook(addressBooks, merge_backend.MergedAddressBook.basic_firtname_sorter)
+		view.append(mergedBook)
+		view.extend(addressBooks)
+		view.open_addressbook(*view.get_addressbooks().next()[0][0:2])
+		self._load_view_snapshot(self.GV_BACKEND, view)
+		return view
+
+	def _on_view_built(self, backendId, view):
+		"""
+		@note UI Thread or with the gtk lock held
+		"""
+		self._load_view_settings(backendId, view, self._config)
+		if backendId == self._selectedBackendId:
+			view.enable()
 
-			callbackMapping = {
-				"on_paste": self._on_paste,
-				"on_refresh": self._on_menu_refresh,
-				"on_clearcookies_clicked": self._on_clearcookies_clicked,
-				"on_about_activate": self._on_about_activate,
-			}
-			if hildonize.GTK_MENU_USED:
-				self._widgetTree.signal_autoconnect(callbackMapping)
-			self._notebook.connect("switch-page", self._on_notebook_switch_page)
-			self._widgetTree.get_widget("clearcookies").connect("clicked", self._on_clearcookies_clicked)
+	@staticmethod
+	def _view_section_name(backendId, view):
+		return "%s - %s" % (backendId, view.name())
 
-			with gtk_toolbox.gtk_lock():
-				self._originalCurrentLabels = [
-					self._notebook.get_tab_label(self._notebook.get_nth_page(pageIndex)).get_text()
-					for pageIndex in xrange(self._notebook.get_n_pages())
-				]
-				self._notebookTapHandler = gtk_toolbox.TapOrHold(self._notebook)
-				self._notebookTapHandler.enable()
-			self._notebookTapHandler.on_tap = self._reset_tab_refresh
-			self._notebookTapHandler.on_hold = self._on_tab_refresh
-			self._notebookTapHandler.on_holding = self._set_tab_refresh
-			self._notebookTapHandler.on_cancel = self._reset_tab_refresh
+	def _load_view_snapshot(self, backendId, view):
+		snapshot = self._viewSnapshot.get(self._view_section_name(backendId, view))
+		if snapshot is not None:
+			view.load_snapshot(snapshot)
 
-			config = ConfigParser.SafeConfigParser()
-			config.read(constants._user_settings_)
-			with gtk_toolbox.gtk_lock():
-				self.load_settings(config)
-		except Exception, e:
-			with gtk_toolbox.gtk_lock():
-				self._errorDisplay.push_exception()
-		finally:
-			self._initDone = True
-			self._spawn_attempt_login()
+	def _save_view_snapshots(self):
+		"""
+		@note Thread Agnostic
+		"""
+		# History and messages open from the message store instead
+		view = self._contactsViews.get(self.GV_BACKEND)
+		if view is not None:
+			self._viewSnapshot.set(self._view_section_name(self.GV_BACKEND, view), view.get_snapshot())
+		self._viewSnapshot.save()
 
 	def _spawn_attempt_login(self, *args):
-		self._loginSink.send(args)
+		self._refreshScheduler.request(
+			"login",
+			lambda token: self._attempt_login(*args),
+			priority = go_utils.PRIORITY_INTERACTIVE,
+		)
 
 	def _attempt_login(self, force = False):
 		"""
 		@note This must be run outside of the UI lock
 		"""
+		timeline.STARTUP.begin("login")
 		try:
 			assert self._initDone, "Attempting login before app is fully loaded"
 
@@ -402,8 +630,16 @@ class Dialcentral(object):
 			if not loggedIn:
 				loggedIn, serviceId = self._login_by_user()
 
+			# The views and the prefetch below depend on what the platform
+			# setup finds, which was running alongside the login
+			self._platformReady.wait()
+
+			if loggedIn and self._isOnWlan:
+				self._spawn_prefetch_voicemails(serviceId)
+
 			with gtk_toolbox.gtk_lock():
 				self._change_loggedin_status(serviceId)
+				timeline.STARTUP.mark("dialpad interactive")
 				if loggedIn:
 					hildonize.show_information_banner(self._window, "Logged In")
 				else:
@@ -415,6 +651,40 @@ class Dialcentral(object):
 		except Exception, e:
 			with gtk_toolbox.gtk_lock():
 				self._errorDisplay.push_exception()
+		timeline.STARTUP.end("login")
+
+		if not self._isStartupReported:
+			self._isStartupReported = True
+			timeline.STARTUP.log(_moduleLogger)
+
+	def _spawn_prefetch_voicemails(self, serviceId):
+		backend = self._phoneBackends[serviceId]
+
+		def on_success(count):
+			_moduleLogger.info("Prefetched %d voicemails" % count)
+
+		def on_error(error):
+			_moduleLogger.error('Voicemail prefetch failed: "%s"' % str(error))
+
+		self._taskPool.add_task(
+			backend.prefetch_voicemails, (), {},
+			on_success, on_error,
+			go_utils.PRIORITY_PREFETCH,
+		)
+
+	def _spawn_backend_task(self, func, *args):
+		"""
+		@note Thread Agnostic
+		"""
+
+		def on_error(error):
+			_moduleLogger.error('Background task failed: "%s"' % str(error))
+
+		self._taskPool.add_task(
+			func, args, {},
+			lambda result: None, on_error,
+			go_utils.PRIORITY_REFRESH,
+		)
 
 	def refresh_session(self):
 		"""
@@ -437,8 +707,11 @@ class Dialcentral(object):
 		"""
 		loggedIn = False
 
+		isSessionValid = self._join_session_check()
 		isQuickLoginPossible = self._phoneBackends[self._defaultBackendId].is_quick_login_possible()
-		if self._credentials != ("", "") and isQuickLoginPossible:
+		if isSessionValid is not None and self._defaultBackendId == self.GV_BACKEND:
+			loggedIn = isSessionValid
+		elif self._credentials != ("", "") and isQuickLoginPossible:
 			if not loggedIn:
 				loggedIn = self._phoneBackends[self._defaultBackendId].is_authed()
 
@@ -504,20 +777,19 @@ class Dialcentral(object):
 			return
 
 		_moduleLogger.debug("Changing from %s to %s" % (oldStatus, newStatus))
-		self._dialpads[oldStatus].disable()
-		self._accountViews[oldStatus].disable()
-		self._historyViews[oldStatus].disable()
-		self._messagesViews[oldStatus].disable()
-		self._contactsViews[oldStatus].disable()
-
-		self._dialpads[newStatus].enable()
-		self._accountViews[newStatus].enable()
-		self._historyViews[newStatus].enable()
-		self._messagesViews[newStatus].enable()
-		self._contactsViews[newStatus].enable()
+		for views in self._viewRegistries:
+			view = views.get(oldStatus)
+			if view is not None:
+				view.disable()
 
+		# Views not built yet get enabled as they are built
 		self._selectedBackendId = newStatus
+		for views in self._viewRegistries:
+			view = views.get(newStatus)
+			if view is not None:
+				view.enable()
 
+		# Always built, it is what hands the saved callback number to the backend
 		self._accountViews[self._selectedBackendId].update()
 		self._refresh_active_tab()
 		self._refresh_orientation()
@@ -527,22 +799,7 @@ class Dialcentral(object):
 		@note UI Thread
 		"""
 		try:
-			if not PROFILE_STARTUP:
-				self._defaultBackendId = config.getint(constants.__pretty_app_name__, "active")
-			else:
-				self._defaultBackendId = self.NULL_BACKEND
-			blobs = (
-				config.get(constants.__pretty_app_name__, "bin_blob_%i" % i)
-				for i in xrange(len(self._credentials))
-			)
-			creds = (
-				base64.b64decode(blob)
-				for blob in blobs
-			)
-			self._credentials = tuple(creds)
-
-			if self._alarmHandler is not None:
-				self._alarmHandler.load_settings(config, "alarm")
+			self._defaultBackendId, self._credentials = self._read_login_settings(config)
 
 			isFullscreen = config.getboolean(constants.__pretty_app_name__, "fullscreen")
 			if isFullscreen:
@@ -570,30 +827,50 @@ class Dialcentral(object):
 				),
 			)
 
-		for backendId, view in itertools.chain(
-			self._dialpads.iteritems(),
-			self._accountViews.iteritems(),
-			self._messagesViews.iteritems(),
-			self._historyViews.iteritems(),
-			self._contactsViews.iteritems(),
-		):
-			sectionName = "%s - %s" % (backendId, view.name())
-			try:
-				view.load_settings(config, sectionName)
-			except ConfigParser.NoOptionError, e:
-				_moduleLogger.exception(
-					"Settings file %s is missing section %s" % (
-						constants._user_settings_,
-						e.section,
-					),
-				)
-			except ConfigParser.NoSectionError, e:
-				_moduleLogger.exception(
-					"Settings file %s is missing section %s" % (
-						constants._user_settings_,
-						e.section,
-					),
-				)
+		# Views built later get their settings from here as they are built
+		self._config = config
+		for backendId, view in itertools.chain(*[
+			views.iteritems() for views in self._viewRegistries
+		]):
+			self._load_view_settings(backendId, view, config)
+
+	def _load_view_settings(self, backendId, view, config):
+		sectionName = self._view_section_name(backendId, view)
+		try:
+			view.load_settings(config, sectionName)
+		except ConfigParser.NoOptionError, e:
+			_moduleLogger.exception(
+				"Settings file %s is missing section %s" % (
+					constants._user_settings_,
+					e.section,
+				),
+			)
+		except ConfigParser.NoSectionError, e:
+			_moduleLogger.exception(
+				"Settings file %s is missing section %s" % (
+					constants._user_settings_,
+					e.section,
+				),
+			)
+
+	def _read_login_settings(self, config):
+		"""
+		@returns (backend id, credentials)
+		@note Thread Agnostic
+		"""
+		if not PROFILE_STARTUP:
+			backendId = config.getint(constants.__pretty_app_name__, "active")
+		else:
+			backendId = self.NULL_BACKEND
+		blobs = (
+			config.get(constants.__pretty_app_name__, "bin_blob_%i" % i)
+			for i in xrange(len(self._credentials))
+		)
+		creds = (
+			base64.b64decode(blob)
+			for blob in blobs
+		)
+		return backendId, tuple(creds)
 
 	def save_settings(self, config):
 		"""
@@ -613,21 +890,26 @@ class Dialcentral(object):
 		for i, value in enumerate(self._credentials):
 			blob = base64.b64encode(value)
 			config.set(constants.__pretty_app_name__, "bin_blob_%i" % i, blob)
-		config.add_section("alarm")
 		if self._alarmHandler is not None:
+			config.add_section("alarm")
 			self._alarmHandler.save_settings(config, "alarm")
 
-		for backendId, view in itertools.chain(
-			self._dialpads.iteritems(),
-			self._accountViews.iteritems(),
-			self._messagesViews.iteritems(),
-			self._historyViews.iteritems(),
-			self._contactsViews.iteritems(),
-		):
-			sectionName = "%s - %s" % (backendId, view.name())
+		for backendId, view in itertools.chain(*[
+			views.iteritems() for views in self._viewRegistries
+		]):
+			sectionName = self._view_section_name(backendId, view)
 			config.add_section(sectionName)
 			view.save_settings(config, sectionName)
 
+		# Whatever was not loaded this run, like a view that was never built,
+		# keeps the settings it was loaded with
+		for sectionName in self._config.sections():
+			if config.has_section(sectionName):
+				continue
+			config.add_section(sectionName)
+			for name, value in self._config.items(sectionName, True):
+				config.set(sectionName, name, value)
+
 	def _save_settings(self):
 		"""
 		@note Thread Agnostic
@@ -636,11 +918,19 @@ class Dialcentral(object):
 		self.save_settings(config)
 		with open(constants._user_settings_, "wb") as configFile:
 			config.write(configFile)
+		self._save_view_snapshots()
 
-	def _refresh_active_tab(self):
+	def _refresh_active_tab(self, clearCaches = False):
+		"""
+		@param clearCaches Have the address books refetch instead of serving
+			what they cached, for when the user asked for the refresh
+		"""
 		pageIndex = self._notebook.get_current_page()
 		if pageIndex == self.CONTACTS_TAB:
-			self._contactsViews[self._selectedBackendId].update(force=True)
+			contactsView = self._contactsViews[self._selectedBackendId]
+			if clearCaches:
+				contactsView.clear_caches()
+			contactsView.update(force=True)
 		elif pageIndex == self.RECENT_TAB:
 			self._historyViews[self._selectedBackendId].update(force=True)
 		elif pageIndex == self.MESSAGES_TAB:
@@ -683,9 +973,14 @@ class Dialcentral(object):
 	@gtk_toolbox.log_exception(_moduleLogger)
 	def _on_close(self, *args, **kwds):
 		try:
+			self._taskPool.stop()
 			if self._initDone:
 				self._save_settings()
 
+			reportPath = os.environ.get(STARTUP_REPORT_ENV, "")
+			if reportPath:
+				timeline.STARTUP.write_json(reportPath)
+
 			try:
 				self._deviceState.close()
 			except AttributeError:
@@ -697,10 +992,42 @@ class Dialcentral(object):
 		finally:
 			gtk.main_quit()
 
+	def _notify_daemon(self, command):
+		"""
+		Let the notifier daemon (when running) adapt its polling, without
+		blocking on it finishing a poll
+		"""
+		if self._alarmHandler is None or not self._alarmHandler.isEnabled:
+			return
+		self._send_daemon_command_async(command)
+
+	def _stop_notifier_daemon(self):
+		"""
+		Notifications were just turned off, which _notify_daemon no longer
+		passes on
+		"""
+		self._send_daemon_command_async("quit")
+
+	def _send_daemon_command_async(self, command):
+
+		def on_error(error):
+			_moduleLogger.info("Notifier daemon not told %s: %s" % (command, error))
+
+		self._taskPool.add_task(
+			self._send_daemon_command, (command, ), {},
+			lambda response: None, on_error,
+			go_utils.PRIORITY_NOTIFIER,
+		)
+
+	@staticmethod
+	def _send_daemon_command(command):
+		import alarm_notify
+		return alarm_notify.send_command(command, timeout=30)
+
 	def _on_device_state_change(self, shutdown, save_unsaved_data, memory_low, system_inactivity, message, userData):
 		"""
 		For shutdown or save_unsaved_data, our only state is cookies and I think the cookie manager handles that for us.
-		For system_inactivity, we have no background tasks to pause
+		For system_inactivity, the notifier daemon pauses its polling
 
 		@note Hildon specific
 		"""
@@ -708,11 +1035,16 @@ class Dialcentral(object):
 			if memory_low:
 				for backendId in self.BACKENDS:
 					self._phoneBackends[backendId].clear_caches()
-				self._contactsViews[self._selectedBackendId].clear_caches()
+				self._phoneBackends[self.GV_BACKEND].trim_caches()
+				contactsView = self._contactsViews.get(self._selectedBackendId)
+				if contactsView is not None:
+					contactsView.clear_caches()
 				gc.collect()
 
 			if save_unsaved_data or shutdown:
 				self._save_settings()
+
+			self._notify_daemon("inactive" if system_inactivity else "active")
 		except Exception, e:
 			self._errorDisplay.push_exception()
 
@@ -729,9 +1061,14 @@ class Dialcentral(object):
 			bearer = event.get_bearer_type()
 
 			if status == conic.STATUS_CONNECTED:
+				# Voicemails are only prefetched when the connection is cheap
+				self._isOnWlan = bearer.startswith("WLAN_")
+				self._notify_daemon("connected")
 				if self._initDone:
 					self._spawn_attempt_login()
 			elif status == conic.STATUS_DISCONNECTED:
+				self._isOnWlan = False
+				self._notify_daemon("disconnected")
 				if self._initDone:
 					self._defaultBackendId = self._selectedBackendId
 					self._change_loggedin_status(self.NULL_BACKEND)
@@ -778,19 +1115,29 @@ class Dialcentral(object):
 				self._toggle_rotate()
 				return True
 			elif event.keyval == gtk.keysyms.r and event.get_state() & gtk.gdk.CONTROL_MASK:
-				self._refresh_active_tab()
+				self._refresh_active_tab(clearCaches=True)
 			elif event.keyval == gtk.keysyms.i and event.get_state() & gtk.gdk.CONTROL_MASK:
 				self._import_contacts()
+			elif event.keyval == gtk.keysyms.Escape:
+				if self._cancel_action():
+					return True
 		except Exception, e:
 			self._errorDisplay.push_exception()
 
 	def _on_clearcookies_clicked(self, *args):
 		try:
 			self._phoneBackends[self._selectedBackendId].logout()
-			self._accountViews[self._selectedBackendId].clear()
-			self._historyViews[self._selectedBackendId].clear()
-			self._messagesViews[self._selectedBackendId].clear()
-			self._contactsViews[self._selectedBackendId].clear()
+			if self._messageStore is not None:
+				self._messageStore.clear()
+			try:
+				os.remove(self._gvContactsPath)
+			except OSError:
+				pass
+			for views in (self._accountViews, self._historyViews, self._messagesViews, self._contactsViews):
+				view = views.get(self._selectedBackendId)
+				if view is not None:
+					view.clear()
+			self._viewSnapshot.clear()
 			self._change_loggedin_status(self.NULL_BACKEND)
 
 			self._spawn_attempt_login(True)
@@ -839,7 +1186,7 @@ class Dialcentral(object):
 
 	def _on_tab_refresh(self, *args):
 		try:
-			self._refresh_active_tab()
+			self._refresh_active_tab(clearCaches=True)
 			self._reset_tab_refresh()
 		except Exception, e:
 			self._errorDisplay.push_exception()
@@ -849,65 +1196,104 @@ class Dialcentral(object):
 		try:
 			assert numbers, "No number specified"
 			assert message, "Empty message"
-			self.refresh_session()
-			try:
-				loggedIn = self._phoneBackends[self._selectedBackendId].is_authed()
-			except Exception, e:
-				loggedIn = False
-				self._errorDisplay.push_exception()
-				return
-
-			if not loggedIn:
-				self._errorDisplay.push_message(
-					"Backend link with GoogleVoice is not working, please try again"
-				)
-				return
-
-			dialed = False
-			try:
-				self._phoneBackends[self._selectedBackendId].send_sms(numbers, message)
-				hildonize.show_information_banner(self._window, "Sending to %s" % ", ".join(numbers))
-				_moduleLogger.info("Sending SMS to %r" % numbers)
-				dialed = True
-			except Exception, e:
-				self._errorDisplay.push_exception()
-
-			if dialed:
-				self._dialpads[self._selectedBackendId].clear()
+			self._start_action(self._send_sms_action, numbers, message)
 		except Exception, e:
 			self._errorDisplay.push_exception()
 
 	def _on_dial_clicked(self, number):
 		try:
 			assert number, "No number to call"
-			self.refresh_session()
+			backend = self._phoneBackends[self._selectedBackendId]
+			assert backend.get_callback_number() != "", "No callback number specified"
+			self._start_action(self._dial_action, number)
+		except Exception, e:
+			self._errorDisplay.push_exception()
+
+	def _start_action(self, func, *args):
+		"""
+		Run one of the *_action generators, replacing any still waiting to go
+		out, one already sending is left to finish
+		@note UI Thread
+		"""
+		if self._pendingAction is not None and self._pendingAction.cancel():
+			hildonize.show_information_banner(self._window, "Cancelled")
+		self._pendingAction = go_utils.AsyncLinearExecution(self._taskPool, func)
+		self._pendingAction.start(*args)
+
+	def _cancel_action(self):
+		"""
+		@returns Whether there was an action to cancel
+		@note UI Thread
+		"""
+		action = self._pendingAction
+		if action is None or not action.is_running():
+			return False
+		if action.cancel():
+			self._pendingAction = None
+			hildonize.show_information_banner(self._window, "Cancelled")
+		else:
+			# A request already being sent can't be taken back
+			hildonize.show_information_banner(self._window, "Already in progress")
+		return True
+
+	def _ensure_session(self):
+		"""
+		Logs back in only if the session lapsed, with is_authed not going to the
+		network when the session was validated in the last couple of minutes
+		@note Thread Agnostic
+		"""
+		backend = self._phoneBackends[self._selectedBackendId]
+		if backend.is_authed():
+			return
+		if not self._login_by_settings():
+			raise RuntimeError("Backend link with GoogleVoice is not working, please try again")
+
+	def _dial_action(self, number):
+		"""
+		@note The dialpad is cleared as soon as call is pressed, the number is
+		put back if the call doesn't go through
+		"""
+		backend = self._phoneBackends[self._selectedBackendId]
+		dialpad = self._dialpads[self._selectedBackendId]
+		banner = hildonize.show_busy_banner_start(self._window, "Calling %s" % number)
+		try:
 			try:
-				loggedIn = self._phoneBackends[self._selectedBackendId].is_authed()
+				yield self._ensure_session, (), {}
+				yield backend.call, (number, ), {}
+			except GeneratorExit:
+				self._restore_number(dialpad, number)
+				raise
 			except Exception, e:
-				loggedIn = False
+				self._restore_number(dialpad, number)
 				self._errorDisplay.push_exception()
 				return
+			hildonize.show_information_banner(self._window, "Calling %s" % number)
+			_moduleLogger.info("Calling %s" % number)
+		finally:
+			hildonize.show_busy_banner_end(banner)
 
-			if not loggedIn:
-				self._errorDisplay.push_message(
-					"Backend link with GoogleVoice is not working, please try again"
-				)
-				return
-
-			dialed = False
+	def _send_sms_action(self, numbers, message):
+		backend = self._phoneBackends[self._selectedBackendId]
+		dialpad = self._dialpads[self._selectedBackendId]
+		banner = hildonize.show_busy_banner_start(self._window, "Sending to %s" % ", ".join(numbers))
+		try:
 			try:
-				assert self._phoneBackends[self._selectedBackendId].get_callback_number() != "", "No callback number specified"
-				self._phoneBackends[self._selectedBackendId].call(number)
-				hildonize.show_information_banner(self._window, "Calling %s" % number)
-				_moduleLogger.info("Calling %s" % number)
-				dialed = True
+				yield self._ensure_session, (), {}
+				yield backend.send_sms, (numbers, message), {}
+			except GeneratorExit:
+				raise
 			except Exception, e:
 				self._errorDisplay.push_exception()
+				return
+			hildonize.show_information_banner(self._window, "Sent to %s" % ", ".join(numbers))
+			_moduleLogger.info("Sent SMS to %r" % numbers)
+			dialpad.clear()
+		finally:
+			hildonize.show_busy_banner_end(banner)
 
-			if dialed:
-				self._dialpads[self._selectedBackendId].clear()
-		except Exception, e:
-			self._errorDisplay.push_exception()
+	def _restore_number(self, dialpad, number):
+		if not dialpad.get_number():
+			dialpad.set_number(number)
 
 	def _import_contacts(self):
 		csvFilter = gtk.FileFilter()
@@ -929,7 +1315,7 @@ class Dialcentral(object):
 
 	def _on_menu_refresh(self, *args):
 		try:
-			self._refresh_active_tab()
+			self._refresh_active_tab(clearCaches=True)
 		except Exception, e:
 			self._errorDisplay.push_exception()
 
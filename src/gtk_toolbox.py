@@ -81,6 +81,133 @@ def gtk_lock():
 		gtk.gdk.threads_leave()
 
 
+def build_list_store(columnTypes, rows):
+	"""
+	Fill a new model that no view is using yet, so no gtk lock is needed
+
+	@note Thread Agnostic
+	"""
+	model = gtk.ListStore(*columnTypes)
+	for row in rows:
+		model.append(row)
+	return model
+
+
+def append_rows(model, rows, batchSize = 500):
+	"""
+	Append to a model that might be displayed, only taking the gtk lock once
+	per batch of rows
+
+	@note Thread Agnostic
+	"""
+	for batch in iterbatch(rows, batchSize):
+		with gtk_lock():
+			for row in batch:
+				model.append(row)
+
+
+def reconcile_rows(model, rows, get_key, batchSize = 500):
+	"""
+	Make a model that might be displayed hold rows, in order, by only
+	inserting, updating and removing the rows that differ.  Unlike clearing
+	and re-appending, untouched rows keep their selection and the view
+	doesn't redraw them.
+
+	@param get_key(row) -> hashable that identifies the row across refreshes
+	@returns Number of rows touched
+	@note Thread Agnostic
+	"""
+	with gtk_lock():
+		currentRows = [tuple(row) for row in model]
+	changes = diff_rows(currentRows, rows, get_key)
+	for batch in iterbatch(changes, batchSize):
+		with gtk_lock():
+			for change, index, row in batch:
+				if change == "remove":
+					model.remove(model.get_iter((index, )))
+				elif change == "insert":
+					model.insert(index, row)
+				elif change == "update":
+					model[index] = row
+				else:
+					raise NotImplementedError(change)
+	return len(changes)
+
+
+def diff_rows(currentRows, newRows, get_key):
+	"""
+	@returns List of ("remove" | "insert" | "update", index, row), with the
+		indices being valid when the changes are applied in order
+
+	>>> get_key = lambda row: row[0]
+	>>> diff_rows([], [("a", 1)], get_key)
+	[('insert', 0, ('a', 1))]
+	>>> diff_rows([("a", 1), ("b", 2)], [("c", 3), ("a", 1), ("b", 2)], get_key)
+	[('insert', 0, ('c', 3))]
+	>>> diff_rows([("a", 1), ("b", 2)], [("a", 1), ("b", 5)], get_key)
+	[('update', 1, ('b', 5))]
+	>>> diff_rows([("a", 1), ("b", 2), ("c", 3)], [("a", 1), ("c", 3)], get_key)
+	[('remove', 1, None)]
+	>>> diff_rows([("a", 1), ("b", 2)], [("b", 2), ("a", 1)], get_key)
+	[('remove', 1, None), ('insert', 0, ('b', 2))]
+	>>> diff_rows([("a", 1), ("a", 2)], [("a", 1), ("a", 2), ("a", 3)], get_key)
+	[('insert', 2, ('a', 3))]
+	"""
+	newRows = [tuple(row) for row in newRows]
+	# Duplicate keys are told apart by the order they show up in
+	currentKeys = list(_unique_keys(currentRows, get_key))
+	newKeys = list(_unique_keys(newRows, get_key))
+	newKeySet = set(newKeys)
+	currentValues = dict(itertools.izip(currentKeys, currentRows))
+
+	changes = []
+	for index in reversed(xrange(len(currentKeys))):
+		if currentKeys[index] not in newKeySet:
+			changes.append(("remove", index, None))
+			del currentKeys[index]
+
+	for index, (key, row) in enumerate(itertools.izip(newKeys, newRows)):
+		if index < len(currentKeys) and currentKeys[index] == key:
+			if currentValues[key] != row:
+				changes.append(("update", index, row))
+			continue
+
+		if key in currentValues:
+			oldIndex = currentKeys.index(key, index)
+			changes.append(("remove", oldIndex, None))
+			del currentKeys[oldIndex]
+		changes.append(("insert", index, row))
+		currentKeys.insert(index, key)
+
+	return changes
+
+
+def _unique_keys(rows, get_key):
+	seen = {}
+	for row in rows:
+		key = get_key(row)
+		occurrence = seen.get(key, 0)
+		seen[key] = occurrence + 1
+		yield key, occurrence
+
+
+def iterbatch(iterable, batchSize):
+	"""
+	>>> list(iterbatch(xrange(5), 2))
+	[[0, 1], [2, 3], [4]]
+	>>> list(iterbatch([], 2))
+	[]
+	"""
+	batch = []
+	for item in iterable:
+		batch.append(item)
+		if batchSize <= len(batch):
+			yield batch
+			batch = []
+	if batch:
+		yield batch
+
+
 def find_parent_window(widget):
 	while True:
 		parent = widget.get_parent()
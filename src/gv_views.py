@@ -34,6 +34,8 @@ import gtk
 
 import gtk_toolbox
 import hildonize
+import timeline
+import alarm_handler
 from backends import gv_backend
 from backends import null_backend
 
@@ -795,7 +797,7 @@ class AccountInfo(object):
 
 		if self._alarmHandler is not None:
 			self._notifyCheckbox.set_active(self._alarmHandler.isEnabled)
-			self._minutesEntryButton.set_label("%d minutes" % self._alarmHandler.recurrence)
+			self._minutesEntryButton.set_label(alarm_handler.describe_recurrence(self._alarmHandler.recurrence))
 			self._missedCheckbox.set_active(self._notifyOnMissed)
 			self._voicemailCheckbox.set_active(self._notifyOnVoicemail)
 			self._smsCheckbox.set_active(self._notifyOnSms)
@@ -861,6 +863,9 @@ class AccountInfo(object):
 	def save_everything(self):
 		raise NotImplementedError
 
+	def stop_notifier(self):
+		raise NotImplementedError
+
 	@staticmethod
 	def name():
 		return "Account Info"
@@ -943,11 +948,14 @@ class AccountInfo(object):
 		try:
 			isEnabled = self._notifyCheckbox.get_active()
 			if isEnabled != self._alarmHandler.isEnabled or recurrence != self._alarmHandler.recurrence:
+				wasEnabled = self._alarmHandler.isEnabled
 				self._alarmHandler.apply_settings(isEnabled, recurrence)
+				if wasEnabled and not self._alarmHandler.isEnabled:
+					self.stop_notifier()
 		finally:
 			self.save_everything()
 			self._notifyCheckbox.set_active(self._alarmHandler.isEnabled)
-			self._minutesEntryButton.set_label("%d Minutes" % self._alarmHandler.recurrence)
+			self._minutesEntryButton.set_label(alarm_handler.describe_recurrence(self._alarmHandler.recurrence))
 
 	def _on_callbackentry_clicked(self, *args):
 		try:
@@ -988,6 +996,7 @@ class AccountInfo(object):
 
 	def _on_minutes_clicked(self, *args):
 		recurrenceChoices = [
+			(alarm_handler.ADAPTIVE_RECURRENCE, "Adaptive"),
 			(1, "1 minute"),
 			(2, "2 minutes"),
 			(3, "3 minutes"),
@@ -1061,23 +1070,19 @@ class CallHistoryView(object):
 	ACTION_IDX = 2
 	FROM_IDX = 3
 	FROM_ID_IDX = 4
+	TIME_IDX = 5
 
 	HISTORY_ITEM_TYPES = ["All", "Received", "Missed", "Placed"]
 
-	def __init__(self, widgetTree, backend, errorDisplay):
+	def __init__(self, widgetTree, backend, errorDisplay, scheduler, messageStore = None):
 		self._errorDisplay = errorDisplay
 		self._backend = backend
+		self._scheduler = scheduler
+		self._messageStore = messageStore
 
 		self._isPopulated = False
-		self._historymodel = gtk.ListStore(
-			gobject.TYPE_STRING, # number
-			gobject.TYPE_STRING, # date
-			gobject.TYPE_STRING, # action
-			gobject.TYPE_STRING, # from
-			gobject.TYPE_STRING, # from id
-		)
-		self._historymodelfiltered = self._historymodel.filter_new()
-		self._historymodelfiltered.set_visible_func(self._is_history_visible)
+		self._isCacheShown = False
+		self._historymodel, self._historymodelfiltered = self._create_model(())
 		self._historyview = widgetTree.get_widget("historyview")
 		self._historyviewselection = None
 		self._onRecentviewRowActivatedId = 0
@@ -1116,13 +1121,6 @@ class CallHistoryView(object):
 		self._historyFilterSelector.connect("clicked", self._on_history_filter_clicked)
 		self._selectedFilter = "All"
 
-		self._updateSink = gtk_toolbox.threaded_stage(
-			gtk_toolbox.comap(
-				self._idly_populate_historyview,
-				gtk_toolbox.null_sink(),
-			)
-		)
-
 	def enable(self):
 		assert self._backend.is_authed(), "Attempting to enable backend while not logged in"
 		self._historyFilterSelector.set_label(self._selectedFilter)
@@ -1159,13 +1157,44 @@ class CallHistoryView(object):
 	def update(self, force = False):
 		if not force and self._isPopulated:
 			return False
-		self._updateSink.send(())
+		self._scheduler.request(self, self._idly_populate_historyview)
 		return True
 
 	def clear(self):
+		self._scheduler.cancel(self)
 		self._isPopulated = False
+		self._isCacheShown = False
 		self._historymodel.clear()
 
+	def load_cache(self):
+		"""
+		Show the call history from the last run until the network has been checked
+		@note Thread Agnostic
+		"""
+		if self._messageStore is None:
+			return
+		try:
+			self._show_history(self._messageStore.get_recent())
+			self._isCacheShown = True
+		except Exception, e:
+			self._errorDisplay.push_exception_with_lock()
+
+	def show_cache(self):
+		"""
+		Like load_cache, for a view that was just built.  The relative dates are
+		as of the last sync, the first update re-renders them
+		@note UI Thread or with the gtk lock held
+		"""
+		if self._messageStore is None:
+			return
+		try:
+			rows = self._build_history_rows(self._messageStore.get_recent())
+		except Exception, e:
+			self._errorDisplay.push_exception()
+			return
+		self._historymodel, self._historymodelfiltered = self._create_model(rows)
+		self._isCacheShown = True
+
 	@staticmethod
 	def name():
 		return "Recent Calls"
@@ -1192,6 +1221,25 @@ class CallHistoryView(object):
 		else:
 			raise NotImplementedError(orientation)
 
+	def _create_model(self, rows):
+		"""
+		@note Thread Agnostic
+		"""
+		model = gtk_toolbox.build_list_store(
+			(
+				gobject.TYPE_STRING, # number
+				gobject.TYPE_STRING, # date
+				gobject.TYPE_STRING, # action
+				gobject.TYPE_STRING, # from
+				gobject.TYPE_STRING, # from id
+				object, # time
+			),
+			rows,
+		)
+		modelFiltered = model.filter_new()
+		modelFiltered.set_visible_func(self._is_history_visible)
+		return model, modelFiltered
+
 	def _is_history_visible(self, model, iter):
 		try:
 			action = model.get_value(iter, self.ACTION_IDX)
@@ -1205,42 +1253,78 @@ class CallHistoryView(object):
 		except Exception, e:
 			self._errorDisplay.push_exception()
 
-	def _idly_populate_historyview(self):
+	def _idly_populate_historyview(self, token):
+		timeline.STARTUP.begin("history population")
 		with gtk_toolbox.gtk_lock():
 			banner = hildonize.show_busy_banner_start(self._window, "Loading Call History")
 		try:
-			self._historymodel.clear()
+			if not self._isCacheShown:
+				self.load_cache()
 			self._isPopulated = True
 
 			try:
-				historyItems = self._backend.get_recent()
+				historyItems = list(self._backend.get_recent())
 			except Exception, e:
 				self._errorDisplay.push_exception_with_lock()
 				self._isPopulated = False
-				historyItems = []
+				historyItems = None
 
-			historyItems = (
-				gv_backend.decorate_recent(data)
-				for data in gv_backend.sort_messages(historyItems)
-			)
+			if token.isCancelled:
+				historyItems = None
 
-			for contactId, personName, phoneNumber, date, action in historyItems:
-				if not personName:
-					personName = "Unknown"
-				date = abbrev_relative_date(date)
-				prettyNumber = phoneNumber[2:] if phoneNumber.startswith("+1") else phoneNumber
-				prettyNumber = make_pretty(prettyNumber)
-				item = (prettyNumber, date, action.capitalize(), personName, contactId)
-				with gtk_toolbox.gtk_lock():
-					self._historymodel.append(item)
+			if historyItems is not None:
+				if self._messageStore is not None and self._isCacheShown:
+					self._messageStore.sync_recent(historyItems)
+				# Even with nothing new the relative dates have moved on
+				self._show_history(historyItems)
 		except Exception, e:
 			self._errorDisplay.push_exception_with_lock()
 		finally:
 			with gtk_toolbox.gtk_lock():
 				hildonize.show_busy_banner_end(banner)
+			timeline.STARTUP.end("history population")
 
 		return False
 
+	def _show_history(self, historyItems):
+		rows = self._build_history_rows(historyItems)
+		with gtk_toolbox.gtk_lock():
+			isEmpty = len(self._historymodel) == 0
+		if isEmpty:
+			model, modelFiltered = self._create_model(rows)
+			with gtk_toolbox.gtk_lock():
+				oldModelFiltered = self._historymodelfiltered
+				self._historymodel, self._historymodelfiltered = model, modelFiltered
+				if self._historyview.get_model() is oldModelFiltered:
+					self._historyview.set_model(self._historymodelfiltered)
+		else:
+			gtk_toolbox.reconcile_rows(self._historymodel, rows, self._history_row_key)
+
+	@staticmethod
+	def _build_history_rows(historyItems):
+		"""
+		@note Thread Agnostic
+		"""
+		historyItems = (
+			(gv_backend.decorate_recent(data), data["time"])
+			for data in gv_backend.sort_messages(historyItems)
+		)
+
+		rows = []
+		for (contactId, personName, phoneNumber, date, action), exactTime in historyItems:
+			if not personName:
+				personName = "Unknown"
+			date = abbrev_relative_date(date)
+			prettyNumber = phoneNumber[2:] if phoneNumber.startswith("+1") else phoneNumber
+			prettyNumber = make_pretty(prettyNumber)
+			item = (prettyNumber, date, action.capitalize(), personName, contactId, exactTime)
+			rows.append(item)
+		return rows
+
+	@classmethod
+	def _history_row_key(cls, row):
+		return row[cls.NUMBER_IDX], row[cls.TIME_IDX], row[cls.ACTION_IDX]
+
 	def _on_history_filter_clicked(self, *args, **kwds):
 		try:
 			selectedComboIndex = self.HISTORY_ITEM_TYPES.index(self._selectedFilter)
@@ -1263,7 +1347,7 @@ class CallHistoryView(object):
 			self._errorDisplay.push_exception()
 
 	def _history_summary(self, expectedNumber):
-		for number, action, date, whoFrom, whoFromId in self._historymodel:
+		for number, action, date, whoFrom, whoFromId, exactTime in self._historymodel:
 			if expectedNumber is not None and expectedNumber == number:
 				yield "%s <i>(%s)</i> - %s %s" % (number, whoFrom, date, action)
 
@@ -1313,22 +1397,15 @@ class MessagesView(object):
 	ALL_STATUS = "Any"
 	MESSAGE_STATUSES = [UNREAD_STATUS, UNARCHIVED_STATUS, ALL_STATUS]
 
-	def __init__(self, widgetTree, backend, errorDisplay):
+	def __init__(self, widgetTree, backend, errorDisplay, scheduler, messageStore = None):
 		self._errorDisplay = errorDisplay
 		self._backend = backend
+		self._scheduler = scheduler
+		self._messageStore = messageStore
 
 		self._isPopulated = False
-		self._messagemodel = gtk.ListStore(
-			gobject.TYPE_STRING, # number
-			gobject.TYPE_STRING, # date
-			gobject.TYPE_STRING, # header
-			gobject.TYPE_STRING, # message
-			object, # messages
-			gobject.TYPE_STRING, # from id
-			object, # message data
-		)
-		self._messagemodelfiltered = self._messagemodel.filter_new()
-		self._messagemodelfiltered.set_visible_func(self._is_message_visible)
+		self._isCacheShown = False
+		self._messagemodel, self._messagemodelfiltered = self._create_model(())
 		self._messageview = widgetTree.get_widget("messages_view")
 		self._messageviewselection = None
 		self._onMessageviewRowActivatedId = 0
@@ -1350,13 +1427,6 @@ class MessagesView(object):
 		self._onMessageStatusClickedId = 0
 		self._messageStatus = self.ALL_STATUS
 
-		self._updateSink = gtk_toolbox.threaded_stage(
-			gtk_toolbox.comap(
-				self._idly_populate_messageview,
-				gtk_toolbox.null_sink(),
-			)
-		)
-
 	def enable(self):
 		assert self._backend.is_authed(), "Attempting to enable backend while not logged in"
 		self._messageview.set_model(self._messagemodelfiltered)
@@ -1399,13 +1469,44 @@ class MessagesView(object):
 	def update(self, force = False):
 		if not force and self._isPopulated:
 			return False
-		self._updateSink.send(())
+		self._scheduler.request(self, self._idly_populate_messageview)
 		return True
 
 	def clear(self):
+		self._scheduler.cancel(self)
 		self._isPopulated = False
+		self._isCacheShown = False
 		self._messagemodel.clear()
 
+	def load_cache(self):
+		"""
+		Show the messages from the last run until the network has been checked
+		@note Thread Agnostic
+		"""
+		if self._messageStore is None:
+			return
+		try:
+			self._show_messages(self._messageStore.get_messages())
+			self._isCacheShown = True
+		except Exception, e:
+			self._errorDisplay.push_exception_with_lock()
+
+	def show_cache(self):
+		"""
+		Like load_cache, for a view that was just built.  The relative dates are
+		as of the last sync, the first update re-renders them
+		@note UI Thread or with the gtk lock held
+		"""
+		if self._messageStore is None:
+			return
+		try:
+			rows = self._build_message_rows(self._messageStore.get_messages())
+		except Exception, e:
+			self._errorDisplay.push_exception()
+			return
+		self._messagemodel, self._messagemodelfiltered = self._create_model(rows)
+		self._isCacheShown = True
+
 	@staticmethod
 	def name():
 		return "Messages"
@@ -1436,6 +1537,26 @@ class MessagesView(object):
 		else:
 			raise NotImplementedError(orientation)
 
+	def _create_model(self, rows):
+		"""
+		@note Thread Agnostic
+		"""
+		model = gtk_toolbox.build_list_store(
+			(
+				gobject.TYPE_STRING, # number
+				gobject.TYPE_STRING, # date
+				gobject.TYPE_STRING, # header
+				gobject.TYPE_STRING, # message
+				object, # messages
+				gobject.TYPE_STRING, # from id
+				object, # message data
+			),
+			rows,
+		)
+		modelFiltered = model.filter_new()
+		modelFiltered.set_visible_func(self._is_message_visible)
+		return model, modelFiltered
+
 	def _is_message_visible(self, model, iter):
 		try:
 			message = model.get_value(iter, self.MESSAGE_DATA_IDX)
@@ -1469,58 +1590,98 @@ class MessagesView(object):
 
 	_MIN_MESSAGES_SHOWN = 4
 
-	def _idly_populate_messageview(self):
+	def _idly_populate_messageview(self, token):
+		timeline.STARTUP.begin("messages population")
 		with gtk_toolbox.gtk_lock():
 			banner = hildonize.show_busy_banner_start(self._window, "Loading Messages")
 		try:
-			self._messagemodel.clear()
+			if not self._isCacheShown:
+				self.load_cache()
 			self._isPopulated = True
 
 			if self._messageType == self.NO_MESSAGES:
 				messageItems = []
 			else:
 				try:
-					messageItems = self._backend.get_messages()
+					messageItems = list(self._backend.get_messages())
 				except Exception, e:
 					self._errorDisplay.push_exception_with_lock()
 					self._isPopulated = False
-					messageItems = []
-
-			messageItems = (
-				(gv_backend.decorate_message(message), message)
-				for message in gv_backend.sort_messages(messageItems)
-			)
-
-			for (contactId, header, number, relativeDate, messages), messageData in messageItems:
-				prettyNumber = number[2:] if number.startswith("+1") else number
-				prettyNumber = make_pretty(prettyNumber)
-
-				firstMessage = "<b>%s - %s</b> <i>(%s)</i>" % (header, prettyNumber, relativeDate)
-				expandedMessages = [firstMessage]
-				expandedMessages.extend(messages)
-				if (self._MIN_MESSAGES_SHOWN + 1) < len(messages):
-					firstMessage = "<b>%s - %s</b> <i>(%s)</i>" % (header, prettyNumber, relativeDate)
-					secondMessage = "<i>%d Messages Hidden...</i>" % (len(messages) - self._MIN_MESSAGES_SHOWN, )
-					collapsedMessages = [firstMessage, secondMessage]
-					collapsedMessages.extend(messages[-(self._MIN_MESSAGES_SHOWN+0):])
-				else:
-					collapsedMessages = expandedMessages
-				#collapsedMessages = _collapse_message(collapsedMessages, 60, self._MIN_MESSAGES_SHOWN)
-
-				number = make_ugly(number)
-
-				row = number, relativeDate, header, "\n".join(collapsedMessages), expandedMessages, contactId, messageData
-				with gtk_toolbox.gtk_lock():
-					self._messagemodel.append(row)
+					messageItems = None
+
+			if token.isCancelled:
+				messageItems = None
+
+			if messageItems is not None:
+				if (
+					self._messageStore is not None and
+					self._isCacheShown and
+					self._messageType != self.NO_MESSAGES
+				):
+					self._messageStore.sync_messages(messageItems)
+				# Even with nothing new the relative dates have moved on
+				self._show_messages(messageItems)
 		except Exception, e:
 			self._errorDisplay.push_exception_with_lock()
 		finally:
 			with gtk_toolbox.gtk_lock():
 				hildonize.show_busy_banner_end(banner)
 				self._messagemodelfiltered.refilter()
+			timeline.STARTUP.end("messages population")
 
 		return False
 
+	def _show_messages(self, messageItems):
+		rows = self._build_message_rows(messageItems)
+		with gtk_toolbox.gtk_lock():
+			isEmpty = len(self._messagemodel) == 0
+		if isEmpty:
+			model, modelFiltered = self._create_model(rows)
+			with gtk_toolbox.gtk_lock():
+				oldModelFiltered = self._messagemodelfiltered
+				self._messagemodel, self._messagemodelfiltered = model, modelFiltered
+				if self._messageview.get_model() is oldModelFiltered:
+					self._messageview.set_model(self._messagemodelfiltered)
+		else:
+			gtk_toolbox.reconcile_rows(self._messagemodel, rows, self._message_row_key)
+
+	@classmethod
+	def _build_message_rows(cls, messageItems):
+		"""
+		@note Thread Agnostic
+		"""
+		messageItems = (
+			(gv_backend.decorate_message(message), message)
+			for message in gv_backend.sort_messages(messageItems)
+		)
+
+		rows = []
+		for (contactId, header, number, relativeDate, messages), messageData in messageItems:
+			prettyNumber = number[2:] if number.startswith("+1") else number
+			prettyNumber = make_pretty(prettyNumber)
+
+			firstMessage = "<b>%s - %s</b> <i>(%s)</i>" % (header, prettyNumber, relativeDate)
+			expandedMessages = [firstMessage]
+			expandedMessages.extend(messages)
+			if (cls._MIN_MESSAGES_SHOWN + 1) < len(messages):
+				firstMessage = "<b>%s - %s</b> <i>(%s)</i>" % (header, prettyNumber, relativeDate)
+				secondMessage = "<i>%d Messages Hidden...</i>" % (len(messages) - cls._MIN_MESSAGES_SHOWN, )
+				collapsedMessages = [firstMessage, secondMessage]
+				collapsedMessages.extend(messages[-(cls._MIN_MESSAGES_SHOWN+0):])
+			else:
+				collapsedMessages = expandedMessages
+			#collapsedMessages = _collapse_message(collapsedMessages, 60, cls._MIN_MESSAGES_SHOWN)
+
+			number = make_ugly(number)
+
+			row = number, relativeDate, header, "\n".join(collapsedMessages), expandedMessages, contactId, messageData
+			rows.append(row)
+		return rows
+
+	@classmethod
+	def _message_row_key(cls, row):
+		return row[cls.MESSAGE_DATA_IDX]["id"]
+
 	def _on_messageview_row_activated(self, treeview, path, view_column):
 		try:
 			childPath = self._messagemodelfiltered.convert_path_to_child_path(path)
@@ -1588,15 +1749,123 @@ class MessagesView(object):
 			self._errorDisplay.push_exception()
 
 
+class ContactsModel(gtk.GenericTreeModel):
+	"""
+	List model over an address book's (contact id, contact name) pairs that
+	only builds the cells gtk asks for, which with fixed height rows is about
+	the visible ones.  Avoids copying large books into a ListStore.
+	"""
+
+	def __init__(self, addressBook, contacts):
+		gtk.GenericTreeModel.__init__(self)
+		self.set_property("leak-references", False)
+		self._addressBook = addressBook
+		self._contactIds = []
+		self._contactNames = []
+		for contactId, contactName in contacts:
+			self._contactIds.append(contactId)
+			self._contactNames.append(contactName)
+
+	def reconcile(self, contacts, batchSize = 500):
+		"""
+		Update the model to hold contacts, only signaling the rows that changed
+
+		@note Thread Agnostic
+		"""
+		with gtk_toolbox.gtk_lock():
+			currentRows = self.get_contacts()
+		changes = gtk_toolbox.diff_rows(currentRows, contacts, lambda row: row[0])
+		for batch in gtk_toolbox.iterbatch(changes, batchSize):
+			with gtk_toolbox.gtk_lock():
+				for change, index, row in batch:
+					path = (index, )
+					if change == "remove":
+						del self._contactIds[index]
+						del self._contactNames[index]
+						self.row_deleted(path)
+					elif change == "insert":
+						self._contactIds.insert(index, row[0])
+						self._contactNames.insert(index, row[1])
+						self.row_inserted(path, self.get_iter(path))
+					elif change == "update":
+						self._contactIds[index], self._contactNames[index] = row
+						self.row_changed(path, self.get_iter(path))
+					else:
+						raise NotImplementedError(change)
+		return len(changes)
+
+	def get_contacts(self):
+		"""
+		@returns List of (contact id, contact name) in the model
+		"""
+		return zip(self._contactIds, self._contactNames)
+
+	def on_get_flags(self):
+		return gtk.TREE_MODEL_LIST_ONLY
+
+	def on_get_n_columns(self):
+		return 3
+
+	def on_get_column_type(self, index):
+		return gobject.TYPE_STRING
+
+	def on_get_iter(self, path):
+		index = path[0]
+		if index < len(self._contactIds):
+			return index
+		return None
+
+	def on_get_path(self, rowref):
+		return (rowref, )
+
+	def on_get_value(self, rowref, column):
+		if column == ContactsView.CONTACT_TYPE_IDX:
+			return self._addressBook.contact_source_short_name(self._contactIds[rowref])
+		elif column == ContactsView.CONTACT_NAME_IDX:
+			return self._contactNames[rowref]
+		elif column == ContactsView.CONTACT_ID_IDX:
+			return self._contactIds[rowref]
+		else:
+			raise IndexError(column)
+
+	def on_iter_next(self, rowref):
+		nextRowref = rowref + 1
+		if nextRowref < len(self._contactIds):
+			return nextRowref
+		return None
+
+	def on_iter_children(self, parent):
+		if parent is None and self._contactIds:
+			return 0
+		return None
+
+	def on_iter_has_child(self, rowref):
+		return False
+
+	def on_iter_n_children(self, rowref):
+		if rowref is None:
+			return len(self._contactIds)
+		return 0
+
+	def on_iter_nth_child(self, parent, n):
+		if parent is None and n < len(self._contactIds):
+			return n
+		return None
+
+	def on_iter_parent(self, child):
+		return None
+
+
 class ContactsView(object):
 
 	CONTACT_TYPE_IDX = 0
 	CONTACT_NAME_IDX = 1
 	CONTACT_ID_IDX = 2
 
-	def __init__(self, widgetTree, backend, errorDisplay):
+	def __init__(self, widgetTree, backend, errorDisplay, scheduler):
 		self._errorDisplay = errorDisplay
 		self._backend = backend
+		self._scheduler = scheduler
 
 		self._addressBook = None
 		self._selectedComboIndex = 0
@@ -1606,11 +1875,10 @@ class ContactsView(object):
 		self._bookSelectionButton = widgetTree.get_widget("addressbookSelectButton")
 
 		self._isPopulated = False
-		self._contactsmodel = gtk.ListStore(
-			gobject.TYPE_STRING, # Contact Type
-			gobject.TYPE_STRING, # Contact Name
-			gobject.TYPE_STRING, # Contact ID
-		)
+		self._contactsmodel = ContactsModel(None, ())
+		self._modelAddressBook = None
+		self._addressBookKey = None
+		self._pendingSnapshot = None
 		self._contactsviewselection = None
 		self._contactsview = widgetTree.get_widget("contactsview")
 
@@ -1625,25 +1893,17 @@ class ContactsView(object):
 		self._contactColumn.pack_start(textrenderer, expand=True)
 		self._contactColumn.add_attribute(textrenderer, 'text', self.CONTACT_NAME_IDX)
 		self._contactColumn.set_sizing(gtk.TREE_VIEW_COLUMN_FIXED)
-		self._contactColumn.set_sort_column_id(1)
 		self._contactColumn.set_visible(True)
 
 		self._onContactsviewRowActivatedId = 0
 		self._onAddressbookButtonChangedId = 0
 		self._window = gtk_toolbox.find_parent_window(self._contactsview)
 
-		self._updateSink = gtk_toolbox.threaded_stage(
-			gtk_toolbox.comap(
-				self._idly_populate_contactsview,
-				gtk_toolbox.null_sink(),
-			)
-		)
-
 	def enable(self):
 		assert self._backend.is_authed(), "Attempting to enable backend while not logged in"
 
 		self._contactsview.set_model(self._contactsmodel)
-		self._contactsview.set_fixed_height_mode(False)
+		self._contactsview.set_fixed_height_mode(True)
 		self._contactsview.append_column(self._contactColumn)
 		self._contactsviewselection = self._contactsview.get_selection()
 		self._contactsviewselection.set_mode(gtk.SELECTION_SINGLE)
@@ -1672,6 +1932,14 @@ class ContactsView(object):
 		selectedBookId = self._booksList[self._selectedComboIndex][1]
 		self.open_addressbook(selectedFactoryId, selectedBookId)
 
+		if self._pendingSnapshot is not None:
+			bookKey, contacts = self._pendingSnapshot
+			self._pendingSnapshot = None
+			if bookKey == self._addressBookKey:
+				self._contactsmodel = ContactsModel(self._addressBook, contacts)
+				self._modelAddressBook = self._addressBook
+				self._contactsview.set_model(self._contactsmodel)
+
 	def disable(self):
 		self._contactsview.disconnect(self._onContactsviewRowActivatedId)
 		self._bookSelectionButton.disconnect(self._onAddressbookButtonChangedId)
@@ -1700,19 +1968,43 @@ class ContactsView(object):
 		bookFactoryIndex = int(bookFactoryId)
 		addressBook = self._addressBookFactories[bookFactoryIndex].open_addressbook(bookId)
 		self._addressBook = addressBook
+		self._addressBookKey = (str(bookFactoryId), bookId)
 
-	def update(self, force = False):
+	def update(self, force = False, supersede = False):
+		"""
+		@param supersede Abandon a load that is under way, like one of an
+			address book no longer selected
+		"""
 		if not force and self._isPopulated:
 			return False
-		self._updateSink.send(())
+		self._scheduler.request(self, self._idly_populate_contactsview, supersede)
 		return True
 
 	def clear(self):
+		self._scheduler.cancel(self)
 		self._isPopulated = False
-		self._contactsmodel.clear()
-		for factory in self._addressBookFactories:
-			factory.clear_caches()
-		self._addressBook.clear_caches()
+		oldModel = self._contactsmodel
+		self._contactsmodel = ContactsModel(None, ())
+		if self._contactsview.get_model() is oldModel:
+			self._contactsview.set_model(self._contactsmodel)
+		self._modelAddressBook = None
+		self._pendingSnapshot = None
+		self.clear_caches()
+
+	def get_snapshot(self):
+		"""
+		@returns The address book and contacts shown, or None when nothing is
+		"""
+		if self._modelAddressBook is None or self._modelAddressBook is not self._addressBook:
+			return None
+		return self._addressBookKey, self._contactsmodel.get_contacts()
+
+	def load_snapshot(self, snapshot):
+		"""
+		Show the contacts from get_snapshot of the last run once enabled, if the
+		same address book gets opened, until they are reconciled by the next update
+		"""
+		self._pendingSnapshot = snapshot
 
 	def append(self, book):
 		self._addressBookFactories.append(book)
@@ -1741,37 +2033,47 @@ class ContactsView(object):
 		else:
 			raise NotImplementedError(orientation)
 
-	def _idly_populate_contactsview(self):
+	def clear_caches(self):
+		"""
+		Have the address books drop what they cached, the next update refetches
+		"""
+		for factory in self._addressBookFactories:
+			factory.clear_caches()
+		self._addressBook.clear_caches()
+
+	def _idly_populate_contactsview(self, token):
+		timeline.STARTUP.begin("contacts population")
 		with gtk_toolbox.gtk_lock():
 			banner = hildonize.show_busy_banner_start(self._window, "Loading Contacts")
 		try:
-			addressBook = None
-			while addressBook is not self._addressBook:
-				addressBook = self._addressBook
-				with gtk_toolbox.gtk_lock():
-					self._contactsview.set_model(None)
-					self.clear()
+			addressBook = self._addressBook
+			self._isPopulated = False
 
-				try:
-					contacts = addressBook.get_contacts()
-				except Exception, e:
-					contacts = []
-					self._isPopulated = False
-					self._errorDisplay.push_exception_with_lock()
-				for contactId, contactName in contacts:
-					contactType = addressBook.contact_source_short_name(contactId)
-					row = contactType, contactName, contactId
-					self._contactsmodel.append(row)
+			try:
+				contacts = addressBook.get_contacts()
+			except Exception, e:
+				contacts = []
+				self._errorDisplay.push_exception_with_lock()
+			else:
+				self._isPopulated = True
 
+			if token.isCancelled or addressBook is not self._addressBook:
+				# Superseded, most likely by another address book being selected
+				self._isPopulated = False
+			elif addressBook is self._modelAddressBook:
+				self._contactsmodel.reconcile(contacts)
+			else:
+				model = ContactsModel(addressBook, contacts)
 				with gtk_toolbox.gtk_lock():
+					self._contactsmodel = model
+					self._modelAddressBook = addressBook
 					self._contactsview.set_model(self._contactsmodel)
-
-			self._isPopulated = True
 		except Exception, e:
 			self._errorDisplay.push_exception_with_lock()
 		finally:
 			with gtk_toolbox.gtk_lock():
 				hildonize.show_busy_banner_end(banner)
+			timeline.STARTUP.end("contacts population")
 		return False
 
 	def _on_addressbook_button_changed(self, *args, **kwds):
@@ -1791,8 +2093,8 @@ class ContactsView(object):
 
 			oldAddressbook = self._addressBook
 			self.open_addressbook(selectedFactoryId, selectedBookId)
-			forceUpdate = True if oldAddressbook is not self._addressBook else False
-			self.update(force=forceUpdate)
+			isBookChanged = oldAddressbook is not self._addressBook
+			self.update(force=isBookChanged, supersede=isBookChanged)
 
 			self._selectedComboIndex = newSelectedComboIndex
 			self._bookSelectionButton.set_label(self._booksList[self._selectedComboIndex][2])
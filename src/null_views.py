@@ -229,6 +229,10 @@ class ContactsView(object):
 	def clear():
 		pass
 
+	@staticmethod
+	def clear_caches():
+		pass
+
 	@staticmethod
 	def name():
 		return "Contacts"
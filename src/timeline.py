@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+"""
+Wall clock timings of named phases, kept for reporting where startup time
+goes
+
+@note Only the first span of each name is kept, so phases that repeat (like
+refreshing a view) are timed for their first run only
+"""
+
+from __future__ import with_statement
+
+import os
+import time
+import threading
+import contextlib
+import logging
+
+try:
+	import simplejson
+except ImportError:
+	try:
+		import json as simplejson
+	except ImportError:
+		simplejson = None
+
+
+_moduleLogger = logging.getLogger("timeline")
+
+
+class Timeline(object):
+
+	def __init__(self, origin = None):
+		if origin is None:
+			origin = time.time()
+		self._origin = origin
+		self._lock = threading.Lock()
+		self._spans = []
+		self._names = set()
+		self._open = {}
+
+	@contextlib.contextmanager
+	def span(self, name):
+		start = time.time()
+		try:
+			yield
+		finally:
+			self.add(name, start, time.time())
+
+	def begin(self, name):
+		"""
+		For phases too long to wrap in span, finished by end
+		"""
+		with self._lock:
+			self._open.setdefault(name, time.time())
+
+	def end(self, name):
+		with self._lock:
+			start = self._open.pop(name, None)
+		if start is None:
+			_moduleLogger.debug("Ending %r which never began" % name)
+			return
+		self.add(name, start, time.time())
+
+	def mark(self, name):
+		now = time.time()
+		self.add(name, now, now)
+
+	def add(self, name, start, end):
+		with self._lock:
+			if name in self._names:
+				return
+			self._names.add(name)
+			self._spans.append((
+				start - self._origin,
+				end - start,
+				name,
+				threading.currentThread().getName(),
+			))
+
+	def __contains__(self, name):
+		with self._lock:
+			return name in self._names
+
+	def get_spans(self):
+		"""
+		@returns Spans in the order they started, as dicts of name, thread,
+			start and duration (in seconds since the timeline's origin)
+		"""
+		with self._lock:
+			spans = sorted(self._spans)
+		return [
+			{"name": name, "thread": thread, "start": start, "duration": duration}
+			for (start, duration, name, thread) in spans
+		]
+
+	def report(self):
+		"""
+		>>> timeline = Timeline(0)
+		>>> timeline.add("glade", 0.5, 1.25)
+		>>> timeline.add("glade", 2, 3)
+		>>> print timeline.report()
+		  start  length  phase
+		  0.500   0.750  glade (MainThread)
+		"""
+		lines = ["  start  length  phase"]
+		for span in self.get_spans():
+			lines.append("%7.3f %7.3f  %s (%s)" % (
+				span["start"], span["duration"], span["name"], span["thread"],
+			))
+		return "\n".join(lines)
+
+	def log(self, logger = _moduleLogger):
+		logger.info("Timeline\n%s" % self.report())
+
+	def write_json(self, path):
+		if simplejson is None:
+			_moduleLogger.warning("No json support, not writing %s" % path)
+			return
+		tempPath = "%s.tmp" % path
+		with open(tempPath, "w") as f:
+			simplejson.dump(self.get_spans(), f, indent=1)
+		os.rename(tempPath, path)
+
+
+# Created as the application is imported, which is as close to process start
+# as is practical
+STARTUP = Timeline()
@@ -3,14 +3,14 @@
 from __future__ import with_statement
 
 import time
+import heapq
 import functools
+import itertools
 import threading
-import Queue
 import logging
 
 import gobject
 
-import algorithms
 import misc
 
 
@@ -135,120 +135,489 @@ class Timeout(object):
 		return False
 
 
-_QUEUE_EMPTY = object()
+# Lower runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_REFRESH = 1
+PRIORITY_PREFETCH = 2
+PRIORITY_NOTIFIER = 3
 
 
-class AsyncPool(object):
+class AsyncTask(object):
+	"""
+	Handle on a task given to AsyncPool.add_task
+	"""
+
+	def __init__(self, func, args, kwds, priority, key):
+		self.func = func
+		self.args = args
+		self.kwds = kwds
+		self.priority = priority
+		self.key = key
+		self.callbacks = []
+		self.queuedAt = time.time()
+		self.isRunning = False
+		self.isCancelled = False
+
+	def cancel(self):
+		"""
+		@returns True if the task hadn't started and now never will.  Either
+			way no callbacks are made for it.
+		@note Tasks shared through de-duplication are cancelled for everyone
+		"""
+		self.isCancelled = True
+		return not self.isRunning
+
+
+class PoolStats(object):
+	"""
+	Running totals of the tasks through an AsyncPool and how long they took
+	"""
 
 	def __init__(self):
-		self.__workQueue = Queue.Queue()
-		self.__thread = threading.Thread(
-			name = type(self).__name__,
-			target = self.__consume_queue,
+		self._lock = threading.Lock()
+		self.queued = 0
+		self.deduplicated = 0
+		self.cancelled = 0
+		self.completed = 0
+		self.failed = 0
+		self.maxDepth = 0
+		self.waitSeconds = 0.0
+		self.maxWaitSeconds = 0.0
+		self.runSeconds = 0.0
+
+	def record_queued(self, depth):
+		with self._lock:
+			self.queued += 1
+			self.maxDepth = max(self.maxDepth, depth)
+
+	def record_deduplicated(self):
+		with self._lock:
+			self.deduplicated += 1
+
+	def record_cancelled(self):
+		with self._lock:
+			self.cancelled += 1
+
+	def record_run(self, waitSeconds, runSeconds, isError):
+		with self._lock:
+			if isError:
+				self.failed += 1
+			else:
+				self.completed += 1
+			self.waitSeconds += waitSeconds
+			self.maxWaitSeconds = max(self.maxWaitSeconds, waitSeconds)
+			self.runSeconds += runSeconds
+
+	@property
+	def averageWaitSeconds(self):
+		ran = self.completed + self.failed
+		if ran == 0:
+			return 0.0
+		return self.waitSeconds / ran
+
+	def __str__(self):
+		return "%d queued (%d shared, %d cancelled, at most %d waiting), %d done, %d failed, %.3fs average wait (%.3fs max), %.3fs running" % (
+			self.queued, self.deduplicated, self.cancelled, self.maxDepth,
+			self.completed, self.failed,
+			self.averageWaitSeconds, self.maxWaitSeconds, self.runSeconds,
 		)
+
+
+class AsyncPool(object):
+	"""
+	Runs tasks on worker threads, by priority and then in the order they were
+	added, with their callbacks made from the main loop
+
+	@note With more than one worker, one is kept free of everything but
+	interactive tasks so those never wait behind slower work
+	"""
+
+	def __init__(self, workers = 1):
+		assert 0 < workers
+		self.__condition = threading.Condition()
+		self.__heap = []
+		self.__pending = {}
+		self.__sequence = itertools.count()
+		self.__busy = 0
+		self.__workers = workers
+		self.__reservedWorkers = 1 if 1 < workers else 0
+		self.__threads = [
+			threading.Thread(
+				name = "%s-%d" % (type(self).__name__, i),
+				target = self.__consume_queue,
+			)
+			for i in xrange(workers)
+		]
 		self.__isRunning = True
+		self.stats = PoolStats()
 
 	def start(self):
-		self.__thread.start()
+		for thread in self.__threads:
+			thread.setDaemon(True)
+			thread.start()
 
 	def stop(self):
-		self.__isRunning = False
-		for _ in algorithms.itr_available(self.__workQueue):
-			pass # eat up queue to cut down dumb work
-		self.__workQueue.put(_QUEUE_EMPTY)
+		with self.__condition:
+			self.__isRunning = False
+			self.__drop_pending() # cut down dumb work
+			self.__condition.notifyAll()
 
 	def clear_tasks(self):
-		for _ in algorithms.itr_available(self.__workQueue):
-			pass # eat up queue to cut down dumb work
+		with self.__condition:
+			self.__drop_pending()
+
+	def add_task(self, func, args, kwds, on_success, on_error, priority = PRIORITY_INTERACTIVE):
+		"""
+		@returns AsyncTask for cancelling, shared with any identical task
+			(same func, args and kwds) still waiting to run
+		"""
+		key = (func, tuple(args), tuple(sorted(kwds.iteritems())))
+		try:
+			hash(key)
+		except TypeError:
+			key = None
+
+		with self.__condition:
+			task = self.__pending.get(key, None) if key is not None else None
+			if task is not None and not task.isCancelled:
+				self.stats.record_deduplicated()
+				task.callbacks.append((on_success, on_error))
+				if priority < task.priority:
+					# The old heap entry is skipped as stale
+					task.priority = priority
+					heapq.heappush(self.__heap, (priority, self.__sequence.next(), task))
+					self.__condition.notify()
+				return task
+
+			task = AsyncTask(func, args, kwds, priority, key)
+			task.callbacks.append((on_success, on_error))
+			if key is not None:
+				self.__pending[key] = task
+			heapq.heappush(self.__heap, (priority, self.__sequence.next(), task))
+			self.stats.record_queued(self.__count_waiting())
+			self.__condition.notify()
+		return task
+
+	def cancel_pending(self, task):
+		"""
+		Like AsyncTask.cancel but a task that already started is left alone to
+		finish and make its callbacks
+		@returns True if the task hadn't started and now never will
+		"""
+		with self.__condition:
+			if task.isRunning:
+				return False
+			task.isCancelled = True
+			return True
 
-	def add_task(self, func, args, kwds, on_success, on_error):
-		task = func, args, kwds, on_success, on_error
-		self.__workQueue.put(task)
+	@property
+	def depth(self):
+		"""
+		@returns Number of tasks waiting to run
+		"""
+		with self.__condition:
+			return self.__count_waiting()
 
 	@misc.log_exception(_moduleLogger)
-	def __trampoline_callback(self, on_success, on_error, isError, result):
+	def __trampoline_callback(self, task, isError, result):
+		if task.isCancelled:
+			return False
 		if not self.__isRunning:
 			if isError:
 				_moduleLogger.error("Masking: %s" % (result, ))
 			isError = True
 			result = StopIteration("Cancelling all callbacks")
-		callback = on_success if not isError else on_error
-		try:
-			callback(result)
-		except Exception:
-			_moduleLogger.exception("Callback errored")
+		for on_success, on_error in task.callbacks:
+			callback = on_success if not isError else on_error
+			try:
+				callback(result)
+			except Exception:
+				_moduleLogger.exception("Callback errored")
 		return False
 
+	def __count_waiting(self):
+		return len([
+			None
+			for (priority, sequence, task) in self.__heap
+			if self.__is_current(priority, task)
+		])
+
+	def __is_current(self, priority, task):
+		return not task.isRunning and not task.isCancelled and priority == task.priority
+
+	def __drop_pending(self):
+		for priority, sequence, task in self.__heap:
+			if self.__is_current(priority, task):
+				task.isCancelled = True
+		del self.__heap[:]
+		self.__pending.clear()
+
+	def __next_task(self):
+		"""
+		@returns The task to run or None if this worker should keep waiting
+		@note Called with the condition held
+		"""
+		while self.__heap:
+			priority, sequence, task = self.__heap[0]
+			if not self.__is_current(priority, task):
+				heapq.heappop(self.__heap)
+				if task.isCancelled and priority == task.priority and not task.isRunning:
+					self.stats.record_cancelled()
+					self.__forget(task)
+				continue
+			isReserved = self.__workers - self.__busy <= self.__reservedWorkers
+			if isReserved and PRIORITY_INTERACTIVE < priority:
+				return None
+			heapq.heappop(self.__heap)
+			self.__forget(task)
+			task.isRunning = True
+			return task
+		return None
+
+	def __forget(self, task):
+		if task.key is not None and self.__pending.get(task.key, None) is task:
+			del self.__pending[task.key]
+
 	@misc.log_exception(_moduleLogger)
 	def __consume_queue(self):
 		while True:
-			task = self.__workQueue.get()
-			if task is _QUEUE_EMPTY:
-				break
-			func, args, kwds, on_success, on_error = task
-
+			with self.__condition:
+				task = None
+				while self.__isRunning:
+					task = self.__next_task()
+					if task is not None:
+						break
+					self.__condition.wait()
+				if task is None:
+					break
+				self.__busy += 1
+
+			start = time.time()
 			try:
-				result = func(*args, **kwds)
+				result = task.func(*task.args, **task.kwds)
 				isError = False
 			except Exception, e:
 				_moduleLogger.error("Error, passing it back to the main thread")
 				result = e
 				isError = True
-			self.__workQueue.task_done()
+			end = time.time()
+			self.stats.record_run(start - task.queuedAt, end - start, isError)
 
-			gobject.idle_add(self.__trampoline_callback, on_success, on_error, isError, result)
+			with self.__condition:
+				self.__busy -= 1
+				# A reserved worker may now be free for lower priority tasks
+				self.__condition.notifyAll()
+
+			gobject.idle_add(self.__trampoline_callback, task, isError, result)
 		_moduleLogger.debug("Shutting down worker thread")
 
 
+class RefreshToken(object):
+	"""
+	Handed to each refresh, isCancelled turns true once it is superseded or
+	cancelled so it can give up without applying stale results
+	"""
+
+	def __init__(self):
+		self.isCancelled = False
+
+	def cancel(self):
+		self.isCancelled = True
+
+
+class _RefreshState(object):
+
+	def __init__(self):
+		self.func = None
+		self.priority = None
+		self.task = None
+		self.token = None
+		self.generation = 0
+
+
+class RefreshScheduler(object):
+	"""
+	Refreshes by key, run on an AsyncPool so the pool caps how many happen at
+	once.  For any one key only one refresh runs at a time; asking again while
+	one is waiting folds into it and asking while one runs has it run once more
+	afterwards, with the latest function asked for.
+	"""
+
+	def __init__(self, pool, priority = PRIORITY_REFRESH):
+		self._pool = pool
+		self._priority = priority
+		self._lock = threading.Lock()
+		self._states = {}
+
+	def request(self, key, func, supersede = False, priority = None):
+		"""
+		@param func Called as func(token) on a pool worker with a RefreshToken
+		@param supersede Cancel the token of a refresh of key already running
+		"""
+		if priority is None:
+			priority = self._priority
+		with self._lock:
+			state = self._states.get(key, None)
+			if state is None:
+				state = _RefreshState()
+				self._states[key] = state
+			state.func = func
+			if state.priority is None or priority < state.priority:
+				state.priority = priority
+
+			if state.token is not None:
+				if supersede:
+					state.token.cancel()
+			elif state.task is None:
+				self._queue(key, state)
+
+	def cancel(self, key):
+		"""
+		Forget a waiting refresh of key and cancel the token of a running one
+		"""
+		with self._lock:
+			state = self._states.get(key, None)
+			if state is None:
+				return
+			state.func = None
+			if state.task is not None:
+				state.task.cancel()
+				state.task = None
+			if state.token is not None:
+				state.token.cancel()
+			else:
+				del self._states[key]
+
+	def _queue(self, key, state):
+		"""
+		@note Called with the lock held
+		"""
+		state.generation += 1
+		state.task = self._pool.add_task(
+			self._run,
+			(key, state.generation),
+			{},
+			self._on_success,
+			self._on_error,
+			state.priority,
+		)
+
+	def _run(self, key, generation):
+		with self._lock:
+			state = self._states.get(key, None)
+			if state is None or state.generation != generation or state.func is None:
+				# Cancelled while starting
+				return
+			func, state.func = state.func, None
+			state.priority = None
+			state.task = None
+			token = RefreshToken()
+			state.token = token
+
+		try:
+			func(token)
+		finally:
+			with self._lock:
+				state.token = None
+				if state.func is not None:
+					self._queue(key, state)
+				else:
+					del self._states[key]
+
+	def _on_success(self, result):
+		pass
+
+	@misc.log_exception(_moduleLogger)
+	def _on_error(self, error):
+		if isinstance(error, StopIteration):
+			# The pool was stopped
+			return
+		_moduleLogger.error("Refresh failed: %s" % (error, ))
+
+
 class AsyncLinearExecution(object):
 
-	def __init__(self, pool, func):
+	def __init__(self, pool, func, priority = PRIORITY_INTERACTIVE):
 		self._pool = pool
 		self._func = func
+		self._priority = priority
 		self._run = None
+		self._task = None
+		self._isDone = False
 
 	def start(self, *args, **kwds):
 		assert self._run is None
 		self._run = self._func(*args, **kwds)
 		trampoline, args, kwds = self._run.send(None) # priming the function
-		self._pool.add_task(
+		self._task = self._pool.add_task(
 			trampoline,
 			args,
 			kwds,
 			self.on_success,
 			self.on_error,
+			self._priority,
 		)
 
+	def is_running(self):
+		return self._run is not None and not self._isDone
+
+	def cancel(self):
+		"""
+		Close the function where it is waiting, if the step it waits on hasn't
+		started yet
+		@returns True if the function was closed, False if it wasn't running or
+			its step already started, in which case it is left to see it through
+		"""
+		if not self.is_running():
+			return False
+		if self._task is not None and not self._pool.cancel_pending(self._task):
+			return False
+		self._isDone = True
+		self._run.close()
+		return True
+
 	@misc.log_exception(_moduleLogger)
 	def on_success(self, result):
+		if self._isDone:
+			return
 		_moduleLogger.debug("Processing success for: %r", self._func)
 		try:
 			trampoline, args, kwds = self._run.send(result)
 		except StopIteration, e:
-			pass
+			self._isDone = True
+		except:
+			self._isDone = True
+			raise
 		else:
-			self._pool.add_task(
+			self._task = self._pool.add_task(
 				trampoline,
 				args,
 				kwds,
 				self.on_success,
 				self.on_error,
+				self._priority,
 			)
 
 	@misc.log_exception(_moduleLogger)
 	def on_error(self, error):
+		if self._isDone:
+			return
 		_moduleLogger.debug("Processing error for: %r", self._func)
 		try:
 			trampoline, args, kwds = self._run.throw(error)
 		except StopIteration, e:
-			pass
+			self._isDone = True
+		except:
+			self._isDone = True
+			raise
 		else:
-			self._pool.add_task(
+			self._task = self._pool.add_task(
 				trampoline,
 				args,
 				kwds,
 				self.on_success,
 				self.on_error,
+				self._priority,
 			)
 
 
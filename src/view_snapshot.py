@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+"""
+The rows each view last showed, kept across runs so the views can open with
+them while the fresh data is still being fetched
+
+@note Views backed by the message store open from it instead
+"""
+
+from __future__ import with_statement
+
+import os
+import cPickle
+import logging
+
+
+_moduleLogger = logging.getLogger("view_snapshot")
+
+
+class ViewSnapshot(object):
+	"""
+	Opaque per view snapshots by name, stored together in one file.
+
+	@note Bump VERSION whenever a view changes the layout of its snapshot, old
+	files are then ignored instead of being misread
+	"""
+
+	VERSION = 2
+
+	def __init__(self, path):
+		self._path = path
+		self._snapshots = {}
+
+	def get(self, name):
+		"""
+		@returns What was set for name in the last run, or None
+		"""
+		return self._snapshots.get(name, None)
+
+	def set(self, name, snapshot):
+		"""
+		@param snapshot Anything picklable, or None to forget name
+		"""
+		if snapshot is None:
+			self._snapshots.pop(name, None)
+		else:
+			self._snapshots[name] = snapshot
+
+	def clear(self):
+		self._snapshots.clear()
+
+	def __contains__(self, name):
+		return name in self._snapshots
+
+	def load(self):
+		"""
+		Replace the snapshots with what was last saved, missing, corrupt or
+		out of date files count as empty
+		"""
+		self._snapshots = {}
+		try:
+			with open(self._path, "rb") as snapshotFile:
+				version, snapshots = cPickle.load(snapshotFile)
+		except IOError:
+			return
+		except Exception:
+			_moduleLogger.exception("Ignoring corrupt view snapshot")
+			return
+		if version != self.VERSION:
+			_moduleLogger.info("Ignoring view snapshot version %r" % (version, ))
+			return
+		self._snapshots = snapshots
+
+	def save(self):
+		"""
+		@note Thread Agnostic
+		"""
+		if not self._snapshots:
+			try:
+				os.remove(self._path)
+			except OSError:
+				pass
+			return
+
+		tempPath = "%s.tmp" % self._path
+		try:
+			with open(tempPath, "wb") as snapshotFile:
+				cPickle.dump(
+					(self.VERSION, self._snapshots),
+					snapshotFile,
+					cPickle.HIGHEST_PROTOCOL,
+				)
+			os.rename(tempPath, self._path)
+		except (IOError, OSError):
+			_moduleLogger.exception("Failed to save view snapshot")
@@ -0,0 +1,108 @@
+import test_utils
+
+import sys
+sys.path.append("../src")
+
+import alarm_handler
+
+
+_MINUTES_IN_A_DAY = 24 * 60
+
+
+def simulate_day(schedule, messageTimes = (), inactiveRanges = ()):
+	"""
+	Run a schedule over a day of activity, a minute at a time
+	@returns (poll count, worst minutes a message went unnoticed while active)
+	"""
+	messageTimes = sorted(messageTimes)
+	polls = 0
+	worstLatency = 0
+	lastPoll = 0
+	nextPoll = 0
+	for minute in xrange(_MINUTES_IN_A_DAY):
+		isActive = not [
+			None
+			for (start, end) in inactiveRanges
+			if start <= minute < end
+		]
+		wasPaused = schedule.isPaused
+		schedule.set_active(isActive)
+		if schedule.isPaused:
+			nextPoll = None
+			continue
+		elif wasPaused:
+			nextPoll = minute
+
+		if minute < nextPoll:
+			continue
+		polls += 1
+		newMessages = [t for t in messageTimes if lastPoll < t <= minute]
+		for t in newMessages:
+			worstLatency = max(worstLatency, minute - t)
+		lastPoll = minute
+		nextPoll = minute + schedule.next_delay(bool(newMessages))
+	return polls, worstLatency
+
+
+_TRACES = [
+	("quiet", (), ()),
+	("hourly message", range(30, _MINUTES_IN_A_DAY, 60), ()),
+	("evening conversation", range(18 * 60, 19 * 60, 3), ()),
+	("quiet, inactive at night", (), ((0, 7 * 60), (23 * 60, _MINUTES_IN_A_DAY))),
+]
+
+
+def test_polls_per_day():
+	print "polls per day (worst latency in minutes)"
+	for name, messageTimes, inactiveRanges in _TRACES:
+		fixedPolls, fixedLatency = simulate_day(
+			alarm_handler.AdaptiveSchedule.from_recurrence(5), messageTimes, inactiveRanges,
+		)
+		adaptivePolls, adaptiveLatency = simulate_day(
+			alarm_handler.AdaptiveSchedule.from_recurrence(alarm_handler.ADAPTIVE_RECURRENCE),
+			messageTimes,
+			inactiveRanges,
+		)
+		print "\t%s: fixed 5 minutes %d (%d), adaptive %d (%d)" % (
+			name, fixedPolls, fixedLatency, adaptivePolls, adaptiveLatency,
+		)
+		assert adaptivePolls < fixedPolls
+		assert adaptiveLatency <= alarm_handler.AdaptiveSchedule.MAX_MINUTES
+
+
+def test_quiet_day_backs_off():
+	polls, latency = simulate_day(alarm_handler.AdaptiveSchedule())
+	# Ramping up to the longest interval and then hourly
+	assert polls <= 24 + 6, polls
+
+
+def test_inactive_pauses():
+	polls, latency = simulate_day(
+		alarm_handler.AdaptiveSchedule.from_recurrence(5),
+		inactiveRanges = ((0, _MINUTES_IN_A_DAY), ),
+	)
+	assert polls == 0
+
+
+def test_activity_polls_sooner():
+	schedule = alarm_handler.AdaptiveSchedule()
+	for i in xrange(10):
+		schedule.next_delay(False)
+	assert schedule.interval == alarm_handler.AdaptiveSchedule.MAX_MINUTES
+	assert schedule.next_delay(True) == alarm_handler.AdaptiveSchedule.MIN_MINUTES
+
+	schedule.set_connected(False)
+	assert schedule.isPaused
+	assert schedule.delay is None
+	schedule.set_connected(True)
+	assert schedule.delay == alarm_handler.AdaptiveSchedule.MIN_MINUTES
+
+
+def test_configure_keeps_state():
+	schedule = alarm_handler.AdaptiveSchedule()
+	schedule.set_active(False)
+	schedule.configure(10)
+	assert schedule.isPaused
+	schedule.set_active(True)
+	assert schedule.next_delay(False) == 10
+	assert schedule.next_delay(True) == 10
@@ -0,0 +1,198 @@
+from __future__ import with_statement
+
+import os
+import time
+import shutil
+import socket
+import tempfile
+import threading
+import ConfigParser
+
+import test_utils
+
+import sys
+sys.path.append("../src")
+
+import alarm_notify
+
+
+class CountingDaemon(alarm_notify.NotifierDaemon):
+
+	def __init__(self, socketPath):
+		alarm_notify.NotifierDaemon.__init__(self, socketPath)
+		self.polls = 0
+
+	def poll(self):
+		self.polls += 1
+		self._pollCount += 1
+		self._nextPoll = time.time() + 60 * 60
+		self._lastResult = "unchanged"
+		return self._lastResult
+
+
+def wait_for_socket(path):
+	for i in xrange(50):
+		if os.path.exists(path):
+			return
+		time.sleep(0.1)
+	raise RuntimeError("Daemon never started listening")
+
+
+def test_daemon_control():
+	socketDir = tempfile.mkdtemp()
+	try:
+		socketPath = os.path.join(socketDir, "notifier.sock")
+		daemon = CountingDaemon(socketPath)
+		daemonThread = threading.Thread(target=daemon.run)
+		daemonThread.setDaemon(True)
+		daemonThread.start()
+		wait_for_socket(socketPath)
+
+		assert alarm_notify.send_command("poll", socketPath) == "unchanged"
+		assert 1 <= daemon.polls, daemon.polls
+		assert alarm_notify.send_command("status", socketPath).startswith("polls=%d " % daemon.polls)
+		assert alarm_notify.send_command("bogus", socketPath).startswith("unknown command")
+		assert alarm_notify.send_command("alarm", socketPath) == "scheduled"
+
+		assert alarm_notify.send_command("disconnected", socketPath) == "paused"
+		assert "nextPoll=paused" in alarm_notify.send_command("status", socketPath)
+		assert alarm_notify.send_command("alarm", socketPath) == "paused"
+		polls = daemon.polls
+		assert alarm_notify.send_command("connected", socketPath) == "ok"
+		assert alarm_notify.send_command("status", socketPath).startswith("polls=%d " % (polls + 1))
+
+		with test_utils.expected(RuntimeError):
+			CountingDaemon(socketPath).run()
+
+		assert alarm_notify.send_command("quit", socketPath) == "ok"
+		daemonThread.join(5)
+		assert not daemonThread.isAlive()
+		assert not os.path.exists(socketPath)
+		with test_utils.expected(socket.error):
+			alarm_notify.send_command("status", socketPath)
+	finally:
+		shutil.rmtree(socketDir)
+
+
+class DisabledDaemon(alarm_notify.NotifierDaemon):
+
+	def _load_config(self):
+		config = ConfigParser.SafeConfigParser()
+		config.add_section("alarm")
+		config.set("alarm", "alarmCookie", "-1")
+		return config
+
+
+def test_daemon_quits_when_disabled():
+	socketDir = tempfile.mkdtemp()
+	try:
+		socketPath = os.path.join(socketDir, "notifier.sock")
+		daemon = DisabledDaemon(socketPath)
+		daemonThread = threading.Thread(target=daemon.run)
+		daemonThread.setDaemon(True)
+		daemonThread.start()
+		daemonThread.join(5)
+		assert not daemonThread.isAlive()
+		assert daemon._lastResult == "disabled"
+		assert daemon._backend is None, "Never logged in"
+		assert not os.path.exists(socketPath)
+	finally:
+		shutil.rmtree(socketDir)
+
+
+def test_digest_store():
+	digestDir = tempfile.mkdtemp()
+	try:
+		digestPath = os.path.join(digestDir, "digests.txt")
+		messages = {
+			"a": {"id": "a", "isRead": False, "relativeStartTime": "1 minute ago"},
+			"b": {"id": "b", "isRead": False, "relativeStartTime": "2 minutes ago"},
+		}
+		digests = alarm_notify.DigestStore(digestPath)
+		assert digests.update("sms", messages) is None
+		assert digests.update("voicemail", {}) is None
+		digests.save()
+		assert os.path.exists(digestPath)
+
+		messages["a"]["isRead"] = True
+		messages["a"]["relativeStartTime"] = "5 minutes ago"
+		messages["c"] = {"id": "c", "isRead": False}
+		messages["b"]["messageText"] = "Reply"
+
+		reloaded = alarm_notify.DigestStore(digestPath)
+		assert reloaded.update("sms", messages) == ["b", "c"]
+		assert reloaded.update("sms", messages) == []
+		assert reloaded.update("voicemail", {}) == []
+	finally:
+		shutil.rmtree(digestDir)
+
+
+def test_find_type_changes():
+	material = {
+		"unreadCounts": {"sms": 1},
+		"messages": {"a": {"id": "a"}},
+	}
+	get_material = lambda backend: material
+	digests = alarm_notify.DigestStore(os.devnull)
+
+	assert alarm_notify.find_type_changes(None, "sms", get_material, digests) == []
+	material["messages"]["b"] = {"id": "b"}
+	assert alarm_notify.find_type_changes(None, "sms", get_material, digests) == ["b"]
+	material["messages"]["c"] = {"id": "c"}
+	material["unreadCounts"]["sms"] = 0
+	assert alarm_notify.find_type_changes(None, "sms", get_material, digests) == []
+
+
+class SummaryBackend(object):
+
+	def __init__(self):
+		self.summaries = {"sms": (1, "a", 1000)}
+		self.material = {
+			"unreadCounts": {"sms": 1},
+			"messages": {"a": {"id": "a"}},
+		}
+		self.downloads = 0
+
+	def get_unread_summary(self):
+		return self.summaries
+
+
+def test_find_changes_with_summary():
+	config = alarm_notify.ConfigParser.SafeConfigParser()
+	config.add_section("2 - Account Info")
+	config.set("2 - Account Info", "notifyOnMissed", "false")
+	config.set("2 - Account Info", "notifyOnVoicemail", "false")
+	config.set("2 - Account Info", "notifyOnSms", "true")
+
+	backend = SummaryBackend()
+	def get_sms(backend):
+		backend.downloads += 1
+		return backend.material
+	originalGetSms, alarm_notify.get_sms = alarm_notify.get_sms, get_sms
+
+	digestDir = tempfile.mkdtemp()
+	try:
+		digestPath = os.path.join(digestDir, "digests.txt")
+		digests = alarm_notify.DigestStore(digestPath)
+		assert alarm_notify.find_changes(config, backend, digests) == {}
+		assert backend.downloads == 1
+		assert alarm_notify.find_changes(config, backend, digests) == {}
+		assert backend.downloads == 1
+
+		backend.summaries = {"sms": (2, "b", 2000)}
+		backend.material["messages"]["b"] = {"id": "b"}
+		assert alarm_notify.find_changes(config, backend, digests) == {"sms": ["b"]}
+		assert backend.downloads == 2
+
+		# Another text in the newest thread, which was unread already
+		backend.summaries = {"sms": (2, "b", 3000)}
+		backend.material["messages"]["b"] = {"id": "b", "messageCount": 2}
+		assert alarm_notify.find_changes(config, backend, digests) == {"sms": ["b"]}
+		assert backend.downloads == 3
+
+		reloaded = alarm_notify.DigestStore(digestPath)
+		assert alarm_notify.find_changes(config, backend, reloaded) == {}
+		assert backend.downloads == 3
+	finally:
+		alarm_notify.get_sms = originalGetSms
+		shutil.rmtree(digestDir)
@@ -0,0 +1,352 @@
+from __future__ import with_statement
+
+import os
+import zlib
+import gzip
+import shutil
+import StringIO
+import tempfile
+import cookielib
+import threading
+import BaseHTTPServer
+
+import test_utils
+
+import sys
+sys.path.append("../src")
+
+from backends import browser_emu
+from backends import http_cache
+
+
+class KeepAliveHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+	protocol_version = "HTTP/1.1"
+
+	def do_GET(self):
+		self.server.connections.add(self.client_address)
+		body = "Hello from %s" % self.path
+		self.send_response(200)
+		self.send_header("Content-Type", "text/plain")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, *args):
+		pass
+
+
+class ValidatingHandler(KeepAliveHandler):
+
+	def do_GET(self):
+		self.server.connections.add(self.client_address)
+		etag = '"%d"' % self.server.version
+		if self.headers.get("If-None-Match", None) == etag:
+			self.server.notModified += 1
+			self.send_response(304)
+			self.send_header("ETag", etag)
+			self.send_header("Content-Length", "0")
+			self.end_headers()
+			return
+
+		self.server.fullResponses += 1
+		body = "Version %d of %s" % (self.server.version, self.path)
+		self.send_response(200)
+		self.send_header("ETag", etag)
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+
+class CompressingHandler(KeepAliveHandler):
+
+	def do_GET(self):
+		body = "<response>%s</response>" % ("<html>message</html>" * 500)
+		acceptEncoding = self.headers.get("Accept-Encoding", "")
+		if self.path == "/raw-deflate" and "deflate" in acceptEncoding:
+			compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+			body = compressor.compress(body) + compressor.flush()
+			encoding = "deflate"
+		elif "gzip" in acceptEncoding:
+			buffer = StringIO.StringIO()
+			gzipFile = gzip.GzipFile(fileobj=buffer, mode="wb")
+			gzipFile.write(body)
+			gzipFile.close()
+			body = buffer.getvalue()
+			encoding = "gzip"
+		else:
+			encoding = None
+		self.send_response(200)
+		if encoding is not None:
+			self.send_header("Content-Encoding", encoding)
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+
+class RangeHandler(KeepAliveHandler):
+
+	def do_GET(self):
+		body = self.server.body
+		start = 0
+		rangeHeader = self.headers.get("Range", None)
+		if rangeHeader is not None:
+			start = int(rangeHeader[len("bytes="):].rstrip("-"))
+			self.server.ranges.append(start)
+			self.send_response(206)
+			self.send_header("Content-Range", "bytes %d-%d/%d" % (start, len(body) - 1, len(body)))
+		else:
+			self.send_response(200)
+		self.send_header("Content-Length", str(len(body) - start))
+		self.end_headers()
+		if self.server.cutAfter is not None:
+			# Drop the connection part way through
+			self.wfile.write(body[start:start + self.server.cutAfter])
+			self.server.cutAfter = None
+			self.close_connection = 1
+			return
+		self.wfile.write(body[start:])
+
+
+def start_server(handlerClass = KeepAliveHandler):
+	server = BaseHTTPServer.HTTPServer(("127.0.0.1", 0), handlerClass)
+	server.connections = set()
+	thread = threading.Thread(target=server.serve_forever)
+	thread.setDaemon(True)
+	thread.start()
+	return server
+
+
+def test_connection_reuse():
+	server = start_server()
+	try:
+		url = "http://127.0.0.1:%d" % server.server_port
+		browser = browser_emu.MozillaEmulator()
+		assert browser.download(url + "/first") == "Hello from /first"
+		assert browser.download(url + "/second") == "Hello from /second"
+		assert browser.download(url + "/third") == "Hello from /third"
+		assert len(server.connections) == 1, "%r" % server.connections
+		browser.close_connections()
+	finally:
+		server.shutdown()
+		server.server_close()
+
+
+def test_pool_limits():
+	class FakeConnection(object):
+
+		def __init__(self):
+			self.isClosed = False
+
+		def close(self):
+			self.isClosed = True
+
+	pool = browser_emu.ConnectionPool(maxPerHost = 1, idleTimeout = 60)
+	key = "http", "example.com"
+	first, isReused = pool.get(key, FakeConnection)
+	assert not isReused
+	second, isReused = pool.get(key, FakeConnection)
+	assert not isReused
+
+	pool.put(key, first)
+	pool.put(key, second)
+	assert pool.idle_count(key) == 1
+	assert not first.isClosed
+	assert second.isClosed
+
+	reused, isReused = pool.get(key, FakeConnection)
+	assert isReused
+	assert reused is first
+	assert pool.idle_count(key) == 0
+
+
+def test_pool_idle_timeout():
+	class FakeConnection(object):
+
+		def __init__(self):
+			self.isClosed = False
+
+		def close(self):
+			self.isClosed = True
+
+	pool = browser_emu.ConnectionPool(maxPerHost = 2, idleTimeout = -1)
+	key = "http", "example.com"
+	stale, isReused = pool.get(key, FakeConnection)
+	pool.put(key, stale)
+
+	fresh, isReused = pool.get(key, FakeConnection)
+	assert not isReused
+	assert fresh is not stale
+	assert stale.isClosed
+
+
+def test_conditional_get():
+	server = start_server(ValidatingHandler)
+	server.version = 1
+	server.fullResponses = 0
+	server.notModified = 0
+	cacheDir = tempfile.mkdtemp()
+	try:
+		url = "http://127.0.0.1:%d/feed" % server.server_port
+		browser = browser_emu.MozillaEmulator(cache = http_cache.HttpCache(cacheDir))
+		assert browser.download(url) == "Version 1 of /feed"
+		assert browser.download(url) == "Version 1 of /feed"
+		assert (server.fullResponses, server.notModified) == (1, 1)
+
+		server.version = 2
+		assert browser.download(url) == "Version 2 of /feed"
+		assert (server.fullResponses, server.notModified) == (2, 1)
+
+		# A new process picks up what is already on disk
+		otherBrowser = browser_emu.MozillaEmulator(cache = http_cache.HttpCache(cacheDir))
+		assert otherBrowser.download(url) == "Version 2 of /feed"
+		assert (server.fullResponses, server.notModified) == (2, 2)
+		assert len(server.connections) == 2, "%r" % server.connections
+
+		browser.clear_cache()
+		assert browser.download(url) == "Version 2 of /feed"
+		assert (server.fullResponses, server.notModified) == (3, 2)
+		browser.close_connections()
+		otherBrowser.close_connections()
+	finally:
+		server.shutdown()
+		server.server_close()
+		shutil.rmtree(cacheDir)
+
+
+def test_cache_eviction():
+	cacheDir = tempfile.mkdtemp()
+	try:
+		cache = http_cache.HttpCache(cacheDir, maxBytes = 400)
+		validated = {"ETag": '"1"'}
+		for name in ("a", "b", "c"):
+			cache.store("http://example.com/%s" % name, validated, name * 90)
+		assert cache.get_body("http://example.com/a") == "a" * 90
+
+		cache.store("http://example.com/d", validated, "d" * 90)
+		assert cache.totalBytes <= 400
+		assert cache.get_validators("http://example.com/b") == {}
+		assert cache.get_body("http://example.com/b") is None
+		for name in ("a", "c", "d"):
+			assert cache.get_body("http://example.com/%s" % name) == name * 90
+		assert cache.get_validators("http://example.com/a") == {"If-None-Match": '"1"'}
+
+		cache.store("http://example.com/a", {}, "unvalidated")
+		assert cache.get_body("http://example.com/a") is None
+	finally:
+		shutil.rmtree(cacheDir)
+
+
+def test_unwritable_cache():
+	server = start_server(ValidatingHandler)
+	server.version = 1
+	server.fullResponses = 0
+	server.notModified = 0
+	cacheDir = tempfile.mkdtemp()
+	try:
+		# A file where the cache directory should be, unwritable even as root
+		blocker = os.path.join(cacheDir, "blocker")
+		with open(blocker, "wb") as f:
+			f.write("x")
+		url = "http://127.0.0.1:%d/feed" % server.server_port
+		browser = browser_emu.MozillaEmulator(cache = http_cache.HttpCache(os.path.join(blocker, "http")))
+		assert browser.download(url) == "Version 1 of /feed"
+		assert browser.download(url) == "Version 1 of /feed"
+		assert (server.fullResponses, server.notModified) == (2, 0)
+		browser.close_connections()
+
+		cache = http_cache.HttpCache(cacheDir)
+		cache.store("http://example.com/a", {"ETag": '"1"'}, "a")
+		os.rename(os.path.join(cacheDir, cache._key("http://example.com/a")), os.path.join(cacheDir, "stale.tmp"))
+		os.chmod(cacheDir, 0555)
+		try:
+			cache = http_cache.HttpCache(cacheDir)
+			cache.store("http://example.com/b", {"ETag": '"1"'}, "b")
+			assert cache.get_body("http://example.com/a") is None
+		finally:
+			os.chmod(cacheDir, 0755)
+	finally:
+		server.shutdown()
+		server.server_close()
+		shutil.rmtree(cacheDir)
+
+
+def test_compressed_responses():
+	server = start_server(CompressingHandler)
+	try:
+		url = "http://127.0.0.1:%d" % server.server_port
+		expected = "<response>%s</response>" % ("<html>message</html>" * 500)
+		browser = browser_emu.MozillaEmulator()
+		assert browser.download(url + "/gzip") == expected
+		assert browser.download(url + "/raw-deflate") == expected
+		assert browser.stats.requests == 2
+		assert browser.stats.bodyBytes == 2 * len(expected)
+		assert 10 < browser.stats.compressionRatio, str(browser.stats)
+
+		plain = browser.download(url + "/gzip", extraheaders = {"Accept-Encoding": "identity"})
+		assert plain == expected
+		browser.close_connections()
+	finally:
+		server.shutdown()
+		server.server_close()
+
+
+def test_download_to_resumes():
+	server = start_server(RangeHandler)
+	server.body = "".join(chr(i % 256) for i in xrange(100 * 1024))
+	server.ranges = []
+	server.cutAfter = 30 * 1024
+	downloadDir = tempfile.mkdtemp()
+	try:
+		url = "http://127.0.0.1:%d/voicemail.mp3" % server.server_port
+		path = os.path.join(downloadDir, "voicemail.mp3")
+		updates = []
+		progress = lambda done, total: updates.append((done, total))
+
+		browser = browser_emu.MozillaEmulator(0)
+		with test_utils.expected(browser_emu.urllib2.URLError):
+			browser.download_to(url, path, progress = progress)
+		assert not os.path.exists(path)
+		assert os.path.getsize(path + ".part") == 30 * 1024
+
+		assert browser.download_to(url, path, progress = progress) == path
+		assert server.ranges == [30 * 1024]
+		assert not os.path.exists(path + ".part")
+		with open(path, "rb") as f:
+			assert f.read() == server.body
+		assert updates[-1] == (len(server.body), len(server.body))
+		assert updates == sorted(updates)
+		browser.close_connections()
+	finally:
+		server.shutdown()
+		server.server_close()
+		shutil.rmtree(downloadDir)
+
+
+def test_cookies_save_while_changing():
+	cookieDir = tempfile.mkdtemp()
+	try:
+		jar = browser_emu.SynchronizedLWPCookieJar(os.path.join(cookieDir, "cookies.txt"))
+		isDone = []
+
+		def set_cookies():
+			for i in xrange(2000):
+				jar.set_cookie(cookielib.Cookie(
+					0, "name%d" % i, "value", None, False,
+					"www.example.com", True, False, "/", True,
+					False, None, False, None, None, {},
+				))
+			isDone.append(True)
+
+		thread = threading.Thread(target=set_cookies)
+		thread.start()
+		while not isDone:
+			jar.save(ignore_discard=True)
+		thread.join()
+
+		jar.save(ignore_discard=True)
+		reloaded = browser_emu.SynchronizedLWPCookieJar(os.path.join(cookieDir, "cookies.txt"))
+		reloaded.load(ignore_discard=True)
+		assert len(reloaded) == 2000
+	finally:
+		shutil.rmtree(cookieDir)
@@ -1,7 +1,11 @@
 from __future__ import with_statement
 
 import os
+import time
+import shutil
+import tempfile
 import warnings
+import threading
 import cookielib
 
 import test_utils
@@ -10,6 +14,7 @@ import sys
 sys.path.append("../src")
 
 from backends import gv_backend
+from backends import voicemail_cache
 
 
 def generate_mock(cookiesSucceed, username, password):
@@ -52,3 +57,167 @@ def test_not_logged_in():
 			messages = list(backend.get_messages())
 	finally:
 		gv_backend.browser_emu = RealBrowser
+
+
+class ContactsSource(object):
+
+	def __init__(self, contacts):
+		self.contacts = contacts
+		self.fetchCount = 0
+		self.fetched = threading.Event()
+
+	def __call__(self):
+		self.fetchCount += 1
+		self.fetched.set()
+		return self.contacts.iteritems()
+
+
+def test_contacts_cache():
+	cacheDir = tempfile.mkdtemp()
+	try:
+		cachePath = os.path.join(cacheDir, "gv_contacts.cache")
+		contacts = {
+			"1": {"name": "Bob", "numbers": [{"phoneNumber": "+15555551234", "phoneType": "Mobile"}]},
+			"2": {"name": "Alice", "numbers": []},
+		}
+
+		backend = gv_backend.GVDialer(None, cachePath)
+		source = ContactsSource(contacts)
+		backend._gvoice.get_contacts = source
+		assert list(backend.get_contacts()) == [("2", "Alice"), ("1", "Bob")]
+		assert list(backend.get_contact_details("1")) == [("Mobile", "+15555551234")]
+		assert source.fetchCount == 1
+		assert os.path.exists(cachePath)
+
+		# A new session serves the cached contacts without fetching
+		backend = gv_backend.GVDialer(None, cachePath)
+		source = ContactsSource({"3": {"name": "Carol", "numbers": []}})
+		backend._gvoice.get_contacts = source
+		assert list(backend.get_contacts()) == [("2", "Alice"), ("1", "Bob")]
+		assert source.fetchCount == 0
+
+		# Clearing caches serves the stale copy while refreshing in the background
+		backend.clear_caches()
+		assert list(backend.get_contacts()) == [("2", "Alice"), ("1", "Bob")]
+		source.fetched.wait(5)
+		for i in xrange(50):
+			if list(backend.get_contacts()) == [("3", "Carol")]:
+				break
+			time.sleep(0.1)
+		assert list(backend.get_contacts()) == [("3", "Carol")]
+		assert source.fetchCount == 1
+	finally:
+		shutil.rmtree(cacheDir)
+
+
+def test_contacts_refresh_after_logout():
+	cacheDir = tempfile.mkdtemp()
+	try:
+		cachePath = os.path.join(cacheDir, "gv_contacts.cache")
+		tasks = []
+		backend = gv_backend.GVDialer(None, cachePath, spawn = lambda func, *args: tasks.append((func, args)))
+		backend._gvoice.get_contacts = ContactsSource({"1": {"name": "Bob", "numbers": []}})
+		assert list(backend.get_contacts()) == [("1", "Bob")]
+		assert tasks == []
+
+		backend.clear_caches()
+		assert list(backend.get_contacts()) == [("1", "Bob")]
+		assert len(tasks) == 1, "The refresh goes through spawn"
+
+		backend._gvoice.logout = lambda: None
+		backend.logout()
+		os.remove(cachePath)
+		func, args = tasks.pop()
+		func(*args)
+		assert not os.path.exists(cachePath), "A refresh started before logout isn't saved"
+	finally:
+		shutil.rmtree(cacheDir)
+
+
+class VoicemailSource(object):
+
+	def __init__(self):
+		self.downloads = []
+
+	def __call__(self, messageId, adir, progress = None):
+		self.downloads.append(messageId)
+		path = os.path.join(adir, "%s.mp3" % messageId)
+		with open(path, "wb") as f:
+			f.write("x" * 400)
+		if progress is not None:
+			progress(400, 400)
+		return path
+
+
+class FakeConversation(object):
+
+	def __init__(self, id, isRead):
+		self.id = id
+		self.isRead = isRead
+
+
+def test_voicemail_cache():
+	cacheDir = tempfile.mkdtemp()
+	try:
+		voicemailPath = os.path.join(cacheDir, "voicemails")
+		backend = gv_backend.GVDialer(None, None, None, voicemailPath, 1000)
+		source = VoicemailSource()
+		backend._gvoice.download = source
+
+		first = backend.download("a", None)
+		assert backend.download("a", None) == first
+		assert source.downloads == ["a"]
+
+		backend.download("b", None)
+		backend.download("a", None)
+		backend.download("c", None)
+		assert source.downloads == ["a", "b", "c"]
+		# b was the least recently played
+		assert sorted(os.listdir(voicemailPath)) == ["a.mp3", "c.mp3"]
+
+		backend._gvoice.get_voicemails = lambda: [
+			FakeConversation("a", False),
+			FakeConversation("d", False),
+			FakeConversation("e", True),
+		]
+		assert backend.prefetch_voicemails() == 1
+		assert source.downloads == ["a", "b", "c", "d"]
+
+		backend.clear_caches()
+		assert len(os.listdir(voicemailPath)) == 2, "Voicemails outlive the contacts being refreshed"
+		backend.trim_caches()
+		assert len(os.listdir(voicemailPath)) == 1
+	finally:
+		shutil.rmtree(cacheDir)
+
+
+def test_voicemail_cache_housekeeping():
+	cacheDir = tempfile.mkdtemp()
+	try:
+		cache = voicemail_cache.VoicemailCache(cacheDir, 1000)
+		source = VoicemailSource()
+
+		def fail(messageId, adir, progress = None):
+			with open(os.path.join(adir, "%s.mp3.part" % messageId), "wb") as f:
+				f.write("x" * 100)
+			raise IOError("Connection dropped")
+
+		with test_utils.expected(IOError):
+			cache.fetch("broken", fail)
+		assert cache._fetchLocks == {}
+		assert os.path.exists(os.path.join(cacheDir, "broken.mp3.part")), "Kept for resuming"
+
+		cache.fetch("a", source, isPlaying = True)
+		cache.fetch("b", source)
+		cache.fetch("c", source)
+		assert cache._fetchLocks == {}
+		# a was the least recently used but is the one being played
+		assert sorted(os.listdir(cacheDir)) == ["a.mp3", "broken.mp3.part", "c.mp3"]
+
+		cache.clear()
+		assert os.listdir(cacheDir) == ["a.mp3"]
+		cache.set_playing(None)
+		cache.clear()
+		assert os.listdir(cacheDir) == []
+	finally:
+		shutil.rmtree(cacheDir)
@@ -0,0 +1,164 @@
+from __future__ import with_statement
+
+import datetime
+
+import test_utils
+
+import sys
+sys.path.append("../src")
+
+import gv_views
+
+
+class UnchangedStore(object):
+
+	def __init__(self, items = ()):
+		self.items = items
+
+	def get_recent(self):
+		return self.items
+
+	def get_messages(self):
+		return self.items
+
+	def sync_recent(self, historyItems):
+		return 0, 0, 0
+
+	def sync_messages(self, messageItems):
+		return 0, 0, 0
+
+
+class FixedBackend(object):
+
+	def __init__(self, items):
+		self.items = items
+
+	def get_recent(self):
+		return self.items
+
+	def get_messages(self):
+		return self.items
+
+
+class RaisingErrorDisplay(object):
+
+	def push_exception(self):
+		raise
+
+	def push_exception_with_lock(self):
+		raise
+
+
+class Token(object):
+
+	isCancelled = False
+
+
+def generate_item(relTime):
+	return {
+		"id": "1",
+		"contactId": "1",
+		"name": "Bob",
+		"time": datetime.datetime(2009, 1, 1, 12),
+		"relTime": relTime,
+		"prettyNumber": "(555) 555-1234",
+		"number": "+15555551234",
+		"location": "",
+		"action": "missed",
+		"messageParts": [("Bob", "Hello", "12:00")],
+	}
+
+
+class NoBanners(object):
+
+	def __enter__(self):
+		self._start = gv_views.hildonize.show_busy_banner_start
+		self._end = gv_views.hildonize.show_busy_banner_end
+		gv_views.hildonize.show_busy_banner_start = lambda window, message: None
+		gv_views.hildonize.show_busy_banner_end = lambda banner: None
+
+	def __exit__(self, *args):
+		gv_views.hildonize.show_busy_banner_start = self._start
+		gv_views.hildonize.show_busy_banner_end = self._end
+
+
+def test_history_refresh_updates_relative_dates():
+	view = gv_views.CallHistoryView.__new__(gv_views.CallHistoryView)
+	view._window = None
+	view._errorDisplay = RaisingErrorDisplay()
+	view._messageStore = UnchangedStore()
+	view._selectedFilter = "All"
+	view._historyview = None
+	view._historymodel, view._historymodelfiltered = view._create_model(
+		view._build_history_rows([generate_item("1 hour ago")])
+	)
+	view._isCacheShown = True
+	view._backend = FixedBackend([generate_item("3 hours ago")])
+
+	with NoBanners():
+		view._idly_populate_historyview(Token())
+
+	dates = [row[view.DATE_IDX] for row in view._historymodel]
+	assert dates == ["3 h"], dates
+
+
+def test_messages_refresh_updates_relative_dates():
+	view = gv_views.MessagesView.__new__(gv_views.MessagesView)
+	view._window = None
+	view._errorDisplay = RaisingErrorDisplay()
+	view._messageStore = UnchangedStore()
+	view._messageType = view.ALL_TYPES
+	view._messageStatus = view.ALL_STATUS
+	view._messageview = None
+	view._messagemodel, view._messagemodelfiltered = view._create_model(
+		view._build_message_rows([generate_item("1 hour ago")])
+	)
+	view._isCacheShown = True
+	view._backend = FixedBackend([generate_item("3 hours ago")])
+
+	with NoBanners():
+		view._idly_populate_messageview(Token())
+
+	dates = [row[view.DATE_IDX] for row in view._messagemodel]
+	assert dates == ["3 hours ago"], dates
+
+
+def test_cached_history_is_refreshed_on_first_update():
+	view = gv_views.CallHistoryView.__new__(gv_views.CallHistoryView)
+	view._window = None
+	view._errorDisplay = RaisingErrorDisplay()
+	view._messageStore = UnchangedStore([generate_item("1 hour ago")])
+	view._selectedFilter = "All"
+	view._historyview = None
+	view._isCacheShown = False
+	view.show_cache()
+	assert view._isCacheShown
+	assert [row[view.DATE_IDX] for row in view._historymodel] == ["1 h"]
+
+	view._backend = FixedBackend([generate_item("3 hours ago")])
+	with NoBanners():
+		view._idly_populate_historyview(Token())
+
+	dates = [row[view.DATE_IDX] for row in view._historymodel]
+	assert dates == ["3 h"], dates
+
+
+def test_cached_messages_are_refreshed_on_first_update():
+	view = gv_views.MessagesView.__new__(gv_views.MessagesView)
+	view._window = None
+	view._errorDisplay = RaisingErrorDisplay()
+	view._messageStore = UnchangedStore([generate_item("1 hour ago")])
+	view._messageType = view.ALL_TYPES
+	view._messageStatus = view.ALL_STATUS
+	view._messageview = None
+	view._isCacheShown = False
+	view.show_cache()
+	assert view._isCacheShown
+	assert [row[view.DATE_IDX] for row in view._messagemodel] == ["1 hour ago"]
+
+	view._backend = FixedBackend([generate_item("3 hours ago")])
+	with NoBanners():
+		view._idly_populate_messageview(Token())
+
+	dates = [row[view.DATE_IDX] for row in view._messagemodel]
+	assert dates == ["3 hours ago"], dates
@@ -0,0 +1,160 @@
+from __future__ import with_statement
+
+import time
+import threading
+
+import test_utils
+
+import sys
+sys.path.append("../src")
+
+from backends import gvoice
+
+
+def generate_json(items):
+	return {"messages": dict((item["id"], item) for item in items)}
+
+
+def generate_item(messageId, isRead = False, labels = ("inbox", "sms"), startTime = "1"):
+	return {
+		"id": messageId,
+		"startTime": startTime,
+		"relativeStartTime": "1 hour ago",
+		"isRead": isRead,
+		"isSpam": False,
+		"isTrash": False,
+		"star": False,
+		"labels": list(labels),
+	}
+
+
+def split_conversations(html):
+	for messageId in html:
+		yield messageId, "<div>%s</div>" % messageId
+
+
+class ParseCounter(object):
+
+	def __init__(self):
+		self.parsed = []
+
+	def __call__(self, messageId, messageHtml):
+		self.parsed.append(messageId)
+		conv = gvoice.Conversation()
+		conv.id = messageId
+		conv.messages = (messageHtml, )
+		return conv
+
+
+def test_sync_only_parses_new():
+	parser = ParseCounter()
+	sync = gvoice.ConversationSync(split_conversations, parser)
+
+	json = generate_json([generate_item("a"), generate_item("b")])
+	added, updated, removed = sync.update(json, ["a", "b"])
+	assert [conv.id for conv in added] == ["a", "b"]
+	assert updated == []
+	assert removed == []
+	assert parser.parsed == ["a", "b"]
+
+	json = generate_json([generate_item("c"), generate_item("a"), generate_item("b")])
+	added, updated, removed = sync.update(json, ["c", "a", "b"])
+	assert [conv.id for conv in added] == ["c"]
+	assert updated == []
+	assert removed == []
+	assert parser.parsed == ["a", "b", "c"]
+	assert [conv.id for conv in sync.get_conversations()] == ["c", "a", "b"]
+
+
+def test_sync_flag_change_skips_parse():
+	parser = ParseCounter()
+	sync = gvoice.ConversationSync(split_conversations, parser)
+	sync.update(generate_json([generate_item("a")]), ["a"])
+
+	json = generate_json([generate_item("a", isRead = True, labels = ("sms", ))])
+	added, updated, removed = sync.update(json, ["a"])
+	assert added == []
+	assert [conv.id for conv in updated] == ["a"]
+	assert updated[0].isRead
+	assert updated[0].isArchived
+	assert parser.parsed == ["a"]
+
+
+def test_sync_content_change_reparses():
+	parser = ParseCounter()
+	sync = gvoice.ConversationSync(split_conversations, parser)
+	sync.update(generate_json([generate_item("a")]), ["a"])
+
+	json = generate_json([generate_item("a", startTime = "2")])
+	added, updated, removed = sync.update(json, ["a"])
+	assert added == []
+	assert [conv.id for conv in updated] == ["a"]
+	assert parser.parsed == ["a", "a"]
+
+
+def test_sync_removed():
+	parser = ParseCounter()
+	sync = gvoice.ConversationSync(split_conversations, parser)
+	sync.update(generate_json([generate_item("a"), generate_item("b")]), ["a", "b"])
+
+	added, updated, removed = sync.update(generate_json([generate_item("b")]), ["b"])
+	assert added == []
+	assert updated == []
+	assert removed == ["a"]
+	assert [conv.id for conv in sync.get_conversations()] == ["b"]
+
+	sync.clear()
+	assert sync.get_conversations() == []
+
+
+def test_single_flight_shares_call():
+	flight = gvoice.SingleFlight()
+	started = threading.Event()
+	release = threading.Event()
+	calls = []
+
+	def fetch(url):
+		calls.append(url)
+		started.set()
+		release.wait()
+		return "page for %s" % url
+
+	results = []
+	threads = [
+		threading.Thread(target=lambda: results.append(flight.do("url", fetch, "url")))
+		for i in xrange(4)
+	]
+	threads[0].start()
+	started.wait()
+	for thread in threads[1:]:
+		thread.start()
+	while flight.shared < 3:
+		time.sleep(0.01)
+	release.set()
+	for thread in threads:
+		thread.join()
+
+	assert calls == ["url"]
+	assert results == ["page for url"] * 4
+	assert flight.do("url", fetch, "url") == "page for url"
+	assert len(calls) == 2, "Finished calls are not kept without a maxAge"
+
+
+def test_single_flight_errors_and_cache():
+	flight = gvoice.SingleFlight(60)
+	calls = []
+
+	def fail():
+		calls.append("fail")
+		raise gvoice.NetworkError("down")
+
+	with test_utils.expected(gvoice.NetworkError):
+		flight.do("url", fail)
+	with test_utils.expected(gvoice.NetworkError):
+		flight.do("url", fail)
+	assert len(calls) == 2, "Failures are not kept"
+
+	assert flight.do("url", lambda: "first") == "first"
+	assert flight.do("url", lambda: "second") == "first"
+	flight.forget()
+	assert flight.do("url", lambda: "third") == "third"
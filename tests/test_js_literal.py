@@ -0,0 +1,41 @@
+from __future__ import with_statement
+
+import test_utils
+
+import sys
+sys.path.append("../src")
+
+from backends import js_literal
+
+
+def test_contacts_blob():
+	page = """<script>var _gcData = {"contacts":{"0":{"name":"Unknown"},"12":{contactId:'12',"name":"Bob \\"B\\" Smith","numbers":[{"phoneNumber":"+15555551234","phoneType":"mobile"}],"hasPhoto":false,"isStarred":true,"photoUrl":null}},"rank":{}};
+var other = "};";</script>"""
+	start = page.index("{")
+	contacts = dict(js_literal.iter_object_items(page, ("contacts", ), start))
+	assert sorted(contacts.keys()) == ["0", "12"]
+	bob = contacts["12"]
+	assert bob["contactId"] == "12"
+	assert bob["name"] == 'Bob "B" Smith'
+	assert bob["numbers"] == [{"phoneNumber": "+15555551234", "phoneType": "mobile"}]
+	assert bob["hasPhoto"] is False
+	assert bob["isStarred"] is True
+	assert bob["photoUrl"] is None
+
+
+def test_no_eval():
+	with test_utils.expected(ValueError):
+		js_literal.loads("__import__('os').getcwd()")
+	with test_utils.expected(ValueError):
+		js_literal.loads("{a: open}")
+
+
+def test_nested():
+	value = js_literal.loads("""{
+		"messages": {"abc": {"isRead": false, "labels": ["inbox", "sms"], "startTime": "1250000000000"}},
+		"totalSize": 1,
+		"unreadCounts": {all: 0, 'sms': 0, "voicemail": 0},
+	};""")
+	assert value["messages"]["abc"]["labels"] == ["inbox", "sms"]
+	assert value["totalSize"] == 1
+	assert value["unreadCounts"] == {"all": 0, "sms": 0, "voicemail": 0}
@@ -0,0 +1,123 @@
+from __future__ import with_statement
+
+import os
+import shutil
+import tempfile
+import datetime
+
+import test_utils
+
+import sys
+sys.path.append("../src")
+
+from backends import message_store
+
+
+def generate_message(messageId, body = "Hello", isRead = False, hour = 1):
+	return {
+		"id": messageId,
+		"contactId": "contact-%s" % messageId,
+		"name": "Name %s" % messageId,
+		"time": datetime.datetime(2009, 6, 21, hour, 15),
+		"relTime": "%d hours ago" % hour,
+		"prettyNumber": "(555) 555-1234",
+		"number": "+15555551234",
+		"location": "",
+		"messageParts": [("Me:", body, "3:15 PM"), ("Them:", "Reply", "3:16 PM")],
+		"type": "SMS",
+		"isRead": isRead,
+		"isTrash": False,
+		"isSpam": False,
+		"isArchived": False,
+	}
+
+
+def generate_history(messageId, action = "Received", hour = 1):
+	return {
+		"id": messageId,
+		"contactId": "",
+		"name": "",
+		"time": datetime.datetime(2009, 6, 21, hour, 15),
+		"relTime": "%d hours ago" % hour,
+		"prettyNumber": "(555) 555-1234",
+		"number": "+15555551234",
+		"location": "Somewhere, ST",
+		"action": action,
+	}
+
+
+class temp_store(object):
+
+	def __enter__(self):
+		self._dir = tempfile.mkdtemp()
+		self.path = os.path.join(self._dir, "messages.db")
+		self.store = message_store.MessageStore(self.path)
+		return self
+
+	def reopen(self):
+		self.store.close()
+		self.store = message_store.MessageStore(self.path)
+		return self.store
+
+	def __exit__(self, *args):
+		self.store.close()
+		shutil.rmtree(self._dir)
+
+
+def test_messages_survive_reopen():
+	with temp_store() as temp:
+		messages = [generate_message("a", hour = 1), generate_message("b", hour = 2)]
+		added, updated, removed = temp.store.sync_messages(messages)
+		assert [message["id"] for message in added] == ["a", "b"]
+		assert updated == [] and removed == []
+
+		stored = temp.reopen().get_messages()
+		assert [message["id"] for message in stored] == ["b", "a"]
+		expected = dict(messages[0], relTime = message_store.relative_time(messages[0]["time"]))
+		assert stored[1] == expected, "%r != %r" % (stored[1], expected)
+
+
+def test_messages_deltas():
+	with temp_store() as temp:
+		temp.store.sync_messages([generate_message("a"), generate_message("b")])
+
+		added, updated, removed = temp.store.sync_messages([generate_message("a"), generate_message("b")])
+		assert added == [] and updated == [] and removed == []
+
+		later = generate_message("a")
+		later["relTime"] = "2 hours ago"
+		added, updated, removed = temp.store.sync_messages([later, generate_message("b")])
+		assert added == [] and updated == [] and removed == [], "Relative times alone aren't changes"
+
+		added, updated, removed = temp.store.sync_messages([
+			generate_message("a", isRead = True),
+			generate_message("c"),
+		])
+		assert [message["id"] for message in added] == ["c"]
+		assert [message["id"] for message in updated] == ["a"]
+		assert removed == ["b"]
+		assert sorted(message["id"] for message in temp.store.get_messages()) == ["a", "c"]
+
+
+def test_history_deltas():
+	with temp_store() as temp:
+		history = [generate_history("a"), generate_history("a", "Missed"), generate_history("b", hour = 3)]
+		added, updated, removed = temp.store.sync_recent(history)
+		assert len(added) == 3
+
+		stored = temp.reopen().get_recent()
+		assert stored[0] == dict(history[2], relTime = message_store.relative_time(history[2]["time"]))
+
+		added, updated, removed = temp.store.sync_recent([generate_history("a", hour = 2)])
+		assert added == []
+		assert [(item["id"], item["action"]) for item in updated] == [("a", "Received")]
+		assert sorted(removed) == [("a", "Missed"), ("b", "Received")]
+
+
+def test_clear():
+	with temp_store() as temp:
+		temp.store.sync_messages([generate_message("a")])
+		temp.store.sync_recent([generate_history("a")])
+		temp.store.clear()
+		assert temp.store.get_messages() == []
+		assert temp.store.get_recent() == []
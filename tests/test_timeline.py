@@ -0,0 +1,49 @@
+from __future__ import with_statement
+
+import os
+import shutil
+import tempfile
+import threading
+
+import test_utils
+
+import sys
+sys.path.append("../src")
+
+import timeline
+
+
+def test_spans():
+	startup = timeline.Timeline()
+	with startup.span("glade load"):
+		pass
+	startup.begin("login")
+	worker = threading.Thread(target=lambda: startup.mark("worker"), name="Worker")
+	worker.start()
+	worker.join()
+	startup.end("login")
+	startup.end("never began")
+	with startup.span("glade load"):
+		pass
+
+	spans = startup.get_spans()
+	assert [span["name"] for span in spans] == ["glade load", "login", "worker"]
+	assert spans[2]["thread"] == "Worker"
+	assert spans[2]["duration"] == 0
+	assert "login" in startup
+	assert "never began" not in startup
+	assert spans[0]["start"] <= spans[1]["start"] <= spans[2]["start"]
+
+
+def test_write_json():
+	reportDir = tempfile.mkdtemp()
+	try:
+		startup = timeline.Timeline(0)
+		startup.add("login", 1, 3)
+		reportPath = os.path.join(reportDir, "startup.json")
+		startup.write_json(reportPath)
+		with open(reportPath) as f:
+			report = timeline.simplejson.load(f)
+		assert report == [{"name": "login", "thread": "MainThread", "start": 1, "duration": 2}]
+	finally:
+		shutil.rmtree(reportDir)
@@ -0,0 +1,67 @@
+from __future__ import with_statement
+
+import os
+import shutil
+import datetime
+import tempfile
+
+import test_utils
+
+import sys
+sys.path.append("../src")
+
+import view_snapshot
+
+
+def test_round_trip():
+	snapshotDir = tempfile.mkdtemp()
+	try:
+		path = os.path.join(snapshotDir, "views.snapshot")
+		snapshot = view_snapshot.ViewSnapshot(path)
+		snapshot.load()
+		assert snapshot.get("2 - Recent Calls") is None
+
+		rows = [("555-1234", "2 hours ago", "Missed", "Bob", "1", datetime.datetime(2009, 1, 1))]
+		snapshot.set("2 - Recent Calls", rows)
+		snapshot.set("2 - Contacts", ("1", "", [("1", "Bob")]))
+		snapshot.save()
+
+		reloaded = view_snapshot.ViewSnapshot(path)
+		reloaded.load()
+		assert reloaded.get("2 - Recent Calls") == rows
+		assert "2 - Contacts" in reloaded
+
+		reloaded.set("2 - Contacts", None)
+		reloaded.save()
+		reloaded.load()
+		assert "2 - Contacts" not in reloaded
+		assert not [name for name in os.listdir(snapshotDir) if name.endswith(".tmp")]
+
+		reloaded.clear()
+		reloaded.save()
+		assert not os.path.exists(path)
+	finally:
+		shutil.rmtree(snapshotDir)
+
+
+def test_unusable_files():
+	snapshotDir = tempfile.mkdtemp()
+	try:
+		path = os.path.join(snapshotDir, "views.snapshot")
+		snapshot = view_snapshot.ViewSnapshot(path)
+		snapshot.set("2 - Messages", [("row", )])
+		snapshot.save()
+
+		class NewerSnapshot(view_snapshot.ViewSnapshot):
+			VERSION = view_snapshot.ViewSnapshot.VERSION + 1
+
+		newer = NewerSnapshot(path)
+		newer.load()
+		assert "2 - Messages" not in newer
+
+		with open(path, "wb") as f:
+			f.write("not a pickle")
+		snapshot.load()
+		assert "2 - Messages" not in snapshot
+	finally:
+		shutil.rmtree(snapshotDir)